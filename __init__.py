@@ -2,9 +2,72 @@
 Tools to attempt to abstract queries
     (eg: sql, glob expressions, regular expression, sparql, xpath, graphql, etc)
 away from the systems they represent
+
+Modules are only imported the first time something in them is used,
+so eg, a process that only needs GlobQuery never imports numpy
+or asyncio (on python 3.6, where modules can not do that,
+everything is imported up front instead).
 """
-from .treeInterface import *
-from .tape import *
-from .query import *
-from .reQuery import *
-from .globQuery import *
\ No newline at end of file
+import sys
+import typing
+import importlib
+
+
+# module -> the public names it has, in the order they were always imported
+_MODULE_NAMES:typing.Dict[str,typing.Tuple[str,...]]={
+    'treeInterface':('TreeLike','AsyncTreeLike','readGeneration','bumpGeneration',
+        'Tree','ChildList','CompactTree','primativeAsTree'),
+    'tape':('TapeT','IdentitySet','BitmapSet','NullSet','Tape'),
+    'columnarTree':('ColumnarNode','ColumnarTree'),
+    'fsTree':('FsTree',),
+    'primativeView':('PrimativeView',),
+    'jsonStream':('JsonStream',),
+    'query':('Query','cmdline'),
+    'queryAutomaton':('StepMatcher','QueryStep','patternLiteral','LiteralStep',
+        'describeStep','QuerySegment','QueryAutomaton'),
+    'queryStats':('StepStats','QueryStats'),
+    'findCache':('FindCache',),
+    'prefilter':('patternRequirements','PrefilterStats','PrefilteredStep',
+        'prefilterPattern','requiredBytes'),
+    'queryPlan':('QueryPlan','encodeStep','decodeStep','QueryPlanCache','defaultPlanCache'),
+    'parallelFind':('ExecutorLike','findParallel'),
+    'asyncFind':('afindWithAutomaton','LatencyTree'),
+    'reQuery':('ReQuery',),
+    'globQuery':('GlobStep','compileGlobStep','GlobQuery'),
+    'grepQuery':('GrepQuery','grepToRegex','grepToBytesRegex'),
+    'querySet':('QuerySet',),
+    'compositeQuery':('Expression','CompositeQuery'),
+    'pathIndex':('PathIndex',),
+    'pathStream':('QuerySpec','readChunks','matchChunk','filterPaths','countPaths'),
+    'sharedTree':('SharedTree',)}
+
+# public name -> the module it is in
+_NAME_MODULES:typing.Dict[str,str]={name:module
+    for module,names in _MODULE_NAMES.items() for name in names}
+
+__all__=list(_NAME_MODULES)
+
+
+def __getattr__(name:str)->typing.Any:
+    """
+    import whatever module a name is in the first time it is asked for
+    """
+    module=_NAME_MODULES.get(name)
+    if module is None:
+        if name in _MODULE_NAMES:
+            return importlib.import_module('.'+name,__name__)
+        raise AttributeError('module %r has no attribute %r'%(__name__,name))
+    value=getattr(importlib.import_module('.'+module,__name__),name)
+    # so it is only looked up once
+    globals()[name]=value
+    return value
+
+
+def __dir__()->typing.List[str]:
+    return sorted(set(globals())|set(_NAME_MODULES))
+
+
+if sys.version_info<(3,7):
+    for _module in _MODULE_NAMES:
+        globals().update({_name:getattr(importlib.import_module('.'+_module,__name__),_name)
+            for _name in _MODULE_NAMES[_module]})
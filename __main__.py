@@ -0,0 +1,10 @@
+"""
+Run the command line (see query.cmdline)
+
+Usage:
+    find . -type f | python -m queryTools '/**/*.py'
+"""
+import sys
+from queryTools.query import cmdline
+
+sys.exit(cmdline(sys.argv[1:]))
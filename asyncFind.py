@@ -0,0 +1,225 @@
+"""
+Run a compiled query over a tree whose children have to be awaited
+(see AsyncTreeLike)
+
+Details:
+    up to "concurrency" nodes have their children fetched at the same time,
+    so siblings (and cousins) are all waiting on the service together
+    rather than one after the other
+    subtrees that can never match are never fetched, the same as find()
+    at most "maxBuffered" results are held waiting for the consumer.
+        When that is full, the search pauses until some are taken,
+        so a slow consumer does not cause the whole tree to be fetched.
+    results come back in roughly breadth-first order
+        (exactly breadth-first if concurrency=1)
+    an ordinary TreeLike works too, its children just are not awaited
+    stopping early (eg, breaking out of the loop) cancels everything
+"""
+import typing
+import asyncio
+import inspect
+import queryTools
+
+
+class _Failure:
+    """
+    An exception from a worker, on its way to the consumer
+    """
+
+    __slots__=('error',)
+
+    def __init__(self,error:BaseException):
+        self.error=error
+
+
+# end of results
+_DONE=object()
+
+
+async def _getChildren(node:typing.Any)->typing.Iterable[typing.Any]:
+    """
+    get the children of an AsyncTreeLike or a TreeLike
+    """
+    children=node.children
+    if callable(children):
+        children=children()
+    if inspect.isawaitable(children):
+        children=await children
+    return children
+
+
+async def _walkAsync(
+    segment:"queryTools.QuerySegment",
+    starts:typing.Iterable[typing.Any],
+    concurrency:int,
+    maxBuffered:int
+    )->typing.AsyncGenerator[typing.Any,None]:
+    """
+    Walk a single segment with a pool of worker tasks
+    """
+    acceptMask=segment.acceptMask
+    liveMask=segment.liveMask
+    advance=segment.advance
+    starts=list(starts)
+    expanded=None
+    if starts:
+        expanded=queryTools.queryAutomaton._expandedStatesFor(starts[0],len(starts))
+    key=expanded.key if expanded is not None else id
+    # nodes waiting for a worker
+    todo:asyncio.Queue=asyncio.Queue()
+    # the states of everything in todo
+    waiting:typing.Dict[typing.Hashable,int]={}
+    results:asyncio.Queue=asyncio.Queue(maxBuffered)
+    def push(node:typing.Any,mask:int)->None:
+        nodeKey=key(node)
+        if nodeKey in waiting:
+            # got here two different ways, so do both
+            waiting[nodeKey]|=mask
+        elif expanded is None or expanded.newStates(node,mask):
+            waiting[nodeKey]=mask
+            todo.put_nowait(node)
+    for start in starts:
+        push(start,segment.startMask)
+    async def worker()->None:
+        while True:
+            node=await todo.get()
+            try:
+                mask=waiting.pop(key(node))
+                if expanded is not None:
+                    # only the states it has not already been expanded with
+                    mask=expanded.add(node,mask)
+                if mask&acceptMask:
+                    # waits here when the consumer is behind
+                    await results.put(node)
+                if mask&liveMask:
+                    for child in await _getChildren(node):
+                        childMask=advance(mask,child.name)
+                        if childMask:
+                            push(child,childMask)
+            except Exception as e:
+                await results.put(_Failure(e))
+                return
+            finally:
+                todo.task_done()
+    async def finish()->None:
+        await todo.join()
+        await results.put(_DONE)
+    tasks=[asyncio.ensure_future(worker()) for _ in range(max(1,concurrency))]
+    tasks.append(asyncio.ensure_future(finish()))
+    try:
+        while True:
+            item=await results.get()
+            if item is _DONE:
+                break
+            if isinstance(item,_Failure):
+                raise item.error
+            yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks,return_exceptions=True)
+
+
+async def afindWithAutomaton(
+    automaton:"queryTools.QueryAutomaton",
+    tree:typing.Union[queryTools.TreeLike,queryTools.AsyncTreeLike],
+    concurrency:int=16,
+    maxBuffered:int=64
+    )->typing.AsyncGenerator[typing.Any,None]:
+    """
+    Finds items in a tree whose children have to be awaited
+
+    :automaton: the compiled query
+    :tree: starting location of the tree.  Usually you'd pass root.
+    :concurrency: the most nodes to be fetching children at once
+    :maxBuffered: the most results to find ahead of the consumer
+    """
+    key=queryTools.queryAutomaton._visitKeyFor(tree)
+    starts:typing.List[typing.Any]=[tree]
+    lastIdx=len(automaton.segments)-1
+    for i,segment in enumerate(automaton.segments):
+        if i>0:
+            # __PARENTDIR_STEP__ between segments
+            parents:typing.Dict[typing.Hashable,typing.Any]={}
+            for start in starts:
+                parent=start.parent
+                if parent is not None:
+                    parents.setdefault(key(parent),parent)
+            starts=list(parents.values())
+        walker=_walkAsync(segment,starts,concurrency,maxBuffered)
+        try:
+            if i==lastIdx:
+                async for node in walker:
+                    yield node
+            else:
+                starts=[node async for node in walker]
+        finally:
+            await walker.aclose()
+
+
+class LatencyTree:
+    """
+    An in-memory AsyncTreeLike that waits a while before
+    returning children, to stand in for a remote service
+    (eg, for testing or benchmarking)
+
+    Usage:
+        root=LatencyTree(primativeAsTree(data),latency=0.01)
+        async for item in GlobQuery('/**/*.exe').afind(root):
+            print(item.path)
+    """
+
+    __slots__=('tree','parent','latency','_children')
+
+    def __init__(self,
+        tree:queryTools.TreeLike,
+        latency:float=0.01,
+        parent:typing.Optional["LatencyTree"]=None):
+        """
+        :tree: the tree to wrap
+        :latency: how many seconds every children() call takes
+        :parent: parent item
+        """
+        self.tree=tree
+        self.latency=latency
+        self.parent=parent
+        self._children:typing.Optional[typing.List[LatencyTree]]=None
+
+    @property
+    def name(self)->str:
+        """
+        name of this item
+        """
+        return self.tree.name
+
+    async def children(self)->typing.List["LatencyTree"]:
+        """
+        get the children of this item (after waiting)
+        """
+        await asyncio.sleep(self.latency)
+        if self._children is None:
+            self._children=[self.__class__(child,self.latency,self) for child in self.tree.children]
+        return self._children
+
+    @property
+    def pathSegments(self)->typing.Iterable[str]:
+        """
+        get the path to this item
+        """
+        ret=[]
+        item:typing.Optional[LatencyTree]=self
+        while item is not None:
+            ret.append(item.name)
+            item=item.parent
+        ret.reverse()
+        return ret
+
+    @property
+    def path(self)->str:
+        """
+        get the path to this item
+        """
+        return '/'+('/'.join(self.pathSegments))
+
+    def __repr__(self)->str:
+        return 'LatencyTree(%r)'%self.path
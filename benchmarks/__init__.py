@@ -0,0 +1,10 @@
+"""
+Performance benchmarks for queryTools
+
+    suite - timing, memory and correctness of every query class,
+        with JSON output and comparison against a baseline
+    treeGenerators - deterministic in-memory trees of different shapes
+    fsTreeBenchmark - FsTree against glob.glob and pathlib
+    globBenchmark - GlobStep matchers against regex and fnmatch
+    asyncBenchmark - Query.afind() throughput at different concurrency levels
+"""
@@ -0,0 +1,100 @@
+"""
+Measure Query.afind() throughput against a LatencyTree
+(an in-memory tree where every children() call takes a while)
+at different concurrency levels.
+
+Usage:
+    python -m queryTools.benchmarks.asyncBenchmark [--latency=seconds] [--width=N] [--depth=N]
+"""
+import typing
+import asyncio
+import time
+import queryTools
+
+
+def generateTree(width:int=6,depth:int=3)->queryTools.CompactTree:
+    """
+    Generate a deterministic in-memory tree
+
+    (every node has width children named n0..nN, leaves are named leaf0.exe..)
+    """
+    root=queryTools.CompactTree()
+    todo=[(root,0)]
+    while todo:
+        node,level=todo.pop()
+        if level<depth:
+            names=['n%d'%i for i in range(width)]
+        else:
+            names=['leaf%d.exe'%i for i in range(width)]
+            level=None
+        children=[queryTools.CompactTree(name,node) for name in names]
+        node.children=children
+        if level is not None:
+            todo.extend((child,level+1) for child in children)
+    return root
+
+
+def runAsyncBenchmark(
+    tree:queryTools.TreeLike,
+    latency:float=0.005,
+    concurrencies:typing.Sequence[int]=(1,4,16,64),
+    pattern:str='/**/n1/*.exe'
+    )->typing.List[typing.Dict[str,typing.Any]]:
+    """
+    Run the query at each concurrency level and check they all get the same answer
+
+    :return: a result dict per concurrency level
+    """
+    query=queryTools.GlobQuery(pattern)
+    expected=sorted(node.path for node in query.find(tree))
+    results=[]
+    for concurrency in concurrencies:
+        async def run()->typing.List[str]:
+            root=queryTools.LatencyTree(tree,latency)
+            return [item.path async for item in query.afind(root,concurrency=concurrency)]
+        start=time.perf_counter()
+        found=asyncio.run(run())
+        elapsed=time.perf_counter()-start
+        if sorted(found)!=expected:
+            raise AssertionError('Results differ at concurrency %d (%d vs %d)'%(
+                concurrency,len(found),len(expected)))
+        results.append({
+            'concurrency':concurrency,
+            'matches':len(found),
+            'seconds':elapsed,
+            'matchesPerSecond':len(found)/elapsed if elapsed else 0.0})
+    return results
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    latency=0.005
+    width=6
+    depth=3
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0]=='--latency':
+            latency=float(av[1])
+        elif av[0]=='--width':
+            width=int(av[1])
+        elif av[0]=='--depth':
+            depth=int(av[1])
+        else:
+            print('Usage:')
+            print('  asyncBenchmark.py [--latency=seconds] [--width=N] [--depth=N]')
+            return -1
+    tree=generateTree(width,depth)
+    print('%-12s %8s %10s %14s'%('concurrency','matches','seconds','matches/sec'))
+    for result in runAsyncBenchmark(tree,latency):
+        print('%-12d %8d %9.3fs %14.1f'%(result['concurrency'],result['matches'],
+            result['seconds'],result['matchesPerSecond']))
+    return 0
+
+
+if __name__=='__main__':
+    import sys
+    sys.exit(cmdline(sys.argv[1:]))
@@ -0,0 +1,122 @@
+"""
+Compare FsTree+GlobQuery.find() against glob.glob(recursive=True)
+and pathlib.Path.rglob() on a generated directory tree.
+
+Usage:
+    python -m queryTools.benchmarks.fsTreeBenchmark [--repeat=N] [--keep]
+"""
+import typing
+import os
+import glob
+import pathlib
+import shutil
+import tempfile
+import queryTools
+from queryTools.benchmarks import suite
+
+
+def generateFsTree(
+    root:str,
+    width:int=12,
+    depth:int=4,
+    filesPerDir:int=20,
+    extensions:typing.Sequence[str]=('exe','dll','txt','tmp')
+    )->int:
+    """
+    Generate a deterministic directory tree
+
+    :return: how many files and directories were created
+    """
+    count=0
+    todo=[(root,0)]
+    while todo:
+        path,level=todo.pop()
+        for i in range(filesPerDir):
+            with open(os.path.join(path,'file%d.%s'%(i,extensions[i%len(extensions)])),'w'):
+                pass
+            count+=1
+        if level<depth:
+            for i in range(width if level else 3):
+                name='foo' if i==0 else 'dir%d'%i
+                if level==0:
+                    name=('windows','users','program files')[i]
+                subpath=os.path.join(path,name)
+                os.mkdir(subpath)
+                count+=1
+                todo.append((subpath,level+1))
+    return count
+
+
+def runFsTreeBenchmark(
+    root:str,
+    repeat:int=3
+    )->typing.List[typing.Dict[str,typing.Any]]:
+    """
+    Run each pattern every way and check they all get the same answer
+
+    :return: a result dict per pattern
+    """
+    patterns=['windows/*/foo/*.exe','windows/**/*.exe','**/foo/file1.dll','users/dir3/**/file7.*']
+    results=[]
+    for pattern in patterns:
+        q=queryTools.GlobQuery('/'+pattern)
+        def findQuery()->typing.List[str]:
+            return [item.path for item in q.find(queryTools.FsTree(root))]
+        def findGlob()->typing.List[str]:
+            return glob.glob(os.path.join(root,pattern),recursive=True)
+        def findRglob()->typing.List[str]:
+            return [str(path) for path in pathlib.Path(root).glob(pattern)]
+        queryTime,queryResult=suite.bestTime(findQuery,repeat)
+        globTime,globResult=suite.bestTime(findGlob,repeat)
+        rglobTime,rglobResult=suite.bestTime(findRglob,repeat)
+        # check for correctness outside of the timing
+        expected={os.path.relpath(path,root) for path in queryResult}
+        globResult={os.path.relpath(path,root) for path in globResult}
+        rglobResult={os.path.relpath(path,root) for path in rglobResult}
+        if globResult!=expected or rglobResult!=expected:
+            raise AssertionError('Results differ for "%s" (%d vs glob %d vs pathlib %d)'%(
+                pattern,len(expected),len(globResult),len(rglobResult)))
+        results.append({
+            'pattern':pattern,
+            'matches':len(expected),
+            'queryTools':queryTime,
+            'glob':globTime,
+            'pathlib':rglobTime})
+    return results
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    repeat=3
+    keep=False
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0]=='--repeat':
+            repeat=int(av[1])
+        elif av[0]=='--keep':
+            keep=True
+        else:
+            print('Usage:')
+            print('  fsTreeBenchmark.py [--repeat=N] [--keep]')
+            return -1
+    root=tempfile.mkdtemp(prefix='queryToolsBench')
+    try:
+        count=generateFsTree(root)
+        print('Generated %d files and directories in %s'%(count,root))
+        print('%-24s %8s %12s %12s %12s'%('pattern','matches','queryTools','glob','pathlib'))
+        for result in runFsTreeBenchmark(root,repeat):
+            print('%-24s %8d %11.4fs %11.4fs %11.4fs'%(result['pattern'],result['matches'],
+                result['queryTools'],result['glob'],result['pathlib']))
+    finally:
+        if not keep:
+            shutil.rmtree(root)
+    return 0
+
+
+if __name__=='__main__':
+    import sys
+    sys.exit(cmdline(sys.argv[1:]))
@@ -0,0 +1,124 @@
+"""
+Compare the string method matchers of GlobStep against the regex
+a glob step used to be compiled into (both with and without
+its prefilter), and against fnmatch, for each form of glob step.
+
+Usage:
+    python -m queryTools.benchmarks.globBenchmark [--names=N] [--repeat=N]
+"""
+import typing
+import re
+import random
+import fnmatch
+import queryTools
+from queryTools.benchmarks import suite
+
+
+_EXTENSIONS=('exe','dll','txt','tmp','log','py','json','xml','EXE','Tmp')
+
+# (glob,form)
+GLOBS=[
+    ('file1*','prefix'),
+    ('*.exe','suffix'),
+    ('*tmp*','contains'),
+    ('file*.exe','prefix+suffix'),
+    ('file?.txt','single ?'),
+    ('f*1*.exe','regex')]
+
+
+def generateNames(count:int=100000,seed:int=1)->typing.List[str]:
+    """
+    Generate a deterministic list of file names
+    """
+    rand=random.Random(seed)
+    prefixes=('file','tmp','calc','notepad','mytmpfile','f')
+    return ['%s%d.%s'%(rand.choice(prefixes),rand.randrange(0,200),rand.choice(_EXTENSIONS))
+        for _ in range(count)]
+
+
+def runGlobBenchmark(
+    names:typing.List[str],
+    repeat:int=3
+    )->typing.List[typing.Dict[str,typing.Any]]:
+    """
+    Match every name against each glob every way,
+    and check they all get the same answer
+
+    :return: a result dict per (glob,ignoreCase)
+    """
+    results=[]
+    for glob,form in GLOBS:
+        for ignoreCase in (False,True):
+            reFlags=re.IGNORECASE if ignoreCase else 0
+            # the step GlobQuery uses now
+            step=queryTools.GlobQuery('/'+glob,ignoreCase)._querySteps[-1]
+            matcher=getattr(step,'fullmatch',step)
+            # what GlobQuery used before there were GlobSteps
+            regex=re.compile(re.escape(glob).replace('\\*','.*').replace('\\?','.'),reFlags)
+            regexMatch=regex.fullmatch
+            prefilteredMatch=queryTools.prefilterPattern(regex).fullmatch
+            if ignoreCase:
+                folded=glob.lower()
+                def useFnmatch()->typing.List[str]:
+                    return [name for name in names if fnmatch.fnmatchcase(name.lower(),folded)]
+            else:
+                def useFnmatch()->typing.List[str]:
+                    return [name for name in names if fnmatch.fnmatchcase(name,glob)]
+            def useStep()->typing.List[str]:
+                return [name for name in names if matcher(name)]
+            def useRegex()->typing.List[str]:
+                return [name for name in names if regexMatch(name)]
+            def usePrefiltered()->typing.List[str]:
+                return [name for name in names if prefilteredMatch(name)]
+            stepTime,stepResult=suite.bestTime(useStep,repeat)
+            prefilteredTime,prefilteredResult=suite.bestTime(usePrefiltered,repeat)
+            regexTime,regexResult=suite.bestTime(useRegex,repeat)
+            fnmatchTime,fnmatchResult=suite.bestTime(useFnmatch,repeat)
+            # check for correctness outside of the timing
+            if not stepResult==prefilteredResult==regexResult==fnmatchResult:
+                raise AssertionError('Results differ for "%s" (%d vs prefiltered %d vs regex %d vs fnmatch %d)'%(
+                    glob,len(stepResult),len(prefilteredResult),len(regexResult),len(fnmatchResult)))
+            results.append({
+                'glob':glob,
+                'form':form if isinstance(step,queryTools.GlobStep) else 'regex',
+                'ignoreCase':ignoreCase,
+                'matches':len(stepResult),
+                'globStep':stepTime,
+                'prefiltered':prefilteredTime,
+                'regex':regexTime,
+                'fnmatch':fnmatchTime})
+    return results
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    repeat=3
+    count=100000
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0]=='--repeat':
+            repeat=int(av[1])
+        elif av[0]=='--names':
+            count=int(av[1])
+        else:
+            print('Usage:')
+            print('  globBenchmark.py [--names=N] [--repeat=N]')
+            return -1
+    names=generateNames(count)
+    print('Matching %d names'%len(names))
+    print('%-12s %-14s %-10s %8s %11s %11s %11s %11s'%(
+        'glob','form','ignoreCase','matches','globStep','prefiltered','regex','fnmatch'))
+    for result in runGlobBenchmark(names,repeat):
+        print('%-12s %-14s %-10s %8d %10.4fs %10.4fs %10.4fs %10.4fs'%(result['glob'],result['form'],
+            result['ignoreCase'],result['matches'],result['globStep'],result['prefiltered'],
+            result['regex'],result['fnmatch']))
+    return 0
+
+
+if __name__=='__main__':
+    import sys
+    sys.exit(cmdline(sys.argv[1:]))
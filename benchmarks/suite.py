@@ -0,0 +1,460 @@
+"""
+Timing and memory benchmarks for every query class, with correctness
+checks, JSON output, and comparison against a stored baseline.
+
+Every benchmark also checks its answer (mostly against a slow but
+obviously right reference implementation) so a fast path that
+gives wrong results fails rather than looking good.
+
+Usage:
+    python -m queryTools.benchmarks.suite run [--repeat=N] [--scale=F] [--only=TEXT]
+        [--json=FILE] [--baseline=FILE] [--threshold=F]
+    python -m queryTools.benchmarks.suite compare BASELINE.json CURRENT.json [--threshold=F]
+
+Both commands exit with 1 if anything is wrong or has got slower
+(or bigger) than the baseline by more than the threshold (default=0.25, eg 25%).
+"""
+import typing
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import fnmatch
+import platform
+import tempfile
+import tracemalloc
+import queryTools
+from queryTools.simpleQuery import SimpleQuery
+from queryTools.benchmarks import treeGenerators
+
+
+# a benchmark is (name,run,check) where check(run()) says whether it was right
+Benchmark=typing.Tuple[str,typing.Callable[[],typing.Any],typing.Callable[[typing.Any],bool]]
+
+# timings shorter than this are too noisy to call a regression
+_MIN_SECONDS=0.0005
+
+
+def _stepMatches(step:str,name:str,isGlob:bool)->bool:
+    """
+    reference check of a single (non-operator) step
+    """
+    if isGlob:
+        return fnmatch.fnmatchcase(name,step.replace('[','[[]'))
+    if step.startswith('*'):
+        step='.'+step
+    return re.fullmatch(step,name) is not None
+
+
+def referenceMatches(queryString:str,names:typing.Sequence[str],isGlob:bool=True)->bool:
+    """
+    A slow but simple check of whether a path matches a query
+    (no .. support)
+
+    :names: names from below the root
+    """
+    steps=queryString.split('/')
+    memo:typing.Dict[typing.Tuple[int,int],bool]={}
+    def match(i:int,j:int)->bool:
+        key=(i,j)
+        ret=memo.get(key)
+        if ret is not None:
+            return ret
+        if i==len(steps):
+            ret=j==len(names)
+        elif steps[i] in ('','.'):
+            ret=match(i+1,j)
+        elif steps[i]=='**':
+            ret=match(i+1,j) or (j<len(names) and match(i,j+1))
+        elif j==len(names):
+            ret=False
+        elif steps[i]=='*' or _stepMatches(steps[i],names[j],isGlob):
+            ret=match(i+1,j+1)
+        else:
+            ret=False
+        memo[key]=ret
+        return ret
+    return match(0,0)
+
+
+def _referenceFind(
+    queryString:str,
+    nodes:typing.Iterable[queryTools.TreeLike],
+    isGlob:bool
+    )->typing.Set[int]:
+    """
+    ids of all nodes that a query should find
+    """
+    return {id(node) for node in nodes
+        if referenceMatches(queryString,treeGenerators.nodeNames(node),isGlob)}
+
+
+def _parseBenchmarks(scale:float)->typing.List[Benchmark]:
+    """
+    assign() for every query class, with and without the plan cache
+    """
+    count=max(10,int(2000*scale))
+    globs=['/windows/system%d/*.exe'%i for i in range(count)]
+    regexes=['/users/bob%d/[a-z]+[.](exe|dll)'%i for i in range(count)]
+    greps=['err\\(or\\)\\? [0-9]\\+ in file%d'%i for i in range(count)]
+    simples=['/users/*/docs%d'%i for i in range(count)]
+    ret:typing.List[Benchmark]=[]
+    for name,queryClass,queryStrings in (
+        ('ReQuery',queryTools.ReQuery,regexes),
+        ('GlobQuery',queryTools.GlobQuery,globs),
+        ('GrepQuery',queryTools.GrepQuery,greps),
+        ('SimpleQuery',SimpleQuery,simples)):
+        def parse(queryClass:typing.Any=queryClass,queryStrings:typing.List[str]=queryStrings)->typing.List[typing.Any]:
+            return [queryClass(queryString) for queryString in queryStrings]
+        def parseCold(parse:typing.Callable=parse)->typing.List[typing.Any]:
+            queryTools.defaultPlanCache.clear()
+            return parse()
+        def check(queries:typing.List[typing.Any],queryStrings:typing.List[str]=queryStrings)->bool:
+            for query,queryString in zip(queries,queryStrings):
+                if query.queryString!=queryString:
+                    return False
+                if isinstance(query,queryTools.GrepQuery):
+                    if query.re.pattern!=queryTools.grepToRegex(queryString).pattern:
+                        return False
+                elif len(query._querySteps)!=len(queryString.split('/')):
+                    return False
+            return len(queries)==len(queryStrings)
+        ret.append(('parse.%s.cold'%name,parseCold,check))
+        ret.append(('parse.%s.cached'%name,parse,check))
+    return ret
+
+
+def _treeBenchmarks(scale:float)->typing.List[Benchmark]:
+    """
+    find() and matches() on every shape of tree
+    """
+    # tree name:(tree,[(glob,the same thing as a regex)])
+    trees={
+        'wide':(treeGenerators.wideTree(max(10,int(5000*scale))),[
+            ('/wide/*.exe','/wide/*[.]exe'),
+            ('/wide/file0001?.*','/wide/file0001.[.].*'),
+            ('/**/*.dll','/**/*[.]dll')]),
+        'deep':(treeGenerators.deepTree(max(5,int(200*scale))),[
+            ('/**/*.exe','/**/*[.]exe'),
+            ('/level0/level1/*','/level0/level1/*'),
+            ('/**/level1?/**/file0.*','/**/level1./**/file0[.].*')]),
+        'balanced':(treeGenerators.balancedTree(4,max(2,min(6,round(24*scale)))),[
+            ('/**/leaf1.*','/**/leaf1[.].*'),
+            ('/n0/*/n2/**','/n0/*/n2/**'),
+            ('/*/*/*','/*/*/*')]),
+        'filesystem':(treeGenerators.filesystemTree(max(20,int(2000*scale))),[
+            ('/windows/**/*.exe','/windows/**/*[.]exe'),
+            ('/**/foo/file1.dll','/**/foo/file1[.]dll'),
+            ('/users/*/*.txt','/users/*/.*[.](txt|log)'),
+            ('/**/cache/**/*.tmp','/**/cache[0-9]*/**/*[.]tmp')]),
+        }
+    ret:typing.List[Benchmark]=[]
+    for treeName,(tree,patterns) in trees.items():
+        nodes=treeGenerators.allNodes(tree)
+        for globPattern,rePattern in patterns:
+            for queryClass,pattern,isGlob in (
+                (queryTools.GlobQuery,globPattern,True),
+                (queryTools.ReQuery,rePattern,False)):
+                query=queryClass(pattern)
+                expected=_referenceFind(pattern,nodes,isGlob)
+                def find(query:queryTools.Query=query,tree:queryTools.TreeLike=tree)->typing.List[queryTools.TreeLike]:
+                    return list(query.find(tree))
+                def checkFind(found:typing.List[queryTools.TreeLike],expected:typing.Set[int]=expected)->bool:
+                    return len(found)==len(expected) and {id(node) for node in found}==expected
+                ret.append(('find.%s.%s.%s'%(queryClass.__name__,treeName,pattern),find,checkFind))
+        # matches() is the same work whatever the pattern, so only do one per tree
+        paths=['/'.join(treeGenerators.nodeNames(node)) for node in nodes]
+        globPattern,rePattern=patterns[0]
+        for queryClass,pattern,isGlob in (
+            (queryTools.GlobQuery,globPattern,True),
+            (queryTools.ReQuery,rePattern,False)):
+            query=queryClass(pattern)
+            expected=[referenceMatches(pattern,treeGenerators.nodeNames(node),isGlob) for node in nodes]
+            def matches(query:queryTools.Query=query,paths:typing.List[str]=paths)->typing.List[bool]:
+                return [query.matches(path) for path in paths]
+            def matchesMany(query:queryTools.Query=query,paths:typing.List[str]=paths)->typing.List[bool]:
+                return list(query.matchesMany(paths))
+            def checkMatches(found:typing.List[bool],expected:typing.List[bool]=expected)->bool:
+                return found==expected
+            name='%s.%s.%s'%(queryClass.__name__,treeName,pattern)
+            ret.append(('matches.'+name,matches,checkMatches))
+            ret.append(('matchesMany.'+name,matchesMany,checkMatches))
+        if treeName=='filesystem':
+            # SimpleQuery only does whole-name steps and *
+            simplePaths=['/'+path for path in paths]
+            for pattern in ('/users/*/docs','/windows/*'):
+                query=SimpleQuery(pattern)
+                expected=[referenceMatches(pattern,treeGenerators.nodeNames(node)) for node in nodes]
+                def simpleMatches(query:SimpleQuery=query,paths:typing.List[str]=simplePaths)->typing.List[bool]:
+                    return [query.matches(path) for path in paths]
+                def checkSimple(found:typing.List[bool],expected:typing.List[bool]=expected)->bool:
+                    return found==expected
+                ret.append(('matches.SimpleQuery.%s.%s'%(treeName,pattern),simpleMatches,checkSimple))
+                expectedFound=_referenceFind(pattern,nodes,True)
+                def simpleFind(query:SimpleQuery=query,tree:queryTools.TreeLike=tree)->typing.List[queryTools.TreeLike]:
+                    return list(query.find(tree))
+                def checkSimpleFind(found:typing.List[queryTools.TreeLike],expected:typing.Set[int]=expectedFound)->bool:
+                    return len(found)==len(expected) and {id(node) for node in found}==expected
+                ret.append(('find.SimpleQuery.%s.%s'%(treeName,pattern),simpleFind,checkSimpleFind))
+    return ret
+
+
+def _tapeBenchmarks(scale:float)->typing.List[Benchmark]:
+    """
+    push()/pop() in every traversal order
+    """
+    count=max(100,int(200000*scale))
+    items=[object() for _ in range(count)]
+    ret:typing.List[Benchmark]=[]
+    for name,makeTape,expectedOrder in (
+        ('breadthFirst',lambda: queryTools.Tape(),items),
+        ('depthFirst',lambda: queryTools.Tape(order=queryTools.Tape.__DEPTH_FIRST__),items[::-1]),
+        ('visitedNone',lambda: queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_NONE__),items),
+        ('visitedHash',lambda: queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_HASH__),items)):
+        def run(makeTape:typing.Callable[[],queryTools.Tape]=makeTape)->typing.List[typing.Any]:
+            tape=makeTape()
+            push=tape.push
+            for item in items:
+                push(item)
+            # pushing again does nothing once they have been visited
+            ret=[]
+            while not tape.isDone:
+                ret.append(tape.pop())
+            for item in ret[:10]:
+                push(item)
+            return ret+[len(tape)]
+        def check(result:typing.List[typing.Any],expectedOrder:typing.List[typing.Any]=expectedOrder,name:str=name)->bool:
+            remaining=result.pop()
+            if result!=expectedOrder:
+                return False
+            # visited items are not pushed again, unless nothing is kept track of
+            return remaining==(10 if name=='visitedNone' else 0)
+        ret.append(('tape.'+name,run,check))
+    return ret
+
+
+def _grepBenchmarks(scale:float,workDir:str)->typing.List[Benchmark]:
+    """
+    grepToRegex() and GrepQuery.search()
+    """
+    patterns=['err\\(or\\)\\? [0-9]\\+','^warn','done$','\\<id\\>=[a-f0-9]\\{8\\}','x\\|y\\|z']
+    samples=['error 42','err 7','warn: low disk','all done','id=deadbeef','idx=deadbeef','x','q']
+    expected=[[bool(re.search(regex,sample)) for sample in samples] for regex in (
+        r'err(or)? [0-9]+',r'\Awarn',r'done\Z',r'\bid\b=[a-f0-9]{8}',r'x|y|z')]
+    count=max(10,int(2000*scale))
+    def translate()->typing.List[typing.Pattern]:
+        ret=[]
+        for _ in range(count):
+            for pattern in patterns:
+                ret.append(queryTools.grepToRegex(pattern))
+        return ret
+    def checkTranslate(regexes:typing.List[typing.Pattern])->bool:
+        for i,regex in enumerate(regexes[:len(patterns)]):
+            if [bool(regex.search(sample)) for sample in samples]!=expected[i]:
+                return False
+        return len(regexes)==count*len(patterns)
+    # files to search
+    lines=['line %d nothing to see'%i for i in range(max(50,int(20000*scale)))]
+    for i in range(0,len(lines),97):
+        lines[i]='line %d error %d happened'%(i,i)
+    numFiles=8
+    for i in range(numFiles):
+        with open(os.path.join(workDir,'file%d.log'%i),'w',newline='\n') as f:
+            f.write('\n'.join(lines)+'\n')
+    hits=sorted(('file%d.log'%i,lineNo+1) for i in range(numFiles)
+        for lineNo,line in enumerate(lines) if re.search('error [0-9]+',line))
+    query=queryTools.GrepQuery('error [0-9]\\+')
+    def search()->typing.List[typing.Tuple[str,int]]:
+        return [(node.name,lineNo) for node,lineNo,_ in query.search(queryTools.FsTree(workDir),'/*.log',workers=1)]
+    def checkSearch(found:typing.List[typing.Tuple[str,int]])->bool:
+        return sorted(found)==hits
+    return [('grep.grepToRegex',translate,checkTranslate),('grep.search',search,checkSearch)]
+
+
+def allBenchmarks(scale:float=1.0,workDir:typing.Optional[str]=None)->typing.List[Benchmark]:
+    """
+    Create every benchmark
+
+    :scale: multiply the size of everything by this
+    :workDir: where to put files (needed for grep benchmarks)
+    """
+    ret=_parseBenchmarks(scale)+_treeBenchmarks(scale)+_tapeBenchmarks(scale)
+    if workDir is not None:
+        ret.extend(_grepBenchmarks(scale,workDir))
+    return ret
+
+
+def bestTime(fn:typing.Callable[[],typing.Any],repeat:int)->typing.Tuple[float,typing.Any]:
+    """
+    best time of several runs (at least one)
+
+    :return: (seconds,the result of the last run)
+    """
+    best=None
+    result=None
+    for _ in range(max(1,repeat)):
+        start=time.perf_counter()
+        result=fn()
+        elapsed=time.perf_counter()-start
+        if best is None or elapsed<best:
+            best=elapsed
+    return typing.cast(float,best),result
+
+
+def runBenchmarks(
+    benchmarks:typing.Iterable[Benchmark],
+    repeat:int=3,
+    measureMemory:bool=True
+    )->typing.Dict[str,typing.Dict[str,typing.Any]]:
+    """
+    Time each benchmark, measure its peak memory, and check its answer
+
+    :return: {name:{"seconds":best time,"peakBytes":peak memory,"ok":correct?}}
+    """
+    ret:typing.Dict[str,typing.Dict[str,typing.Any]]={}
+    for name,run,check in benchmarks:
+        best,result=bestTime(run,repeat)
+        # checking is outside of the timing
+        ok=bool(check(result))
+        result=None
+        peak=None
+        if measureMemory:
+            # a separate run, since tracing slows everything down
+            tracemalloc.start()
+            try:
+                result=run()
+                peak=tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            result=None
+        ret[name]={'seconds':best,'peakBytes':peak,'ok':ok}
+    return ret
+
+
+def compareResults(
+    baseline:typing.Dict[str,typing.Any],
+    current:typing.Dict[str,typing.Any],
+    threshold:float=0.25
+    )->typing.List[str]:
+    """
+    Find everything that has got worse
+
+    :baseline: results (or a saved json document) to compare against
+    :current: new results (or a saved json document)
+    :threshold: how much worse counts as a regression (0.25=25%)
+    :return: a description of each problem
+    """
+    baseline=baseline.get('results',baseline)
+    current=current.get('results',current)
+    problems=[]
+    for name,result in current.items():
+        if not result.get('ok',True):
+            problems.append('%s: WRONG RESULTS'%name)
+        old=baseline.get(name)
+        if old is None:
+            continue
+        if max(old['seconds'],result['seconds'])>=_MIN_SECONDS \
+            and result['seconds']>old['seconds']*(1+threshold):
+            problems.append('%s: %.4fs -> %.4fs (%+.0f%%)'%(name,old['seconds'],result['seconds'],
+                (result['seconds']/max(old['seconds'],1e-12)-1)*100))
+        if old.get('peakBytes') and result.get('peakBytes') \
+            and result['peakBytes']>old['peakBytes']*(1+threshold) \
+            and result['peakBytes']-old['peakBytes']>64*1024:
+            problems.append('%s: %d -> %d bytes peak memory (%+.0f%%)'%(name,old['peakBytes'],result['peakBytes'],
+                (result['peakBytes']/old['peakBytes']-1)*100))
+    return problems
+
+
+def _document(results:typing.Dict[str,typing.Dict[str,typing.Any]],scale:float)->typing.Dict[str,typing.Any]:
+    """
+    wrap results up with where they came from, for saving
+    """
+    return {
+        'python':platform.python_version(),
+        'platform':platform.platform(),
+        'time':time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'scale':scale,
+        'results':results}
+
+
+def _load(filename:str)->typing.Dict[str,typing.Any]:
+    with open(filename,'r',encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _usage()->int:
+    print('Usage:')
+    print('  suite.py run [--repeat=N] [--scale=F] [--only=TEXT] [--json=FILE] [--baseline=FILE] [--threshold=F]')
+    print('  suite.py compare BASELINE.json CURRENT.json [--threshold=F]')
+    return -1
+
+
+def cmdline(args:typing.Iterable[str])->int:
+    """
+    Run the command line
+
+    :param args: command line arguments (WITHOUT the filename)
+    """
+    args=list(args)
+    command='run'
+    if args and not args[0].startswith('-'):
+        command=args.pop(0)
+    repeat=3
+    scale=1.0
+    only=None
+    jsonFile=None
+    baselineFile=None
+    threshold=0.25
+    files=[]
+    for arg in args:
+        av=[a.strip() for a in arg.split('=',1)]
+        if av[0]=='--repeat':
+            repeat=int(av[1])
+        elif av[0]=='--scale':
+            scale=float(av[1])
+        elif av[0]=='--only':
+            only=av[1]
+        elif av[0]=='--json':
+            jsonFile=av[1]
+        elif av[0]=='--baseline':
+            baselineFile=av[1]
+        elif av[0]=='--threshold':
+            threshold=float(av[1])
+        elif not arg.startswith('-'):
+            files.append(arg)
+        else:
+            return _usage()
+    if command=='compare':
+        if len(files)!=2:
+            return _usage()
+        problems=compareResults(_load(files[0]),_load(files[1]),threshold)
+    elif command=='run' and not files:
+        workDir=tempfile.mkdtemp(prefix='queryToolsBench')
+        try:
+            benchmarks=allBenchmarks(scale,workDir)
+            if only is not None:
+                benchmarks=[b for b in benchmarks if only in b[0]]
+            results=runBenchmarks(benchmarks,repeat)
+        finally:
+            shutil.rmtree(workDir)
+        print('%-60s %10s %12s %s'%('benchmark','seconds','peak bytes','ok'))
+        for name,result in results.items():
+            print('%-60s %10.5f %12s %s'%(name,result['seconds'],
+                result['peakBytes'] if result['peakBytes'] is not None else '-',
+                'ok' if result['ok'] else 'WRONG'))
+        if jsonFile is not None:
+            with open(jsonFile,'w',encoding='utf-8') as f:
+                json.dump(_document(results,scale),f,indent=2)
+        baseline=_load(baselineFile) if baselineFile is not None else {}
+        problems=compareResults(baseline,results,threshold)
+    else:
+        return _usage()
+    for problem in problems:
+        print('REGRESSION '+problem)
+    return 1 if problems else 0
+
+
+if __name__=='__main__':
+    sys.exit(cmdline(sys.argv[1:]))
@@ -0,0 +1,141 @@
+"""
+Deterministic in-memory trees for benchmarking
+
+Every generator gives the same tree for the same arguments, so timings
+can be compared from one run (or one machine) to the next.
+
+Shapes:
+    wide - one directory with a great many files
+    deep - a long chain of directories with a few files at each level
+    balanced - every directory has the same number of children
+    filesystem - directory and file names, fan-out and depth that
+        look like a real disk
+"""
+import typing
+import random
+import queryTools
+
+
+_EXTENSIONS=('exe','dll','txt','tmp','log','py','json','xml')
+_DIRECTORY_NAMES=('windows','system32','users','bob','alice','program files',
+    'temp','cache','src','lib','bin','docs','foo','bar','config','data')
+
+
+def wideTree(width:int=5000,seed:int=1)->queryTools.TreeLike:
+    """
+    One directory with a great many files in it
+    (built with primativeAsTree from a list)
+    """
+    rand=random.Random(seed)
+    names=['file%05d.%s'%(i,rand.choice(_EXTENSIONS)) for i in range(width)]
+    return queryTools.primativeAsTree({'wide':names})
+
+
+def deepTree(depth:int=200,filesPerLevel:int=3,seed:int=1)->queryTools.TreeLike:
+    """
+    A long chain of directories with a few files at each level
+    (built with primativeAsTree from nested dicts)
+    """
+    rand=random.Random(seed)
+    prim:typing.Dict[str,typing.Any]={}
+    level=prim
+    for i in range(depth):
+        for j in range(filesPerLevel):
+            level['file%d.%s'%(j,rand.choice(_EXTENSIONS))]=None
+        nextLevel:typing.Dict[str,typing.Any]={}
+        level['level%d'%i]=nextLevel
+        level=nextLevel
+    return queryTools.primativeAsTree(prim)
+
+
+def balancedTree(
+    branching:int=4,
+    depth:int=6,
+    treeType:typing.Callable[...,queryTools.TreeLike]=queryTools.Tree
+    )->queryTools.TreeLike:
+    """
+    Every directory has the same number of children,
+    and every leaf is at the same depth
+    (built directly out of Tree objects)
+
+    :treeType: the kind of tree node to create (eg, Tree or CompactTree)
+    """
+    root=treeType()
+    level=[root]
+    for d in range(depth):
+        nextLevel=[]
+        for node in level:
+            for i in range(branching):
+                if d==depth-1:
+                    name='leaf%d.%s'%(i,_EXTENSIONS[i%len(_EXTENSIONS)])
+                else:
+                    name='n%d'%i
+                child=treeType(name=name,parent=node)
+                node.children.append(child)
+                nextLevel.append(child)
+        level=nextLevel
+    return root
+
+
+def filesystemTree(
+    numDirs:int=2000,
+    maxFilesPerDir:int=30,
+    maxDepth:int=8,
+    seed:int=1
+    )->queryTools.TreeLike:
+    """
+    Directory and file names, fan-out and depth that look like a real disk
+    (built with primativeAsTree from nested dicts)
+
+    :numDirs: how many directories to make in all
+    """
+    rand=random.Random(seed)
+    prim:typing.Dict[str,typing.Any]={}
+    dirs:typing.List[typing.Tuple[typing.Dict[str,typing.Any],int]]=[(prim,0)]
+    for name in ('windows','users','program files'):
+        child:typing.Dict[str,typing.Any]={}
+        prim[name]=child
+        dirs.append((child,1))
+    while len(dirs)<numDirs:
+        # deeper directories are less likely to get more children
+        parent,depth=rand.choice(dirs)
+        if depth>=maxDepth or rand.random()<depth/(maxDepth*2):
+            continue
+        name=rand.choice(_DIRECTORY_NAMES)
+        if name in parent:
+            name='%s%d'%(name,rand.randrange(1000))
+        if name in parent:
+            continue
+        child={}
+        parent[name]=child
+        dirs.append((child,depth+1))
+    for directory,_ in dirs:
+        for i in range(rand.randrange(maxFilesPerDir)):
+            directory['file%d.%s'%(i,rand.choice(_EXTENSIONS))]=None
+    return queryTools.primativeAsTree(prim)
+
+
+def allNodes(tree:queryTools.TreeLike)->typing.List[queryTools.TreeLike]:
+    """
+    every node in a tree, breadth-first (root included)
+    """
+    ret=[tree]
+    i=0
+    while i<len(ret):
+        ret.extend(ret[i].children)
+        i+=1
+    return ret
+
+
+def nodeNames(node:queryTools.TreeLike)->typing.List[str]:
+    """
+    names from below the root down to a node
+    (the same as what Query.matches() takes)
+    """
+    ret=[]
+    item:typing.Optional[queryTools.TreeLike]=node
+    while item is not None and item.parent is not None:
+        ret.append(item.name)
+        item=item.parent
+    ret.reverse()
+    return ret
@@ -0,0 +1,553 @@
+"""
+An array-based tree for when there are far too many nodes
+to have a python object for each one.
+
+Layout:
+    nodes are numbered breadth-first, so the root is 0, each level
+    is a contiguous run of nodes, and so are the children of any node
+    parents[i] - index of the parent of node i (-1 for the root)
+    nameIds[i] - index into names for the name of node i
+    names - the table of unique names
+    childOffsets - CSR-style, the children of node i are
+        childOffsets[i] up to (but not including) childOffsets[i+1]
+    levelOffsets - nodes at depth d are
+        levelOffsets[d] up to (but not including) levelOffsets[d+1]
+
+If numpy is installed, queries run a whole level at a time as array
+operations, and each regex/glob step is only evaluated once per unique name.
+Otherwise it still works, it just goes node by node.
+
+save() writes the arrays to a file that open() memory maps rather
+than reads, so opening even a very large tree is instant and
+processes that open the same file share the memory.
+"""
+import typing
+import sys
+import mmap
+import struct
+from array import array
+from collections import deque
+import queryTools
+try:
+    import numpy
+except ImportError:
+    numpy=None # type: ignore
+
+
+class ColumnarNode:
+    """
+    A lightweight TreeLike view of a single node in a ColumnarTree
+
+    These are created when asked for and not kept around, so two
+    views of the same node compare equal without being the same object.
+    """
+
+    __slots__=('tree','index')
+
+    # never changes (see FindCache)
+    generation:int=0
+    # made from a tree, so it cannot loop
+    isAcyclic:bool=True
+    # but the same node can be two different objects
+    visitedMode:int=queryTools.Tape.__VISITED_HASH__
+
+    def __init__(self,tree:"ColumnarTree",index:int):
+        self.tree=tree
+        self.index=index
+
+    @property
+    def name(self)->str:
+        """
+        name of this item
+        """
+        return self.tree.names[self.tree.nameIds[self.index]]
+
+    @property
+    def parent(self)->typing.Optional["ColumnarNode"]:
+        """
+        parent of this item
+        """
+        parentIdx=self.tree.parents[self.index]
+        if parentIdx<0:
+            return None
+        return ColumnarNode(self.tree,parentIdx)
+
+    @property
+    def children(self)->typing.Iterable["ColumnarNode"]:
+        """
+        children of this item
+        """
+        tree=self.tree
+        for idx in range(tree.childOffsets[self.index],tree.childOffsets[self.index+1]):
+            yield ColumnarNode(tree,idx)
+
+    @property
+    def pathSegments(self)->typing.Iterable[str]:
+        """
+        get the path to this item
+        """
+        return self.tree.pathSegments(self.index)
+
+    @property
+    def path(self)->str:
+        """
+        get the path to this item
+        """
+        return '/'+('/'.join(self.pathSegments))
+
+    def findWithAutomaton(self,
+        automaton:"queryTools.QueryAutomaton"
+        )->typing.Optional[typing.Iterable["ColumnarNode"]]:
+        """
+        Let the tree run the query, if it can
+        """
+        return self.tree.findWithAutomaton(automaton,self.index)
+
+    def countWithAutomaton(self,automaton:"queryTools.QueryAutomaton")->typing.Optional[int]:
+        """
+        Let the tree count the results of a query, if it can
+        """
+        return self.tree.countWithAutomaton(automaton,self.index)
+
+    def __eq__(self,other:typing.Any)->bool:
+        return isinstance(other,ColumnarNode) \
+            and other.tree is self.tree and other.index==self.index
+
+    def __hash__(self)->int:
+        return hash((id(self.tree),self.index))
+
+    def __repr__(self)->str:
+        return 'ColumnarNode(%d, name=%r)'%(self.index,self.name)
+
+
+class _MappedNames:
+    """
+    The name table of a memory mapped ColumnarTree
+
+    (names are only decoded when asked for)
+    """
+
+    __slots__=('offsets','data')
+
+    def __init__(self,offsets:typing.Any,data:typing.Any):
+        """
+        :offsets: name i is data[offsets[i]:offsets[i+1]]
+        :data: all of the names, utf-8 encoded, one after the other
+        """
+        self.offsets=offsets
+        self.data=data
+
+    def __len__(self)->int:
+        return len(self.offsets)-1
+
+    def __getitem__(self,idx:int)->str:
+        if idx<0:
+            idx+=len(self)
+        return bytes(self.data[self.offsets[idx]:self.offsets[idx+1]]).decode('utf-8')
+
+    def __iter__(self)->typing.Iterator[str]:
+        for idx in range(len(self)):
+            yield self[idx]
+
+
+class ColumnarTree:
+    """
+    An array-based tree for when there are far too many nodes
+    to have a python object for each one.
+
+    (See module docstring for the layout)
+
+    Create with ColumnarTree.fromPrimative(), ColumnarTree.fromTree()
+    or ColumnarTree.open()
+    """
+
+    # never changes (see FindCache)
+    generation:int=0
+
+    __MAGIC__=b'QTCOLUMN'
+    __VERSION__=1
+    # magic, version, little endian, nodes, names, levels, name bytes
+    __HEADER__=struct.Struct('<8s6q')
+
+    def __init__(self):
+        self.names:typing.Sequence[str]=[]
+        self.parents:typing.Any=array('q')
+        self.nameIds:typing.Any=array('q')
+        self.childOffsets:typing.Any=array('q')
+        self.levelOffsets:typing.Any=array('q')
+        # what the arrays are in, and views of it, if made with open() or fromBuffer()
+        self._owner:typing.Any=None
+        self._views:typing.List[memoryview]=[]
+
+    @classmethod
+    def fromPrimative(cls,
+        prim:typing.Union[
+            typing.Iterable[typing.Union[str,typing.Iterable]],
+            typing.Dict[str,typing.Any]
+        ])->"ColumnarTree":
+        """
+        Same as primativeAsTree(), but without creating any Tree objects
+        """
+        def primChildren(prim:typing.Any)->typing.Iterable[typing.Tuple[str,typing.Any]]:
+            if prim is None:
+                return
+            if hasattr(prim,'items'):
+                for k,v in prim.items():
+                    if isinstance(v,(str,int,float,bool)):
+                        v=[str(v)]
+                    yield k,v
+            else:
+                for item in prim:
+                    if isinstance(item,str):
+                        yield item,None
+                    else:
+                        yield '',item
+        return cls._build('',prim,primChildren)
+
+    @classmethod
+    def fromTree(cls,tree:queryTools.TreeLike)->"ColumnarTree":
+        """
+        Copy any TreeLike into a ColumnarTree
+
+        (the tree must not have any loops)
+        """
+        def treeChildren(item:typing.Any)->typing.Iterable[typing.Tuple[str,typing.Any]]:
+            for child in item.children:
+                yield child.name,child
+        return cls._build(tree.name,tree,treeChildren)
+
+    @classmethod
+    def _build(cls,
+        rootName:str,
+        root:typing.Any,
+        getChildren:typing.Callable[[typing.Any],typing.Iterable[typing.Tuple[str,typing.Any]]]
+        )->"ColumnarTree":
+        """
+        Build the arrays breadth-first
+        """
+        ret=cls()
+        names:typing.List[str]=[]
+        ret.names=names
+        nameTable:typing.Dict[str,int]={}
+        def nameId(name:str)->int:
+            idx=nameTable.get(name)
+            if idx is None:
+                idx=len(names)
+                nameTable[name]=idx
+                names.append(name)
+            return idx
+        ret.parents.append(-1)
+        ret.nameIds.append(nameId(rootName))
+        ret.levelOffsets.append(0)
+        todo:typing.Deque[typing.Tuple[int,int,typing.Any]]=deque([(0,0,root)])
+        currentDepth=0
+        while todo:
+            idx,depth,item=todo.popleft()
+            if depth!=currentDepth:
+                ret.levelOffsets.append(idx)
+                currentDepth=depth
+            ret.childOffsets.append(len(ret.parents))
+            for name,child in getChildren(item):
+                todo.append((len(ret.parents),depth+1,child))
+                ret.parents.append(idx)
+                ret.nameIds.append(nameId(name))
+        ret.childOffsets.append(len(ret.parents))
+        ret.levelOffsets.append(len(ret.parents))
+        return ret
+
+    def serialize(self)->typing.List[bytes]:
+        """
+        get the pieces of the tree in the format save() writes
+        (all of them one after the other)
+        """
+        encoded=[name.encode('utf-8') for name in self.names]
+        nameOffsets=array('q',[0])
+        for data in encoded:
+            nameOffsets.append(nameOffsets[-1]+len(data))
+        ret=[self.__HEADER__.pack(self.__MAGIC__,self.__VERSION__,
+            1 if sys.byteorder=='little' else 0,
+            len(self.parents),len(encoded),len(self.levelOffsets),nameOffsets[-1])]
+        for values in (self.parents,self.nameIds,self.childOffsets,self.levelOffsets,nameOffsets):
+            ret.append(array('q',values).tobytes())
+        ret.append(b''.join(encoded))
+        return ret
+
+    def save(self,filename:str)->None:
+        """
+        Write the tree to a file that can be memory mapped with open()
+        """
+        with open(filename,'wb') as f:
+            for data in self.serialize():
+                f.write(data)
+
+    @classmethod
+    def open(cls,filename:str)->"ColumnarTree":
+        """
+        Memory map a file written by save()
+
+        Nothing is read up front, so this is instant no matter how big
+        the tree is, and processes that open the same file share its memory.
+        Call close() when done (or just let it be garbage collected).
+        """
+        with open(filename,'rb') as f:
+            mm=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        try:
+            return cls.fromBuffer(mm,mm)
+        except Exception:
+            mm.close()
+            raise
+
+    @classmethod
+    def fromBuffer(cls,
+        buffer:typing.Any,
+        owner:typing.Any=None
+        )->"ColumnarTree":
+        """
+        Use a tree in the format save() writes straight out of
+        a buffer (eg, an mmap or shared memory), without copying it
+
+        :owner: closed by close() (eg, the mmap)
+        """
+        view=memoryview(buffer)
+        try:
+            magic,version,little,numNodes,numNames,numLevels,numBytes= \
+                cls.__HEADER__.unpack_from(view)
+            if magic!=cls.__MAGIC__ or version!=cls.__VERSION__:
+                raise ValueError('not a ColumnarTree')
+            if bool(little)!=(sys.byteorder=='little'):
+                raise ValueError('the ColumnarTree was saved on a machine with a different byte order')
+            ret=cls()
+            offset=cls.__HEADER__.size
+            arrays=[]
+            for count in (numNodes,numNodes,numNodes+1,numLevels,numNames+1):
+                arrays.append(view[offset:offset+count*8].cast('q'))
+                offset+=count*8
+            data=view[offset:offset+numBytes]
+        except Exception:
+            view.release()
+            raise
+        ret.parents,ret.nameIds,ret.childOffsets,ret.levelOffsets,nameOffsets=arrays
+        ret.names=_MappedNames(nameOffsets,data)
+        ret._owner=owner
+        ret._views=arrays+[data,view]
+        return ret
+
+    @classmethod
+    def _dataSize(cls,buffer:typing.Any)->int:
+        """
+        how many bytes at the start of a buffer the tree takes up
+        (so other things can be saved after it)
+        """
+        _,_,_,numNodes,numNames,numLevels,numBytes=cls.__HEADER__.unpack_from(buffer)
+        return cls.__HEADER__.size+(numNodes*3+1+numLevels+numNames+1)*8+numBytes
+
+    def close(self)->None:
+        """
+        Let go of the buffer, if this was made with open() or fromBuffer()
+
+        (the tree cannot be used after this)
+        """
+        if not self._views:
+            return
+        self.names=[]
+        self.parents=self.nameIds=self.childOffsets=self.levelOffsets=array('q')
+        for view in self._views:
+            view.release()
+        self._views=[]
+        if self._owner is not None:
+            self._owner.close()
+            self._owner=None
+
+    def __len__(self)->int:
+        return len(self.parents)
+
+    @property
+    def root(self)->ColumnarNode:
+        """
+        the root node
+        """
+        return ColumnarNode(self,0)
+
+    def node(self,index:int)->ColumnarNode:
+        """
+        get a TreeLike view of a node
+        """
+        return ColumnarNode(self,index)
+
+    def pathSegments(self,index:int)->typing.List[str]:
+        """
+        get the path to a node
+        """
+        ret=[]
+        while index>=0:
+            ret.append(self.names[self.nameIds[index]])
+            index=self.parents[index]
+        ret.reverse()
+        return ret
+
+    def findWithAutomaton(self,
+        automaton:"queryTools.QueryAutomaton",
+        start:int=0
+        )->typing.Optional[typing.Iterable[ColumnarNode]]:
+        """
+        Run a compiled query a whole level at a time
+
+        :return: the results, or None if it cannot be done this way
+            (no numpy or too many states to fit in an int64 mask)
+        """
+        if not self._canFind(automaton):
+            return None
+        return (ColumnarNode(self,int(idx)) for idx in self._findIndices(automaton,start))
+
+    def countWithAutomaton(self,
+        automaton:"queryTools.QueryAutomaton",
+        start:int=0
+        )->typing.Optional[int]:
+        """
+        Count the results of a compiled query without creating any nodes
+
+        :return: the count, or None if it cannot be done this way
+        """
+        if not self._canFind(automaton):
+            return None
+        return sum(len(found) for found in self._findLevels(automaton,start))
+
+    @staticmethod
+    def _canFind(automaton:"queryTools.QueryAutomaton")->bool:
+        """
+        whether a query can be run a level at a time
+        (needs numpy, and few enough states to fit in an int64 mask)
+        """
+        if numpy is None:
+            return False
+        for segment in automaton.segments:
+            if segment.acceptMask.bit_length()>62:
+                return False
+        return True
+
+    def _findIndices(self,
+        automaton:"queryTools.QueryAutomaton",
+        start:int
+        )->typing.Generator[int,None,None]:
+        """
+        Yields the indices of all matching nodes in breadth-first order
+        """
+        for found in self._findLevels(automaton,start):
+            yield from found.tolist()
+
+    def _findLevels(self,
+        automaton:"queryTools.QueryAutomaton",
+        start:int
+        )->typing.Generator[typing.Any,None,None]:
+        """
+        Yields arrays of the indices of matching nodes, a level at a time
+        """
+        parents=numpy.frombuffer(self.parents,dtype=numpy.int64)
+        # per matcher, whether each unique name matches (-1=not checked yet)
+        nameMatches:typing.Dict[typing.Any,typing.Any]={}
+        starts=numpy.array([start],dtype=numpy.int64)
+        lastIdx=len(automaton.segments)-1
+        for i,segment in enumerate(automaton.segments):
+            if i>0:
+                # __PARENTDIR_STEP__ between segments
+                starts=parents[starts]
+                starts=numpy.unique(starts[starts>=0])
+            masks=numpy.full(len(starts),segment.startMask,dtype=numpy.int64)
+            levels=self._walkLevels(segment,starts,masks,nameMatches)
+            if i==lastIdx:
+                yield from levels
+            else:
+                results=list(levels)
+                if not results:
+                    return
+                starts=numpy.unique(numpy.concatenate(results))
+
+    def _walkLevels(self,
+        segment:"queryTools.QuerySegment",
+        frontier:typing.Any,
+        masks:typing.Any,
+        nameMatches:typing.Dict[typing.Any,typing.Any]
+        )->typing.Generator[typing.Any,None,None]:
+        """
+        Run one segment a level at a time, yielding an array
+        of the indices of the matching nodes in each level
+
+        :frontier: sorted array of the nodes to start from
+            (which can be at different depths)
+        :masks: array of the active states at each of them
+        :nameMatches: per matcher, whether each unique name matches
+            (-1=not checked yet), shared between calls
+        """
+        nameIds=numpy.frombuffer(self.nameIds,dtype=numpy.int64)
+        childOffsets=numpy.frombuffer(self.childOffsets,dtype=numpy.int64)
+        levelOffsets=numpy.frombuffer(self.levelOffsets,dtype=numpy.int64)
+        # nodes are numbered breadth-first, so deeper starts come later
+        # and wait until the walk gets down to their level
+        seeds=frontier
+        seedMasks=masks
+        frontier=seeds[:0]
+        masks=seedMasks[:0]
+        depth=0
+        while len(frontier) or len(seeds):
+            if not len(frontier):
+                depth=int(numpy.searchsorted(levelOffsets,seeds[0],'right'))-1
+            numSeeds=int(numpy.searchsorted(seeds,levelOffsets[depth+1]))
+            if numSeeds:
+                frontier,masks=self._mergeStates(
+                    numpy.concatenate((frontier,seeds[:numSeeds])),
+                    numpy.concatenate((masks,seedMasks[:numSeeds])))
+                seeds=seeds[numSeeds:]
+                seedMasks=seedMasks[numSeeds:]
+            depth+=1
+            accepted=frontier[(masks&segment.acceptMask)!=0]
+            if len(accepted):
+                yield accepted
+            live=(masks&segment.liveMask)!=0
+            frontier=frontier[live]
+            masks=masks[live]
+            # expand to all children
+            firsts=childOffsets[frontier]
+            counts=childOffsets[frontier+1]-firsts
+            total=int(counts.sum())
+            if not total:
+                frontier=frontier[:0]
+                masks=masks[:0]
+                continue
+            ends=numpy.cumsum(counts)
+            children=numpy.arange(total,dtype=numpy.int64) \
+                +numpy.repeat(firsts-(ends-counts),counts)
+            parentMasks=numpy.repeat(masks,counts)
+            childNameIds=nameIds[children]
+            childMasks=numpy.zeros(total,dtype=numpy.int64)
+            for mask in numpy.unique(masks).tolist():
+                selected=parentMasks==mask
+                for kind,matcher,resultMask in segment._transitionsFor(mask):
+                    if kind==segment.__MATCH__:
+                        table=nameMatches.get(matcher)
+                        if table is None:
+                            table=numpy.full(len(self.names),-1,dtype=numpy.int8)
+                            nameMatches[matcher]=table
+                        ids=childNameIds[selected]
+                        unknown=numpy.unique(ids[table[ids]<0])
+                        for nameIdx in unknown.tolist():
+                            table[nameIdx]=1 if matcher(self.names[nameIdx]) else 0
+                        hit=numpy.zeros(total,dtype=bool)
+                        hit[selected]=table[ids]==1
+                        childMasks[hit]|=resultMask
+                    else:
+                        childMasks[selected]|=resultMask
+            keep=childMasks!=0
+            frontier=children[keep]
+            masks=childMasks[keep]
+
+    @staticmethod
+    def _mergeStates(nodes:typing.Any,masks:typing.Any)->typing.Tuple[typing.Any,typing.Any]:
+        """
+        Sort the nodes and merge the states of any that are there more than once
+
+        :return: (nodes,masks)
+        """
+        nodes,inverse=numpy.unique(nodes,return_inverse=True)
+        merged=numpy.zeros(len(nodes),dtype=numpy.int64)
+        numpy.bitwise_or.at(merged,inverse.reshape(-1),masks)
+        return nodes,merged
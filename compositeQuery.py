@@ -0,0 +1,236 @@
+"""
+Combine queries with | (union), & (intersection) and - (difference)
+
+Usage:
+    q=GlobQuery('/**/*.exe')-GlobQuery('/windows/**')
+    for item in q.find(root):
+        print(item.path)
+
+Details:
+    all of the queries in the expression are put into one QuerySet,
+        so queries that start with the same steps share them, and the
+        whole expression is run in a single traversal of the tree
+    a node is a result when the expression is true for the queries
+        it matched
+    the states at each node also say which queries could still match
+        at or under it, so whenever the expression can no longer be true
+        (eg, either side of an & can no longer match) the whole subtree
+        is skipped
+    the answers to both of these are remembered per set of active
+        states, so most nodes cost only a dict lookup more than a
+        plain query
+    if any of the queries cannot be run walking down the tree
+        (eg, ones with a .. step), nothing can be skipped, and the
+        results of those come after the rest
+"""
+import typing
+import queryTools
+
+
+# either the number of a query, or (operator,left,right)
+Expression=typing.Union[int,typing.Tuple[str,typing.Any,typing.Any]]
+
+
+class CompositeQuery(queryTools.Query):
+    """
+    Queries combined with | (union), & (intersection) and - (difference)
+
+    (See module docstring for details)
+
+    Usually created by using the operators on queries rather than directly
+    """
+
+    __UNION__='|'
+    __INTERSECTION__='&'
+    __DIFFERENCE__='-'
+
+    def __init__(self,
+        operator:str,
+        left:queryTools.Query,
+        right:queryTools.Query):
+        """
+        :operator: one of "|", "&", or "-"
+        """
+        if operator not in (self.__UNION__,self.__INTERSECTION__,self.__DIFFERENCE__):
+            raise ValueError('Unknown query operator "%s"'%operator)
+        self.operator=operator
+        self.left=left
+        self.right=right
+        self._queryString='(%s %s %s)'%(left.queryString,operator,right.queryString)
+        self._ignoreCase=left.ignoreCase and right.ignoreCase
+        # cannot be run as a single list of steps (see queries)
+        self._querySteps=()
+        self._plan=None
+        self._automaton=None
+        self._queries:typing.List[queryTools.Query]=[]
+        self._expression=self._flatten(self)
+        self._querySet=queryTools.QuerySet(self._queries)
+        # per set of active states, whether it is a result / could still lead to one
+        self._accepts:typing.Dict[int,bool]={}
+        self._possible:typing.Dict[int,bool]={}
+
+    @property
+    def queries(self)->typing.List[queryTools.Query]:
+        """
+        all of the queries in the expression
+        """
+        return self._queries
+
+    def _flatten(self,query:queryTools.Query)->Expression:
+        """
+        turn nested CompositeQuerys into one expression over self._queries
+        """
+        if isinstance(query,CompositeQuery):
+            return (query.operator,self._flatten(query.left),self._flatten(query.right))
+        for i,existing in enumerate(self._queries):
+            if existing is query:
+                return i
+        self._queries.append(query)
+        return len(self._queries)-1
+
+    def _evaluate(self,
+        expression:Expression,
+        matched:typing.Container[int]
+        )->bool:
+        """
+        whether the expression is true, given which queries matched
+        """
+        if isinstance(expression,int):
+            return expression in matched
+        operator,left,right=expression
+        if operator==self.__UNION__:
+            return self._evaluate(left,matched) or self._evaluate(right,matched)
+        if operator==self.__INTERSECTION__:
+            return self._evaluate(left,matched) and self._evaluate(right,matched)
+        return self._evaluate(left,matched) and not self._evaluate(right,matched)
+
+    def _canBeTrue(self,
+        expression:Expression,
+        reachable:typing.Container[int]
+        )->bool:
+        """
+        whether the expression could be true, given which queries
+        could still match
+        """
+        if isinstance(expression,int):
+            return expression in reachable
+        operator,left,right=expression
+        if operator==self.__UNION__:
+            return self._canBeTrue(left,reachable) or self._canBeTrue(right,reachable)
+        if operator==self.__INTERSECTION__:
+            return self._canBeTrue(left,reachable) and self._canBeTrue(right,reachable)
+        # whatever the right side does, it can only take results away
+        return self._canBeTrue(left,reachable)
+
+    def _keep(self,mask:int)->bool:
+        """
+        whether a node with these active states is worth looking at
+        """
+        ret=self._possible.get(mask)
+        if ret is None:
+            ret=self._canBeTrue(self._expression,self._querySet._reachableIds(mask))
+            self._possible[mask]=ret
+        return ret
+
+    def assign(self,
+        queryString:str,
+        ignoreCase:bool=False
+        )->None:
+        """
+        A CompositeQuery is made from other queries, not a string
+        """
+        raise TypeError('a CompositeQuery cannot be assigned a query string')
+
+    @property
+    def automaton(self)->"queryTools.QueryAutomaton":
+        """
+        A CompositeQuery is not a single state machine
+        """
+        raise TypeError('a CompositeQuery does not have a single automaton')
+
+    @property
+    def prefilterStats(self)->"queryTools.PrefilterStats":
+        """
+        how many names were thrown out by literal checks
+        without running a regex, over all of the queries
+        """
+        ret=queryTools.PrefilterStats()
+        for query in self._queries:
+            ret.add(query.prefilterStats)
+        return ret
+
+    def explain(self,stats:typing.Optional["queryTools.QueryStats"]=None)->str:
+        """
+        Describe how the query will be run
+
+        :stats: not used (the queries are run together)
+        """
+        querySet=self._querySet
+        if not querySet._compiled:
+            querySet._compile()
+        lines=['CompositeQuery(%r)'%self.queryString]
+        lines.append('  %d queries sharing %d states in a single traversal'%(
+            len(self._queries),len(querySet._states)))
+        for i,query in enumerate(self._queries):
+            how='on its own' if i in querySet._separate else 'merged'
+            lines.append('  %3d %-10s %s(%r)'%(i,how,query.__class__.__name__,query.queryString))
+        return '\n'.join(lines)
+
+    def matches(self,
+        path:typing.Union[str,typing.List[str]]
+        )->bool:
+        """
+        check to see if a path matches this query
+        """
+        return self._evaluate(self._expression,set(self._querySet.matches(path)))
+
+    async def afind(self,
+        tree:typing.Union[queryTools.TreeLike,queryTools.AsyncTreeLike],
+        concurrency:int=16,
+        maxBuffered:int=64
+        )->typing.AsyncGenerator[typing.Any,None]:
+        """
+        Finds items in a tree whose children have to be awaited
+        (see Query.afind)
+
+        Each query is run on its own, one after the other, so nothing
+        comes out until they are all done, and results are in the order
+        the queries first found them rather than breadth-first.
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        """
+        key=queryTools.queryAutomaton._visitKeyFor(tree)
+        # node key -> (node,ids of the queries that found it)
+        found:typing.Dict[typing.Hashable,typing.Tuple[typing.Any,typing.Set[int]]]={}
+        for i,query in enumerate(self._queries):
+            async for node in query.afind(tree,concurrency,maxBuffered):
+                found.setdefault(key(node),(node,set()))[1].add(i)
+        for node,ids in found.values():
+            if self._evaluate(self._expression,ids):
+                yield node
+
+    def find(self,
+        tree:queryTools.TreeLike,
+        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]=None
+        )->typing.Generator[queryTools.TreeLike,None,None]:
+        """
+        Finds items in the tree using a breadth-first search
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        """
+        querySet=self._querySet
+        if not querySet._compiled:
+            querySet._compile()
+        if querySet._separate:
+            for node,_,ids in querySet._find(tree,_tape):
+                if self._evaluate(self._expression,set(ids)):
+                    yield node
+            return
+        accepts=self._accepts
+        for node,mask,ids in querySet._find(tree,_tape,self._keep):
+            accepted=accepts.get(mask)
+            if accepted is None:
+                accepted=self._evaluate(self._expression,set(ids))
+                accepts[mask]=accepted
+            if accepted:
+                yield node
@@ -0,0 +1,187 @@
+"""
+An opt-in cache of find() results, for running the same
+queries over and over on a tree that does not change much
+
+Usage:
+    cache=FindCache()
+    for item in query.find(root,cache=cache):
+        ...
+    print(cache.hitRate)
+
+Details:
+    results are keyed by (compiled query,start node), and remember the
+        generation of the start node when they were found
+    a tree that supports this has a generation property that goes up
+        whenever the item or anything under it changes
+        (Tree and CompactTree do this by bumping every ancestor
+        when a name, parent, or list of children changes, and
+        ColumnarTree never changes)
+    so a change only makes the cached results for its ancestors stale,
+        and those are found again the next time they are asked for
+    queries with .. in them can see outside of the start node,
+        so they also check the generations of all its ancestors
+    trees without a generation (eg, FsTree, since the disk can change
+        behind its back) are always searched and never cached
+    the least recently used results are thrown away when there are more
+        than maxEntries queries, or more than maxResults nodes, being kept
+"""
+import typing
+import threading
+from collections import OrderedDict
+import queryTools
+
+
+class _CacheEntry:
+    """
+    Cached results of one query on one start node
+    """
+
+    __slots__=('automaton','start','version','results')
+
+    def __init__(self,
+        automaton:"queryTools.QueryAutomaton",
+        start:typing.Any,
+        version:typing.Tuple[int,...],
+        results:typing.Tuple[typing.Any,...]):
+        # kept so that their ids cannot be reused while they are cached
+        self.automaton=automaton
+        self.start=start
+        self.version=version
+        self.results=results
+
+
+class FindCache:
+    """
+    A bounded, least-recently-used cache of find() results
+    that goes stale when the tree changes
+
+    (See module docstring for details)
+    """
+
+    def __init__(self,maxEntries:int=256,maxResults:int=1000000):
+        """
+        :maxEntries: the most (query,start node) results to keep
+        :maxResults: the most result nodes to keep, all told
+        """
+        self.maxEntries=maxEntries
+        self.maxResults=maxResults
+        self._entries:typing.OrderedDict[typing.Tuple[int,int],_CacheEntry]=OrderedDict()
+        self._numResults=0
+        self._lock=threading.Lock()
+        self.hits:int=0
+        self.misses:int=0
+        # misses because the tree had changed
+        self.stale:int=0
+        self.evictions:int=0
+        # searches of trees that have no generation
+        self.uncacheable:int=0
+
+    @property
+    def hitRate(self)->float:
+        """
+        fraction of cacheable lookups that were hits
+        """
+        total=self.hits+self.misses
+        if not total:
+            return 0.0
+        return self.hits/total
+
+    def __len__(self)->int:
+        return len(self._entries)
+
+    @staticmethod
+    def _version(
+        automaton:"queryTools.QueryAutomaton",
+        tree:typing.Any
+        )->typing.Optional[typing.Tuple[int,...]]:
+        """
+        the generations the results depend on,
+        or None if the tree does not keep them
+        """
+        generation=getattr(tree,'generation',None)
+        if generation is None:
+            return None
+        if len(automaton.segments)==1:
+            return (generation,)
+        ret=[generation]
+        item=getattr(tree,'parent',None)
+        while item is not None:
+            generation=getattr(item,'generation',None)
+            if generation is None:
+                return None
+            ret.append(generation)
+            item=item.parent
+        return tuple(ret)
+
+    def _evict(self)->None:
+        """
+        get rid of least recently used results until it fits
+
+        (call while locked)
+        """
+        while self._entries and (len(self._entries)>max(self.maxEntries,0)
+            or self._numResults>self.maxResults):
+            _,entry=self._entries.popitem(last=False)
+            self._numResults-=len(entry.results)
+            self.evictions+=1
+
+    def find(self,
+        automaton:"queryTools.QueryAutomaton",
+        tree:typing.Any,
+        search:typing.Callable[[],typing.Iterable[typing.Any]]
+        )->typing.Sequence[typing.Any]:
+        """
+        get cached results, or search and cache them
+
+        :automaton: the compiled query
+        :tree: where the search starts
+        :search: do the search, if need be
+        """
+        version=self._version(automaton,tree)
+        if version is None:
+            with self._lock:
+                self.uncacheable+=1
+            return list(search())
+        key=(id(automaton),id(tree))
+        with self._lock:
+            entry=self._entries.get(key)
+            if entry is not None and entry.start is tree and entry.automaton is automaton:
+                if entry.version==version:
+                    self._entries.move_to_end(key)
+                    self.hits+=1
+                    return entry.results
+                self.stale+=1
+            self.misses+=1
+        results=tuple(search())
+        if len(results)<=self.maxResults:
+            with self._lock:
+                old=self._entries.pop(key,None)
+                if old is not None:
+                    self._numResults-=len(old.results)
+                self._entries[key]=_CacheEntry(automaton,tree,version,results)
+                self._numResults+=len(results)
+                self._evict()
+        return results
+
+    def clear(self)->None:
+        """
+        throw away all cached results
+        """
+        with self._lock:
+            self._entries.clear()
+            self._numResults=0
+
+    def resetStats(self)->None:
+        """
+        set all the counts back to zero
+        """
+        with self._lock:
+            self.hits=0
+            self.misses=0
+            self.stale=0
+            self.evictions=0
+            self.uncacheable=0
+
+    def __repr__(self)->str:
+        return 'FindCache(%d entries, hits=%d, misses=%d, stale=%d, hitRate=%.3f)'%(
+            len(self._entries),self.hits,self.misses,self.stale,self.hitRate)
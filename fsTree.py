@@ -0,0 +1,232 @@
+"""
+A TreeLike view of a real directory on disk.
+
+Details:
+    nothing is read until it is asked for
+    directories are listed with os.scandir, and the file/directory
+        information that comes with each entry is kept, so
+        there are no extra stat() calls
+    child nodes are only created for the entries a query actually
+        goes to (see childSummary() and childAt())
+    a directory is listed at most once
+    since find() only asks for children when a query step could
+        still match below a node, directories that cannot match are
+        never listed at all, and files are never even looked at
+        unless they match
+    plain name steps (eg, /windows/system32) do not list the directory,
+        they only check that the one name exists
+"""
+import typing
+import os
+import sys
+import stat
+
+
+class _FsChildLookup:
+    """
+    Looks like a {name:[children]} dict, but only checks
+    the one name that was asked for.
+    """
+
+    __slots__=('node',)
+
+    def __init__(self,node:"FsTree"):
+        self.node=node
+
+    def get(self,
+        name:str,
+        default:typing.Iterable["FsTree"]=()
+        )->typing.Iterable["FsTree"]:
+        """
+        get the children with a given name
+        """
+        if not name or name in ('.','..') or os.sep in name \
+            or (os.altsep is not None and os.altsep in name):
+            return default
+        fsPath=os.path.join(self.node.path,name)
+        try:
+            if self.node.followSymlinks:
+                info=os.stat(fsPath)
+            else:
+                info=os.lstat(fsPath)
+        except (OSError,ValueError):
+            return default
+        return [self.node.__class__(fsPath,name,self.node,stat.S_ISDIR(info.st_mode))]
+
+
+class FsTree:
+    """
+    A TreeLike view of a real directory on disk.
+
+    Usage:
+        for item in GlobQuery('/**/*.exe').find(FsTree('c:/windows')):
+            print(item.path)
+    """
+
+    __slots__=('name','parent','_path','_isDir','_entries','_made','_children')
+
+    # follow symlinks to directories (beware of loops)
+    followSymlinks:bool=False
+
+    # look up plain names with a stat() instead of listing the directory
+    # (only safe when the filesystem is case sensitive)
+    lookupByStat:bool=os.name=='posix' and sys.platform!='darwin'
+
+    def __init__(self,
+        path:typing.Optional[str],
+        name:typing.Optional[str]=None,
+        parent:typing.Optional["FsTree"]=None,
+        isDir:typing.Optional[bool]=None):
+        """
+        :path: location on disk (can be None if there is a parent)
+        :name: name of this item (default=the last part of the path)
+        :parent: parent item
+        :isDir: if known, whether this is a directory
+        """
+        self._path=path
+        if name is None:
+            name=os.path.basename(os.path.normpath(path)) if parent is not None and path else ''
+        self.name:str=name
+        self.parent:typing.Optional[FsTree]=parent
+        self._isDir=isDir
+        # ([directory names],[file names]), once it has been listed
+        self._entries:typing.Optional[typing.Tuple[typing.List[str],typing.List[str]]]=None
+        # children that have been created so far, by (isLeaf,position)
+        self._made:typing.Optional[typing.Dict[typing.Tuple[bool,int],FsTree]]=None
+        self._children:typing.Optional[typing.List[FsTree]]=None
+
+    @property
+    def path(self)->str:
+        """
+        location on disk
+        """
+        if self._path is None:
+            self._path=os.path.join(typing.cast(FsTree,self.parent).path,self.name)
+        return self._path
+
+    @property
+    def isDir(self)->bool:
+        """
+        is this a directory?
+        """
+        if self._isDir is None:
+            if self.followSymlinks:
+                self._isDir=os.path.isdir(self.path)
+            else:
+                self._isDir=os.path.isdir(self.path) and not os.path.islink(self.path)
+        return self._isDir
+
+    @property
+    def isLeaf(self)->bool:
+        """
+        files cannot have children
+        """
+        return not self.isDir
+
+    @property
+    def isAcyclic(self)->bool:
+        """
+        there cannot be any loops unless symlinks are followed
+        """
+        return not self.followSymlinks
+
+    def childSummary(self)->typing.Tuple[typing.List[str],typing.List[str]]:
+        """
+        get the names of all children without creating them
+
+        (the directory is listed the first time this is called)
+
+        :return: ([directory names],[file names])
+        """
+        if self._entries is None:
+            dirs:typing.List[str]=[]
+            files:typing.List[str]=[]
+            if self.isDir:
+                followSymlinks=self.followSymlinks
+                try:
+                    with os.scandir(self.path) as scan:
+                        for entry in scan:
+                            try:
+                                isDir=entry.is_dir(follow_symlinks=followSymlinks)
+                            except OSError:
+                                isDir=False
+                            if isDir:
+                                dirs.append(entry.name)
+                            else:
+                                files.append(entry.name)
+                except OSError:
+                    # eg, permission denied or deleted out from under us
+                    pass
+            self._entries=(dirs,files)
+        return self._entries
+
+    def childAt(self,isLeaf:bool,index:int)->"FsTree":
+        """
+        get a child by its position in childSummary()
+        """
+        if self._made is None:
+            self._made={}
+        key=(isLeaf,index)
+        child=self._made.get(key)
+        if child is None:
+            child=self.__class__(None,self.childSummary()[isLeaf][index],self,not isLeaf)
+            self._made[key]=child
+        return child
+
+    @property
+    def children(self)->typing.List["FsTree"]:
+        """
+        everything in this directory (directories first)
+
+        (listed the first time it is asked for)
+        """
+        if self._children is None:
+            dirs,files=self.childSummary()
+            self._children=[self.childAt(False,i) for i in range(len(dirs))] \
+                +[self.childAt(True,i) for i in range(len(files))]
+        return self._children
+
+    def childIndex(self,
+        folded:bool=False
+        )->typing.Optional[typing.Union[_FsChildLookup,typing.Dict[str,typing.List["FsTree"]]]]:
+        """
+        get a {name:[children]} lookup
+
+        If the directory has not been listed, this only checks
+        the names that are asked for.
+        """
+        if not self.isDir:
+            return {}
+        if self._entries is None:
+            if folded or not self.lookupByStat:
+                # have to list it
+                return None
+            return _FsChildLookup(self)
+        index:typing.Dict[str,typing.List[FsTree]]={}
+        for isLeaf,names in enumerate(self._entries):
+            for i,name in enumerate(names):
+                if folded:
+                    name=name.lower()
+                index.setdefault(name,[]).append(self.childAt(bool(isLeaf),i))
+        return index
+
+    @property
+    def pathSegments(self)->typing.Iterable[str]:
+        """
+        get the names from the root to this item
+        """
+        ret=[]
+        item:typing.Optional[FsTree]=self
+        while item is not None:
+            ret.append(item.name)
+            item=item.parent
+        ret.reverse()
+        return ret
+
+    def __reduce__(self)->typing.Tuple[typing.Any,...]:
+        # (so it can be sent to another process without
+        # everything that has been listed so far)
+        return (self.__class__,(self._path,self.name,self.parent,self._isDir))
+
+    def __repr__(self)->str:
+        return 'FsTree(%r)'%self.path
@@ -13,12 +13,213 @@ Details:
         windows/*/*.exe
     "**" alone means "any descendent of"
         windows/**/*.exe
+
+Matching:
+    a step with no * or ? in it is a plain name (see LiteralStep)
+    the common forms are matched with plain string methods instead
+        of a regex (see GlobStep):
+            foo* - prefix        *.exe - suffix
+            *tmp* - contains     foo*.exe - prefix+suffix
+            file?.txt - a single ?
+    anything else (eg, a*b*c or a?b*) is a regex
+    with ignoreCase, the glob is lowercased once when it is compiled,
+        and so is each name when it is checked (names that are not
+        ascii go to the regex, since the regex engine's idea of
+        case folding is not the same as str.lower() for every character)
 """
 import typing
 import re
 import queryTools
 
 
+class GlobStep:
+    """
+    A glob query step matched with plain string methods instead of a regex
+
+    Looks enough like a compiled regex to be used in its place.
+    Create with compileGlobStep().
+
+    The equivalent regex is only compiled if something asks for it.
+    """
+
+    __PREFIX__='prefix'
+    __SUFFIX__='suffix'
+    __CONTAINS__='contains'
+    __PREFIX_SUFFIX__='prefix+suffix'
+    __SINGLE__='single ?'
+
+    __slots__=('glob','kind','ignoreCase','prefix','suffix','_regex','fullmatch')
+
+    def __init__(self,
+        glob:str,
+        kind:str,
+        prefix:str,
+        suffix:str,
+        ignoreCase:bool=False):
+        """
+        :glob: the glob this came from
+        :kind: which form it is (eg, GlobStep.__PREFIX__)
+        :prefix: text every match starts with (or contains, for __CONTAINS__)
+        :suffix: text every match ends with
+        """
+        self.glob=glob
+        self.kind=kind
+        self.ignoreCase=ignoreCase
+        if ignoreCase:
+            prefix=prefix.lower()
+            suffix=suffix.lower()
+        self.prefix=prefix
+        self.suffix=suffix
+        self._regex:typing.Optional[typing.Pattern]=None
+        self.fullmatch:typing.Callable[[str],typing.Any]=self._matcher()
+
+    def _matcher(self)->typing.Callable[[str],typing.Any]:
+        """
+        create the function that checks a name
+
+        (each one is a single small function, since a call costs about
+        as much as the checks themselves.  Like a regex, it returns
+        None when it does not match.)
+        """
+        prefix=self.prefix
+        suffix=self.suffix
+        kind=self.kind
+        minLength=len(prefix)+len(suffix)
+        if not self.ignoreCase:
+            if kind==self.__PREFIX__:
+                return lambda name:name.startswith(prefix) or None
+            if kind==self.__SUFFIX__:
+                return lambda name:name.endswith(suffix) or None
+            if kind==self.__CONTAINS__:
+                return lambda name:prefix in name or None
+            if kind==self.__PREFIX_SUFFIX__:
+                return lambda name:(len(name)>=minLength and name.startswith(prefix)
+                    and name.endswith(suffix)) or None
+            if kind==self.__SINGLE__:
+                return lambda name:(len(name)==minLength+1 and name.startswith(prefix)
+                    and name.endswith(suffix)) or None
+            raise ValueError('Unknown glob step kind "%s"'%kind)
+        # names that are not ascii are left to the regex
+        isAscii=queryTools.prefilter._isAscii
+        def regexFullmatch(name:str)->typing.Optional[typing.Match]:
+            return self.regex.fullmatch(name)
+        if kind==self.__PREFIX__:
+            return lambda name:(name.lower().startswith(prefix) or None) \
+                if isAscii(name) else regexFullmatch(name)
+        if kind==self.__SUFFIX__:
+            return lambda name:(name.lower().endswith(suffix) or None) \
+                if isAscii(name) else regexFullmatch(name)
+        if kind==self.__CONTAINS__:
+            return lambda name:(prefix in name.lower() or None) \
+                if isAscii(name) else regexFullmatch(name)
+        if kind not in (self.__PREFIX_SUFFIX__,self.__SINGLE__):
+            raise ValueError('Unknown glob step kind "%s"'%kind)
+        single=kind==self.__SINGLE__
+        def foldedMatch(name:str)->typing.Any:
+            if not isAscii(name):
+                return regexFullmatch(name)
+            if len(name)!=minLength+1 if single else len(name)<minLength:
+                return None
+            name=name.lower()
+            return (name.startswith(prefix) and name.endswith(suffix)) or None
+        return foldedMatch
+
+    @property
+    def regex(self)->typing.Pattern:
+        """
+        the equivalent regular expression, compiled
+        """
+        if self._regex is None:
+            self._regex=re.compile(_globRegex(self.glob),re.IGNORECASE if self.ignoreCase else 0)
+        return self._regex
+
+    def filterIndices(self,names:typing.Sequence[str])->typing.List[int]:
+        """
+        get the indices of all the names that fullmatch
+        """
+        fullmatch=self.fullmatch
+        return [i for i,name in enumerate(names) if fullmatch(name)]
+
+    def match(self,name:str)->typing.Optional[typing.Match]:
+        """
+        same as the regex's match()
+        """
+        return self.regex.match(name)
+
+    @property
+    def pattern(self)->str:
+        """
+        the equivalent regular expression
+        """
+        return self.regex.pattern
+
+    @property
+    def flags(self)->int:
+        """
+        the equivalent regular expression flags
+        """
+        return self.regex.flags
+
+    def __reduce__(self)->typing.Tuple[typing.Any,...]:
+        # the matcher is a closure, so make it again
+        return (compileGlobStep,(self.glob,self.ignoreCase))
+
+    def __eq__(self,other:typing.Any)->bool:
+        return isinstance(other,GlobStep) \
+            and other.glob==self.glob and other.ignoreCase==self.ignoreCase
+
+    def __hash__(self)->int:
+        return hash((self.glob,self.ignoreCase))
+
+    def __repr__(self)->str:
+        return 'GlobStep(%r, %s%s)'%(self.glob,self.kind,', ignoreCase=True' if self.ignoreCase else '')
+
+
+def _globRegex(glob:str)->str:
+    """
+    get the regex for a glob path step
+    """
+    return re.escape(glob).replace('\\*','.*').replace('\\?','.')
+
+
+def compileGlobStep(
+    glob:str,
+    ignoreCase:bool=False
+    )->typing.Union[typing.Pattern,GlobStep]:
+    """
+    Compile a single glob path step into a GlobStep if it is one of
+    the forms that can be matched with string methods,
+    otherwise into a regular expression
+    """
+    reFlags=re.IGNORECASE if ignoreCase else 0
+    while '**' in glob:
+        glob=glob.replace('**','*')
+    stars=glob.count('*')
+    questions=glob.count('?')
+    if (not stars and not questions) or (ignoreCase and not queryTools.prefilter._isAscii(glob)):
+        # a plain name, or case folding that only the regex can do
+        return re.compile(_globRegex(glob),reFlags)
+    kind=None
+    prefix=suffix=''
+    if not questions and stars==1:
+        prefix,_,suffix=glob.partition('*')
+        if not suffix:
+            kind=GlobStep.__PREFIX__
+        elif not prefix:
+            kind=GlobStep.__SUFFIX__
+        else:
+            kind=GlobStep.__PREFIX_SUFFIX__
+    elif not questions and stars==2 and glob.startswith('*') and glob.endswith('*'):
+        kind=GlobStep.__CONTAINS__
+        prefix=glob[1:-1]
+    elif questions==1 and not stars:
+        kind=GlobStep.__SINGLE__
+        prefix,_,suffix=glob.partition('?')
+    if kind is None:
+        return re.compile(_globRegex(glob),reFlags)
+    return GlobStep(glob,kind,prefix,suffix,ignoreCase)
+
+
 class GlobQuery(queryTools.ReQuery):
     r"""
     A query based upon glob expressions.
@@ -39,43 +240,9 @@ class GlobQuery(queryTools.ReQuery):
     def __init__(self,queryString:str,ignoreCase:bool=False):
         queryTools.ReQuery.__init__(self,queryString,ignoreCase)
 
-    def assign(self,queryString:str,ignoreCase:bool=False)->None:
+    def _compileStep(self,step:str,reFlags:int)->typing.Union[typing.Pattern,GlobStep]:
         """
-        Parse the query string into a searchable expression
+        Compile a single glob path step into a GlobStep
+        or a regular expression
         """
-        self._querySteps=[]
-        if ignoreCase:
-            reFlags=re.IGNORECASE
-        currentStep:typing.List[str]=[]
-        for c in queryString:
-            if c=='/':
-                current=''.join(currentStep)
-                if not current or current=='.':
-                    # could just as easily not add it instead
-                    self._querySteps.append(self.__SAMEDIR_STEP__)
-                elif current=='..':
-                    self._querySteps.append(self.__PARENTDIR_STEP__)
-                elif current=='*':
-                    self._querySteps.append(self.__CHILDOF_STEP__)
-                elif current=='**':
-                    self._querySteps.append(self.__DESCENDENTOF_STEP__)
-                else:
-                    current=re.escape(current).replace('\\*','.*').replace('\\?','.')
-                    self._querySteps.append(re.compile(currentStep,reFlags))
-                currentStep=[]
-            else:
-                currentStep.append(c)
-        if currentStep:
-            current=''.join(currentStep)
-            if not current or current=='.':
-                # could just as easily not add it instead
-                self._querySteps.append(self.__SAMEDIR_STEP__)
-            elif current=='..':
-                self._querySteps.append(self.__PARENTDIR_STEP__)
-            elif current=='*':
-                self._querySteps.append(self.__CHILDOF_STEP__)
-            elif current=='**':
-                self._querySteps.append(self.__DESCENDENTOF_STEP__)
-            else:
-                self._querySteps.append(re.compile(currentStep,reFlags))
-        self._queryString=queryString
+        return compileGlobStep(step,bool(reFlags&re.IGNORECASE))
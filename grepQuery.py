@@ -1,14 +1,45 @@
 """
 A query to match grep-style regular expressions
+
+Details:
+    search() looks through the contents of files (eg, FsTree leaves)
+    files are memory mapped and searched with a bytes regex,
+        so nothing is decoded and nothing is read twice
+    big files are split into chunks that overlap a little, so a match
+        that crosses a chunk boundary is still found (exactly once,
+        by the chunk it starts in) as long as it is shorter than the overlap
+    small files are batched together so there is not one task per file
+    chunks and batches are spread across a pool of processes and
+        results stream back in order, as (node,line number,(start,end))
+    ^ and $ match at the start and end of each line, like grep
+    if every match has to contain some literal text, pieces that do not
+        contain it are skipped without running the regex
+        (see searchStats for how often that happens)
 """
 import typing
+import os
 import re
+import mmap
+import concurrent.futures
+from collections import deque
 import queryTools
 
 
+# (path,start,end,endpos,isLast) - search from start up to endpos, but only
+# report matches that start before end
+_Piece=typing.Tuple[str,int,int,int,bool]
+# ([(lines before the match,start,end)],lines in the piece,whether it was skipped)
+_PieceResult=typing.Tuple[typing.List[typing.Tuple[int,int,int]],int,bool]
+
+
 class GrepQuery(queryTools.ReQuery):
     r"""
     A query to match grep-style regular expressions
+
+    This matches whole paths (like piping paths through grep) rather
+    than a name at each step, so find() looks at every item, and checks
+    its path below the start (eg, "a/foo.txt").  It is not run as a
+    state machine, so it has no automaton.
     """
     def __init__(self,queryString:str,ignoreCase:bool=False):
         queryTools.ReQuery.__init__(self,queryString,ignoreCase)
@@ -17,12 +48,225 @@ class GrepQuery(queryTools.ReQuery):
         """
         Parse the query string into a searchable expression
         """
-        self.re=grepToRegex(queryString,ignoreCase)
+        self.re=queryTools.defaultPlanCache.get(
+            (self.__class__,queryString,ignoreCase),
+            lambda: grepToRegex(queryString,ignoreCase))
+        self._queryString=queryString
+        self._ignoreCase=ignoreCase
+        # pieces of files checked by search(), and how many were
+        # skipped because they did not contain the required text
+        self.searchStats=queryTools.PrefilterStats()
+
+    @property
+    def automaton(self)->"queryTools.QueryAutomaton":
+        """
+        A GrepQuery matches whole paths, not a name at each step
+        """
+        raise TypeError('a GrepQuery does not have an automaton')
+
+    def explain(self,stats:typing.Optional["queryTools.QueryStats"]=None)->str:
+        """
+        Describe how the query will be run
+
+        :stats: not used (there are no steps to count)
+        """
+        return '\n'.join(['%s(%r%s)'%(self.__class__.__name__,self.queryString,
+                ', ignoreCase=True' if self.ignoreCase else ''),
+            '  searches the path of every item for %r'%self.re.pattern])
+
+    @property
+    def bytesRe(self)->typing.Pattern[bytes]:
+        """
+        the query as a bytes regex, with ^ and $ matching each line
+        (used to search file contents)
+        """
+        return queryTools.defaultPlanCache.get(
+            (self.__class__,'bytes',self._queryString,self._ignoreCase),
+            lambda: grepToBytesRegex(self._queryString,self._ignoreCase))
+
+    def matches(self,
+        path:typing.Union[str,typing.List[str]]
+        )->bool:
+        """
+        check to see if the regex is found anywhere in a path
+        (like piping paths through grep)
+
+        :path: a path string or list of names
+        """
+        if not isinstance(path,str):
+            path='/'.join(path)
+        return self.re.search(path) is not None
+
+    def matchesMany(self,
+        paths:typing.Iterable[typing.Union[str,typing.List[str]]],
+        onlyMatches:bool=False
+        )->typing.Generator[typing.Any,None,None]:
+        """
+        check a lot of paths (see matches())
+
+        :onlyMatches: yield only the paths that match instead of a bool for each
+        """
+        search=self.re.search
+        for path in paths:
+            text=path if isinstance(path,str) else '/'.join(path)
+            matched=search(text) is not None
+            if not onlyMatches:
+                yield matched
+            elif matched:
+                yield path
+
+    def find(self,
+        tree:"queryTools.TreeLike",
+        _tape:typing.Optional["queryTools.Tape[queryTools.TreeLike]"]=None
+        )->typing.Generator["queryTools.TreeLike",None,None]:
+        """
+        Finds every item whose path below the tree matches,
+        using a breadth-first search
+
+        (every item has to be looked at, since a match can be anywhere
+        in a path)
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        """
+        if getattr(tree,'findWithAutomaton',None) is not None:
+            tree=getattr(tree,'root',tree)
+        if _tape is None:
+            if getattr(tree,'isAcyclic',False):
+                _tape=queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_NONE__)
+            else:
+                _tape=queryTools.Tape(visitedMode=getattr(tree,'visitedMode',
+                    queryTools.Tape.__VISITED_IDENTITY__))
+        search=self.re.search
+        visitKey=_tape.visitKey
+        # the paths of everything on the tape
+        paths:typing.Dict[typing.Hashable,str]={visitKey(tree):''}
+        _tape.push(tree)
+        while not _tape.isDone:
+            node=_tape.pop()
+            path=paths.pop(visitKey(node))
+            if search(path) is not None:
+                yield node
+            prefix=path+'/' if path else ''
+            for child in node.children:
+                key=visitKey(child)
+                if key not in paths and child not in _tape.visited:
+                    paths[key]=prefix+child.name
+                    _tape.push(child)
+
+    async def afind(self,
+        tree:typing.Union["queryTools.TreeLike","queryTools.AsyncTreeLike"],
+        concurrency:int=16,
+        maxBuffered:int=64
+        )->typing.AsyncGenerator[typing.Any,None]:
+        """
+        Finds items in a tree whose children have to be awaited
+        (see Query.afind, and find() for what matches)
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        """
+        key=queryTools.queryAutomaton._visitKeyFor(tree)
+        startKey=key(tree)
+        search=self.re.search
+        everything=queryTools.QueryAutomaton([self.__DESCENDENTOF_STEP__])
+        async for node in queryTools.afindWithAutomaton(everything,tree,concurrency,maxBuffered):
+            names=[]
+            item=node
+            while item is not None and key(item)!=startKey:
+                names.append(item.name)
+                item=item.parent
+            names.reverse()
+            if search('/'.join(names)) is not None:
+                yield node
+
+    def first(self,tree:"queryTools.TreeLike")->typing.Optional["queryTools.TreeLike"]:
+        """
+        Get the first item find() would return, searching no further
+
+        :return: the item, or None if nothing matches
+        """
+        return queryTools.Query.first(self,tree)
+
+    def exists(self,tree:"queryTools.TreeLike")->bool:
+        """
+        Check whether anything matches, searching no further
+        than the first match
+        """
+        return queryTools.Query.exists(self,tree)
+
+    def count(self,tree:"queryTools.TreeLike")->int:
+        """
+        Count how many items find() would return
+        """
+        return queryTools.Query.count(self,tree)
+
+    def search(self,
+        tree:"queryTools.TreeLike",
+        pathQuery:typing.Union[None,str,"queryTools.Query"]=None,
+        workers:typing.Optional[int]=None,
+        executor:"queryTools.ExecutorLike"='process',
+        chunkSize:int=4*1024*1024,
+        overlap:int=64*1024
+        )->typing.Generator[typing.Tuple["queryTools.TreeLike",int,typing.Tuple[int,int]],None,None]:
+        """
+        Search the contents of files in a tree
 
+        Usage:
+            for node,lineNo,(start,end) in GrepQuery('TODO').search(FsTree('src'),'/**/*.py'):
+                print(node.path,lineNo)
 
-def grepToRegex(pattern:str,ignoreCase:bool=False)->typing.Pattern:
+        :tree: starting location of the tree.  Usually you'd pass root.
+            Leaves are read from node.path, so this is for an FsTree
+            (or anything else whose paths are real files)
+        :pathQuery: which leaves to search, as a query or a glob
+            (default=all of them)
+        :workers: how many processes (default=one per cpu, 1 searches in this process)
+        :executor: "process", "thread", or a concurrent.futures.Executor
+        :chunkSize: files bigger than this are split into chunks
+        :overlap: how far chunks overlap (the longest match that
+            will be found across a chunk boundary)
+        :return: generator of (node,line number starting at 1,(start,end) byte offsets)
+        """
+        if pathQuery is None:
+            pathQuery=queryTools.GlobQuery('/**')
+        elif isinstance(pathQuery,str):
+            pathQuery=queryTools.GlobQuery(pathQuery)
+        if workers is None:
+            workers=os.cpu_count() or 1
+        pattern=self.bytesRe
+        required=queryTools.requiredBytes(pattern)
+        tasks=_searchTasks(pathQuery.find(tree),chunkSize,overlap)
+        lineBases:typing.Dict[str,int]={}
+        if workers<=1:
+            for nodes,pieces in tasks:
+                yield from _searchResults(nodes,pieces,_searchPieces(pattern,required,pieces),lineBases,self.searchStats)
+            return
+        pool,ownPool,_=queryTools.parallelFind._makeExecutor(executor,workers)
+        submitted:typing.Deque[typing.Tuple[typing.Any,typing.Any,concurrent.futures.Future]]=deque()
+        try:
+            for nodes,pieces in tasks:
+                submitted.append((nodes,pieces,pool.submit(_searchPieces,pattern,required,pieces)))
+                # only get so far ahead, and give back results in order
+                while len(submitted)>=workers*4 or (submitted and submitted[0][2].done()):
+                    nodes,pieces,future=submitted.popleft()
+                    yield from _searchResults(nodes,pieces,future.result(),lineBases,self.searchStats)
+            while submitted:
+                nodes,pieces,future=submitted.popleft()
+                yield from _searchResults(nodes,pieces,future.result(),lineBases,self.searchStats)
+        finally:
+            outstanding=[future for _,_,future in submitted]
+            if ownPool:
+                queryTools.parallelFind._shutdown(pool,outstanding)
+            else:
+                for future in outstanding:
+                    future.cancel()
+
+
+def grepToRegex(pattern:str,ignoreCase:bool=False,multiline:bool=False)->typing.Pattern:
     """
     Translate a grep BRE to a Python ERE.
+
+    :multiline: ^ and $ match at every line rather than only
+        the start and end of the whole string
     """
     flags=0
     if ignoreCase:
@@ -45,8 +289,137 @@ def grepToRegex(pattern:str,ignoreCase:bool=False)->typing.Pattern:
     pattern=pattern.replace(r"\*","*")
     # Replace \[ and \] with [ and ]
     pattern=pattern.replace(r"\[","[").replace(r"\]","]")
-    # Replace ^ with \A
-    pattern=pattern.replace("^",r"\A")
-    # Replace $ with \Z
-    pattern=pattern.replace("$",r"\Z")
+    if multiline:
+        flags|=re.MULTILINE
+    else:
+        # Replace ^ with \A
+        pattern=pattern.replace("^",r"\A")
+        # Replace $ with \Z
+        pattern=pattern.replace("$",r"\Z")
     return re.compile(pattern,flags)
+
+
+def grepToBytesRegex(pattern:str,ignoreCase:bool=False)->typing.Pattern[bytes]:
+    """
+    Translate a grep BRE to a Python bytes regex where ^ and $
+    match at every line (for searching file contents)
+
+    (non-ascii characters are matched as utf-8, and ignoreCase
+    only applies to ascii letters)
+    """
+    regex=grepToRegex(pattern,ignoreCase,multiline=True)
+    return re.compile(regex.pattern.encode('utf-8'),regex.flags&~re.UNICODE)
+
+
+def _searchTasks(
+    nodes:typing.Iterable["queryTools.TreeLike"],
+    chunkSize:int,
+    overlap:int
+    )->typing.Generator[typing.Tuple[typing.List["queryTools.TreeLike"],typing.List[_Piece]],None,None]:
+    """
+    Split files into chunks and batch small files together
+
+    :return: generator of ([node for each piece],[pieces])
+    """
+    chunkSize=max(1,chunkSize)
+    batchNodes:typing.List["queryTools.TreeLike"]=[]
+    batch:typing.List[_Piece]=[]
+    batchSize=0
+    for node in nodes:
+        isLeaf=getattr(node,'isLeaf',None)
+        if isLeaf is None:
+            isLeaf=not node.children
+        if not isLeaf:
+            continue
+        path=node.path
+        try:
+            size=os.path.getsize(path)
+        except (OSError,ValueError):
+            continue
+        if not size:
+            continue
+        for start in range(0,size,chunkSize):
+            end=min(start+chunkSize,size)
+            batchNodes.append(node)
+            batch.append((path,start,end,min(end+overlap,size),end==size))
+            batchSize+=end-start
+            if batchSize>=chunkSize:
+                yield batchNodes,batch
+                batchNodes=[]
+                batch=[]
+                batchSize=0
+    if batch:
+        yield batchNodes,batch
+
+
+def _searchPieces(
+    pattern:typing.Pattern[bytes],
+    required:typing.Optional[bytes],
+    pieces:typing.List[_Piece]
+    )->typing.List[_PieceResult]:
+    """
+    Search some pieces of files (usually in a worker process)
+
+    :required: text that every match contains, if there is any
+    """
+    ret:typing.List[_PieceResult]=[]
+    for path,start,end,endpos,isLast in pieces:
+        hits:typing.List[typing.Tuple[int,int,int]]=[]
+        lines=0
+        skipped=False
+        try:
+            with open(path,'rb') as f, mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ) as mm:
+                endpos=min(endpos,len(mm))
+                end=min(end,endpos)
+                if required is not None and mm.find(required,start,endpos)<0:
+                    skipped=True
+                    if not isLast:
+                        lines=mm[start:end].count(b'\n')
+                    ret.append((hits,lines,skipped))
+                    continue
+                lastPos=start
+                for match in pattern.finditer(mm,start,endpos):
+                    matchStart=match.start()
+                    if matchStart>=end:
+                        # belongs to the next chunk
+                        break
+                    lines+=mm[lastPos:matchStart].count(b'\n')
+                    lastPos=matchStart
+                    hits.append((lines,matchStart,match.end()))
+                if not isLast:
+                    # only needed to number the lines in the next chunk
+                    lines+=mm[lastPos:end].count(b'\n')
+        except (OSError,ValueError):
+            # eg, deleted, unreadable, or emptied since it was listed
+            pass
+        ret.append((hits,lines,skipped))
+    return ret
+
+
+def _searchResults(
+    nodes:typing.List["queryTools.TreeLike"],
+    pieces:typing.List[_Piece],
+    results:typing.List[_PieceResult],
+    lineBases:typing.Dict[str,int],
+    stats:"queryTools.PrefilterStats"
+    )->typing.Generator[typing.Tuple["queryTools.TreeLike",int,typing.Tuple[int,int]],None,None]:
+    """
+    Turn piece results into (node,line number,(start,end))
+
+    (pieces must be given back in order so line numbers can be counted)
+
+    :lineBases: the line number each file that is split into chunks is up to
+    :stats: counts of pieces checked and skipped
+    """
+    for node,(path,start,_,_,isLast),(hits,lines,skipped) in zip(nodes,pieces,results):
+        stats.checked+=1
+        if skipped:
+            stats.rejected+=1
+        if start==0:
+            lineBase=1
+        else:
+            lineBase=lineBases.pop(path,1)
+        for relLine,matchStart,matchEnd in hits:
+            yield node,lineBase+relLine,(matchStart,matchEnd)
+        if not isLast:
+            lineBases[path]=lineBase+lines
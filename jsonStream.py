@@ -0,0 +1,281 @@
+"""
+Build a tree from JSON (or JSON lines) a piece at a time,
+so that queries can start before the whole thing has been read
+
+Usage:
+    with open('huge.json') as f:
+        stream=JsonStream(f)
+        for item in stream.find(GlobQuery('/*/name')):
+            print(item.path)
+
+Details:
+    the input is read a chunk at a time, and each item in the
+        top-level list (or each value in the top-level dict, or each
+        line of JSON lines) is parsed when it is reached
+    every item is a PrimativeView, so nothing is copied
+    stream.root is a TreeLike whose children are the top-level items,
+        read as they are asked for, so query.find(stream.root) works too,
+        and stopping early (eg, with first() or exists()) means the
+        rest of the input is never read
+    stream.find() goes further and runs the query on each top-level item
+        as soon as it has been parsed, so results come out while the
+        input is still being read (but in top-level item order, rather
+        than breadth-first over the whole tree)
+    with keep=False, top-level items are let go of once they
+        have been looked at, so memory does not grow with the input
+        (but then the input can only be gone through once)
+    the top-level list or dict is the only thing read a piece at a time,
+        so a single huge item still has to fit in memory
+"""
+import typing
+import json
+import codecs
+import queryTools
+
+
+class _JsonStreamRoot:
+    """
+    The root of a JsonStream, whose children are read as they are asked for
+    """
+
+    __slots__=('stream',)
+
+    name:str=''
+    parent:typing.Any=None
+    isAcyclic:bool=True
+
+    def __init__(self,stream:"JsonStream"):
+        self.stream=stream
+
+    @property
+    def children(self)->typing.Iterable[queryTools.PrimativeView]:
+        """
+        the top-level items, read as they are asked for
+        """
+        return self.stream._items()
+
+    @property
+    def pathSegments(self)->typing.Iterable[str]:
+        """
+        get the path to this item
+        """
+        return [self.name]
+
+    @property
+    def path(self)->str:
+        """
+        get the path to this item
+        """
+        return '/'
+
+    def __repr__(self)->str:
+        return 'JsonStream.root'
+
+
+class JsonStream:
+    """
+    A tree that is read from JSON (or JSON lines) a piece at a time
+
+    (See module docstring for details)
+    """
+
+    # anything that could still be part of a number
+    __NUMBER_CHARS__='0123456789+-.eE'
+
+    def __init__(self,
+        source:typing.Union[str,typing.IO],
+        jsonLines:bool=False,
+        keep:bool=True,
+        chunkSize:int=1<<16):
+        """
+        :source: a filename, or an open file (text or binary)
+        :jsonLines: the input has one JSON value per line
+            (these are treated like the items of a top-level list)
+        :keep: keep the top-level items once read, so the tree can be
+            gone through more than once
+        :chunkSize: how much to read at a time
+        """
+        if isinstance(source,str):
+            source=open(source,'rb')
+        self._source=source
+        self._decoder=codecs.getincrementaldecoder('utf-8')()
+        self.jsonLines=jsonLines
+        self.keep=keep
+        self.chunkSize=chunkSize
+        self._buffer=''
+        self._pos=0
+        self._eof=False
+        # None until the start of the document has been read, then '[' or '{'
+        self._container:typing.Optional[str]=None
+        self._done=False
+        self._json=json.JSONDecoder()
+        self.root=_JsonStreamRoot(self)
+        self._kept:typing.List[queryTools.PrimativeView]=[]
+        self._used=False
+
+    def _read(self,size:typing.Optional[int]=None)->bool:
+        """
+        read more into the buffer
+
+        :size: how much to read (default=chunkSize)
+        :return: False if there is no more
+        """
+        if self._eof:
+            return False
+        if self._pos:
+            self._buffer=self._buffer[self._pos:]
+            self._pos=0
+        raw=self._source.read(size or self.chunkSize)
+        if isinstance(raw,bytes):
+            data=self._decoder.decode(raw,not raw)
+        else:
+            data=raw
+        self._buffer+=data
+        if not raw:
+            self._eof=True
+            return False
+        return True
+
+    def _peek(self)->str:
+        """
+        skip whitespace and get the next character ('' at the end)
+        """
+        while True:
+            buffer=self._buffer
+            pos=self._pos
+            while pos<len(buffer) and buffer[pos] in ' \t\r\n':
+                pos+=1
+            self._pos=pos
+            if pos<len(buffer):
+                return buffer[pos]
+            if not self._read():
+                return ''
+
+    def _expect(self,chars:str)->str:
+        """
+        take the next character, which must be one of chars
+        """
+        c=self._peek()
+        if not c or c not in chars:
+            raise ValueError('expected one of %r in JSON, got %r'%(chars,c))
+        self._pos+=1
+        return c
+
+    def _value(self)->typing.Any:
+        """
+        parse the next JSON value, reading more as needed
+        """
+        self._peek()
+        while True:
+            try:
+                value,end=self._json.raw_decode(self._buffer,self._pos)
+            except json.JSONDecodeError:
+                # not all there yet, so read as much again as there is
+                # (so that a huge item is not parsed over and over)
+                if not self._read(max(self.chunkSize,len(self._buffer)-self._pos)):
+                    raise
+                continue
+            if not self._eof and isinstance(value,(int,float)) \
+                    and not self._buffer[end:].strip(self.__NUMBER_CHARS__):
+                # a number cut off by the end of the buffer might go on
+                # (eg, "2." parses as 2 until the "5" is read)
+                if self._read():
+                    continue
+            self._pos=end
+            return value
+
+    def _listItem(self,value:typing.Any)->queryTools.PrimativeView:
+        """
+        make a top-level item the same as primativeAsTree() does for a list
+        """
+        if isinstance(value,(str,int,float,bool)):
+            return queryTools.PrimativeView(None,str(value),self.root,True) # type: ignore
+        return queryTools.PrimativeView(value,'',self.root) # type: ignore
+
+    def _nextItem(self)->typing.Optional[queryTools.PrimativeView]:
+        """
+        parse the next top-level item
+
+        :return: None when there are no more
+        """
+        if self._done:
+            return None
+        if self.jsonLines:
+            if not self._peek():
+                self._done=True
+                return None
+            return self._listItem(self._value())
+        if self._container is None:
+            self._container=self._expect('[{')
+            if self._peek() in ']}':
+                self._expect(']}')
+                self._done=True
+                return None
+        elif self._expect(',]}') in ']}':
+            self._done=True
+            return None
+        if self._container=='{':
+            name=self._value()
+            if not isinstance(name,str):
+                raise ValueError('expected a name in JSON, got %r'%(name,))
+            self._expect(':')
+            value=self._value()
+            return queryTools.PrimativeView(value,name,self.root,value is None) # type: ignore
+        return self._listItem(self._value())
+
+    def _items(self)->typing.Generator[queryTools.PrimativeView,None,None]:
+        """
+        go through the top-level items, reading more as needed
+        """
+        if not self.keep:
+            if self._used:
+                raise ValueError('a JsonStream with keep=False can only be gone through once')
+            self._used=True
+        i=0
+        while True:
+            if i<len(self._kept):
+                item=self._kept[i]
+            else:
+                nextItem=self._nextItem()
+                if nextItem is None:
+                    return
+                item=nextItem
+                if self.keep:
+                    self._kept.append(item)
+            i+=1
+            yield item
+
+    def find(self,query:"queryTools.Query")->typing.Generator[typing.Any,None,None]:
+        """
+        Run a query, giving results from each top-level item
+        as soon as it has been read
+
+        (queries with .. in them have to see the whole tree,
+        and so do ones that are not run as a state machine,
+        eg GrepQuery, so they give results in the usual way)
+        """
+        try:
+            automaton=query.automaton
+        except TypeError:
+            yield from query.find(self.root) # type: ignore
+            return
+        if len(automaton.segments)!=1:
+            yield from automaton.find(self.root) # type: ignore
+            return
+        segment=automaton.segments[0]
+        mask=segment.startMask
+        if mask&segment.acceptMask:
+            yield self.root
+        if not mask&segment.liveMask:
+            return
+        for item in self._items():
+            childMask=segment.advance(mask,item.name)
+            if childMask:
+                tape=queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_NONE__)
+                yield from segment.walk([item],tape,childMask) # type: ignore
+
+    def close(self)->None:
+        """
+        close the input
+        """
+        self._source.close()
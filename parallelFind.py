@@ -0,0 +1,352 @@
+"""
+Run a compiled query over a pool of threads or processes.
+
+This helps when getting the children of a node is slow
+(eg, a network filesystem or a slow lazy loader) and there
+are idle cores waiting on it.
+
+Details:
+    "thread" - every node that can still match is expanded (its children
+        listed and checked) as its own task, so many slow listings
+        can be waiting at the same time
+    "process" - the top of the tree is walked here until there are enough
+        independent subtrees, then each subtree is searched by a worker
+        process.  Nodes have to be picklable, and results are copies.
+    only so many tasks are ever waiting at once (maxPending)
+    when ordered=False results come back as soon as they are found,
+    otherwise they come back in the same breadth-first order as find()
+    stopping early (eg, breaking out of the loop) cancels anything
+    that has not started yet
+"""
+import typing
+import concurrent.futures
+from collections import deque
+import queryTools
+
+
+ExecutorLike=typing.Union[str,concurrent.futures.Executor]
+
+# compiled automatons, per worker process
+_workerAutomatons:typing.Dict[typing.Tuple[typing.Any,...],"queryTools.QueryAutomaton"]={}
+
+
+def _expandTask(
+    segment:"queryTools.QuerySegment",
+    node:queryTools.TreeLike,
+    mask:int
+    )->typing.List[typing.Tuple[queryTools.TreeLike,int]]:
+    """
+    expand a single node (run on a worker thread)
+    """
+    ret:typing.List[typing.Tuple[queryTools.TreeLike,int]]=[]
+    segment.expand(node,mask,lambda child,childMask: ret.append((child,childMask)))
+    return ret
+
+
+def _subtreeTask(
+    steps:typing.Tuple[typing.Any,...],
+    node:queryTools.TreeLike,
+    mask:int
+    )->typing.List[typing.Tuple[int,queryTools.TreeLike]]:
+    """
+    search a whole subtree (run in a worker process)
+
+    :return: [(depth below node,result)] in breadth-first order
+    """
+    automaton=_workerAutomatons.get(steps)
+    if automaton is None:
+        automaton=queryTools.QueryAutomaton(steps)
+        _workerAutomatons[steps]=automaton
+    segment=automaton.segments[-1]
+    expanded=queryTools.queryAutomaton._expandedStatesFor(node,1)
+    key=expanded.key if expanded is not None else id
+    results:typing.List[typing.Tuple[int,queryTools.TreeLike]]=[]
+    level:typing.Iterable[typing.Tuple[queryTools.TreeLike,int]]=[(node,mask)]
+    depth=0
+    while level:
+        # key->[node,states] for the next level, merging the states
+        # of a node that is reached more than one way
+        nextLevel:typing.Dict[typing.Hashable,typing.List[typing.Any]]={}
+        def push(child:queryTools.TreeLike,childMask:int)->None:
+            waiting=nextLevel.get(key(child))
+            if waiting is not None:
+                waiting[1]|=childMask
+            elif expanded is None or expanded.newStates(child,childMask):
+                nextLevel[key(child)]=[child,childMask]
+        for item,itemMask in level:
+            if expanded is not None:
+                itemMask=expanded.add(item,itemMask)
+            if itemMask&segment.acceptMask:
+                results.append((depth,item))
+            if itemMask&segment.liveMask:
+                segment.expand(item,itemMask,push)
+        level=[(child,childMask) for child,childMask in nextLevel.values()]
+        depth+=1
+    return results
+
+
+def _makeExecutor(
+    executor:ExecutorLike,
+    workers:int
+    )->typing.Tuple[concurrent.futures.Executor,bool,bool]:
+    """
+    :return: (executor,whether it is ours to shut down,whether it is processes)
+    """
+    if isinstance(executor,concurrent.futures.Executor):
+        return executor,False,isinstance(executor,concurrent.futures.ProcessPoolExecutor)
+    if executor=='thread':
+        return concurrent.futures.ThreadPoolExecutor(max_workers=workers),True,False
+    if executor=='process':
+        return concurrent.futures.ProcessPoolExecutor(max_workers=workers),True,True
+    raise ValueError('Unknown executor "%s" (expected "thread" or "process")'%executor)
+
+
+def _shutdown(pool:concurrent.futures.Executor,futures:typing.Iterable[concurrent.futures.Future])->None:
+    """
+    cancel everything outstanding and stop the pool
+    """
+    for future in futures:
+        future.cancel()
+    try:
+        pool.shutdown(wait=False,cancel_futures=True)
+    except TypeError:
+        # python<3.9
+        pool.shutdown(wait=False)
+
+
+def _walkThreads(
+    segment:"queryTools.QuerySegment",
+    starts:typing.Iterable[queryTools.TreeLike],
+    pool:concurrent.futures.Executor,
+    ordered:bool,
+    maxPending:int,
+    expanded:typing.Optional["queryTools.queryAutomaton._ExpandedStates"],
+    outstanding:typing.Set[concurrent.futures.Future]
+    )->typing.Generator[queryTools.TreeLike,None,None]:
+    """
+    expand every node as its own task
+
+    :expanded: the states nodes have been expanded with
+        (None if no node can be reached twice)
+    """
+    acceptMask=segment.acceptMask
+    liveMask=segment.liveMask
+    key=expanded.key if expanded is not None else id
+    # nodes waiting to be given to the pool
+    todo:typing.Deque[queryTools.TreeLike]=deque()
+    # the states of everything in todo
+    waiting:typing.Dict[typing.Hashable,int]={}
+    # when ordered, (node,mask,future) in the order they were taken from todo
+    inOrder:typing.Deque[typing.Tuple[queryTools.TreeLike,int,typing.Optional[concurrent.futures.Future]]]=deque()
+    def push(node:queryTools.TreeLike,mask:int)->None:
+        nodeKey=key(node)
+        if nodeKey in waiting:
+            # got here two different ways, so do both
+            waiting[nodeKey]|=mask
+        elif expanded is None or expanded.newStates(node,mask):
+            waiting[nodeKey]=mask
+            todo.append(node)
+    for start in starts:
+        push(start,segment.startMask)
+    while todo or outstanding or inOrder:
+        # keep the pool busy, but not too far ahead
+        while todo and len(outstanding)<maxPending:
+            node=todo.popleft()
+            mask=waiting.pop(key(node))
+            if expanded is not None:
+                # only the states it has not already been expanded with
+                mask=expanded.add(node,mask)
+            future=None
+            if mask&liveMask:
+                future=pool.submit(_expandTask,segment,node,mask)
+                outstanding.add(future)
+            if ordered:
+                inOrder.append((node,mask,future))
+            elif mask&acceptMask:
+                yield node
+        if ordered:
+            if not inOrder:
+                continue
+            node,mask,future=inOrder.popleft()
+            if mask&acceptMask:
+                yield node
+            if future is None:
+                continue
+            done:typing.Iterable[concurrent.futures.Future]=(future,)
+        else:
+            if not outstanding:
+                continue
+            done,_=concurrent.futures.wait(outstanding,return_when=concurrent.futures.FIRST_COMPLETED)
+        for future in done:
+            outstanding.discard(future)
+            for child,childMask in future.result():
+                push(child,childMask)
+
+
+def _walkProcesses(
+    automaton:"queryTools.QueryAutomaton",
+    segment:"queryTools.QuerySegment",
+    starts:typing.Iterable[queryTools.TreeLike],
+    pool:concurrent.futures.Executor,
+    ordered:bool,
+    maxPending:int,
+    expanded:typing.Optional["queryTools.queryAutomaton._ExpandedStates"],
+    outstanding:typing.Set[concurrent.futures.Future]
+    )->typing.Generator[queryTools.TreeLike,None,None]:
+    """
+    walk the top of the tree here, then hand subtrees to worker processes
+
+    (the starts must not be under one another, or their subtrees
+    would be searched more than once)
+
+    :expanded: the states nodes have been expanded with
+        (None if no node can be reached twice)
+    """
+    acceptMask=segment.acceptMask
+    liveMask=segment.liveMask
+    key=expanded.key if expanded is not None else id
+    # find enough independent subtrees, breadth-first
+    frontier:typing.Deque[typing.Tuple[int,queryTools.TreeLike]]=deque()
+    # the states of everything in frontier
+    waiting:typing.Dict[typing.Hashable,int]={}
+    topResults:typing.List[typing.Tuple[int,int,int,queryTools.TreeLike]]=[]
+    def push(node:queryTools.TreeLike,mask:int,depth:int)->None:
+        nodeKey=key(node)
+        if nodeKey in waiting:
+            waiting[nodeKey]|=mask
+        elif expanded is None or expanded.newStates(node,mask):
+            waiting[nodeKey]=mask
+            frontier.append((depth,node))
+    for start in starts:
+        push(start,segment.startMask,0)
+    order=0
+    while frontier and len(frontier)<maxPending:
+        depth,node=frontier.popleft()
+        mask=waiting.pop(key(node))
+        if expanded is not None:
+            mask=expanded.add(node,mask)
+        if mask&acceptMask:
+            if ordered:
+                topResults.append((depth,-1,order,node))
+                order+=1
+            else:
+                yield node
+        if mask&liveMask:
+            segment.expand(node,mask,lambda child,childMask,depth=depth: push(child,childMask,depth+1))
+    # hand the subtrees out only so many at a time
+    subtrees=iter(enumerate(frontier))
+    # future -> (which subtree,its depth)
+    futures:typing.Dict[concurrent.futures.Future,typing.Tuple[int,int]]={}
+    def submitMore()->None:
+        while len(futures)<maxPending:
+            subtree=next(subtrees,None)
+            if subtree is None:
+                return
+            frontierIdx,(depth,node)=subtree
+            future=pool.submit(_subtreeTask,automaton.steps,node,waiting.pop(key(node)))
+            futures[future]=(frontierIdx,depth)
+            outstanding.add(future)
+    submitMore()
+    # breadth-first order means sorting by depth, then by
+    # which subtree, then by order within the subtree
+    results=topResults
+    while futures:
+        done,_=concurrent.futures.wait(futures,return_when=concurrent.futures.FIRST_COMPLETED)
+        finished=[(future,futures.pop(future)) for future in done]
+        for future,_ in finished:
+            outstanding.discard(future)
+        # keep the pool busy while these are gone through
+        submitMore()
+        for future,(frontierIdx,depth) in finished:
+            if not ordered:
+                for _,node in future.result():
+                    yield node
+                continue
+            for localIdx,(localDepth,node) in enumerate(future.result()):
+                results.append((depth+localDepth,frontierIdx,localIdx,node))
+    if ordered:
+        results.sort(key=lambda result: result[:3])
+        for result in results:
+            yield result[3]
+
+
+def _overlapping(
+    starts:typing.Sequence[queryTools.TreeLike],
+    key:typing.Callable[[typing.Any],typing.Hashable]=id
+    )->bool:
+    """
+    check whether any of the starts is under another one
+
+    :key: how to tell nodes apart
+    """
+    if len(starts)<=1:
+        return False
+    keys={key(start) for start in starts}
+    for start in starts:
+        parent=start.parent
+        while parent is not None:
+            if key(parent) in keys:
+                return True
+            parent=parent.parent
+    return False
+
+
+def findParallel(
+    automaton:"queryTools.QueryAutomaton",
+    tree:queryTools.TreeLike,
+    workers:int,
+    executor:ExecutorLike='thread',
+    ordered:bool=False,
+    maxPending:typing.Optional[int]=None
+    )->typing.Generator[queryTools.TreeLike,None,None]:
+    """
+    Finds items in the tree using a pool of threads or processes
+
+    :automaton: the compiled query
+    :tree: starting location of the tree.  Usually you'd pass root.
+    :workers: how many threads/processes
+    :executor: "thread", "process", or an existing concurrent.futures.Executor
+        (which will not be shut down afterwards)
+    :ordered: return results in breadth-first order rather than
+        as soon as they are found
+    :maxPending: the most tasks to have waiting at once (default=workers*4)
+    """
+    if maxPending is None:
+        maxPending=workers*4
+    maxPending=max(1,maxPending)
+    pool,ownPool,isProcesses=_makeExecutor(executor,workers)
+    outstanding:typing.Set[concurrent.futures.Future]=set()
+    try:
+        key=queryTools.queryAutomaton._visitKeyFor(tree)
+        starts:typing.List[queryTools.TreeLike]=[tree]
+        lastIdx=len(automaton.segments)-1
+        for i,segment in enumerate(automaton.segments):
+            if i>0:
+                # __PARENTDIR_STEP__ between segments
+                parents:typing.Dict[typing.Hashable,queryTools.TreeLike]={}
+                for start in starts:
+                    parent=start.parent
+                    if parent is not None:
+                        parents.setdefault(key(parent),parent)
+                starts=list(parents.values())
+            expanded=queryTools.queryAutomaton._expandedStatesFor(tree,len(starts))
+            if isProcesses and i==lastIdx and not _overlapping(starts,key):
+                found=_walkProcesses(automaton,segment,starts,pool,ordered,maxPending,expanded,outstanding)
+            elif isProcesses:
+                # anything before a .. has to come back here anyway, and if
+                # a start is under another one, the workers for both would
+                # search the same nodes, so walk it here
+                found=segment.walk(starts,queryTools.Tape(visitedMode=getattr(tree,'visitedMode',
+                    queryTools.Tape.__VISITED_IDENTITY__)))
+            else:
+                found=_walkThreads(segment,starts,pool,ordered,maxPending,expanded,outstanding)
+            if i==lastIdx:
+                yield from found
+            else:
+                starts=list(found)
+    finally:
+        if ownPool:
+            _shutdown(pool,outstanding)
+        else:
+            for future in outstanding:
+                future.cancel()
@@ -0,0 +1,554 @@
+"""
+An index of every path in a tree, for running a lot of queries
+on the same tree without walking it each time.
+
+Usage:
+    index=PathIndex(root)
+    for item in GlobQuery('/**/calc.exe').find(index):
+        print(item.path)
+    # tell the index when the tree changes
+    index.add(newNode)
+    index.remove(oldNode)
+    index.rename(renamedNode)
+
+Layout:
+    every indexed node gets a number, in the order it was added
+    parents[i], names[i], depths[i] - the parent, name and depth of node i
+    children[i] - {child number:None} (a dict so removing is quick)
+    byName - {name:{node numbers}}, the inverted index
+
+How a query is run:
+    if the last step that takes up a name is a plain name, the nodes
+        with that name come straight out of byName
+    if it is a regex or glob, it is checked once against every unique
+        name, and the nodes with the names that match come out of byName
+    either way, each of those is then checked by running the query
+        down its path, where the states at each directory are
+        remembered so shared directories are only done once
+    otherwise (the query ends with * or **) the index is walked
+        instead of the tree
+    queries with .. in them are run on the tree the normal way
+    results are breadth-first, but nodes at the same depth come in
+        the order they were indexed, so after add() they may not
+        be in the same order a walk of the tree would give
+
+The tree itself is never looked at while running a query, so it must
+be kept up to date with add(), remove() and rename().  It is never
+rebuilt from scratch.
+
+save() writes a compacted copy in the ColumnarTree file format, with
+byName after it, and PathIndex.open() memory maps it, so that other
+processes can open the index instantly and share its memory.  The
+opened index runs queries the same way, straight out of the file.
+
+File layout (after the ColumnarTree, padded to 8 bytes):
+    header - magic, number of names
+    byNameOffsets - the nodes named names[i] are
+        byNameNumbers[byNameOffsets[i]:byNameOffsets[i+1]]
+    byNameNumbers - node numbers, grouped by name
+"""
+import typing
+import mmap
+import struct
+import bisect
+from array import array
+from collections import deque
+import queryTools
+
+
+class _MappedSequence:
+    """
+    A read-only list where item i is get(i)
+    (stands in for the lists of an opened index)
+    """
+
+    __slots__=('_length','_get')
+
+    def __init__(self,length:int,get:typing.Callable[[int],typing.Any]):
+        self._length=length
+        self._get=get
+
+    def __len__(self)->int:
+        return self._length
+
+    def __getitem__(self,idx:int)->typing.Any:
+        return self._get(idx)
+
+
+class _MappedByName:
+    """
+    The byName table of an opened index, straight out of the file
+    """
+
+    __slots__=('_names','_offsets','_numbers','_ids')
+
+    def __init__(self,names:typing.Sequence[str],offsets:typing.Any,numbers:typing.Any):
+        """
+        :names: the unique names
+        :offsets: nodes named names[i] are numbers[offsets[i]:offsets[i+1]]
+        :numbers: node numbers, grouped by name
+        """
+        self._names=names
+        self._offsets=offsets
+        self._numbers=numbers
+        # name->name id, created the first time it is needed
+        self._ids:typing.Optional[typing.Dict[str,int]]=None
+
+    def _slice(self,nameId:int)->typing.Dict[int,None]:
+        return dict.fromkeys(self._numbers[self._offsets[nameId]:self._offsets[nameId+1]])
+
+    def get(self,name:str,default:typing.Any=None)->typing.Any:
+        if self._ids is None:
+            self._ids={name:nameId for nameId,name in enumerate(self._names)}
+        nameId=self._ids.get(name)
+        if nameId is None:
+            return default
+        return self._slice(nameId)
+
+    def __getitem__(self,name:str)->typing.Dict[int,None]:
+        ret=self.get(name)
+        if ret is None:
+            raise KeyError(name)
+        return ret
+
+    def __iter__(self)->typing.Iterator[str]:
+        return iter(self._names)
+
+    def __len__(self)->int:
+        return len(self._names)
+
+    def items(self)->typing.Iterator[typing.Tuple[str,typing.Dict[int,None]]]:
+        for nameId,name in enumerate(self._names):
+            yield name,self._slice(nameId)
+
+
+class PathIndex:
+    """
+    An index of every path in a tree
+
+    (See module docstring for details)
+    """
+
+    __BYNAME_MAGIC__=b'QTBYNAME'
+    __BYNAME_HEADER__=struct.Struct('<8sq')
+
+    def __init__(self,tree:queryTools.TreeLike):
+        """
+        :tree: the root of the tree to index
+        """
+        self.tree=tree
+        self._nodes:typing.List[typing.Optional[queryTools.TreeLike]]=[]
+        # id(node)->node number
+        self._numbers:typing.Dict[int,int]={}
+        self._parents:typing.List[int]=[]
+        self._names:typing.List[str]=[]
+        self._depths:typing.List[int]=[]
+        self._children:typing.List[typing.Dict[int,None]]=[]
+        self._byName:typing.Dict[str,typing.Dict[int,None]]={}
+        # the same for lowercase names, created the first time it is needed
+        self._byFolded:typing.Optional[typing.Dict[str,typing.Dict[int,None]]]=None
+        # goes up with every change (see FindCache)
+        self.generation:int=0
+        # the memory mapped file, and views of it, if made with open()
+        self._columnar:typing.Optional[queryTools.ColumnarTree]=None
+        self._views:typing.List[memoryview]=[]
+        self.add(tree)
+
+    @property
+    def root(self)->queryTools.TreeLike:
+        """
+        the root of the tree being indexed
+        """
+        return self.tree
+
+    def __len__(self)->int:
+        if self._columnar is not None:
+            return len(self._columnar)
+        return len(self._numbers)
+
+    def __contains__(self,node:typing.Any)->bool:
+        if self._columnar is not None:
+            return getattr(node,'tree',None) is self._columnar
+        return id(node) in self._numbers
+
+    def _number(self,node:queryTools.TreeLike)->int:
+        """
+        get the number of an indexed node
+        """
+        if self._columnar is not None:
+            if node not in self:
+                raise KeyError('%r is not in the index'%(node,))
+            return node.index # type: ignore
+        number=self._numbers.get(id(node))
+        if number is None:
+            raise KeyError('%r is not in the index'%(node,))
+        return number
+
+    def _checkWritable(self)->None:
+        if self._columnar is not None:
+            raise ValueError('an index made with open() cannot be changed')
+
+    def _addName(self,number:int,name:str)->None:
+        self._byName.setdefault(name,{})[number]=None
+        if self._byFolded is not None:
+            self._byFolded.setdefault(name.lower(),{})[number]=None
+
+    def _removeName(self,number:int,name:str)->None:
+        for table,key in ((self._byName,name),(self._byFolded,name.lower())):
+            if table is None:
+                continue
+            numbers=table[key]
+            del numbers[number]
+            if not numbers:
+                del table[key]
+
+    def add(self,node:queryTools.TreeLike)->int:
+        """
+        Index a node that has been added to the tree, and everything under it
+
+        :node: the new node (its parent must already be indexed,
+            unless this is the first node)
+        :return: how many nodes were added
+        """
+        self._checkWritable()
+        if id(node) in self._numbers:
+            return 0
+        if self._nodes:
+            parent=node.parent
+            if parent is None or id(parent) not in self._numbers:
+                raise KeyError('the parent of %r is not in the index'%(node,))
+            parentNumber=self._numbers[id(parent)]
+            depth=self._depths[parentNumber]+1
+        else:
+            parentNumber=-1
+            depth=0
+        self.generation+=1
+        count=0
+        todo:typing.Deque[typing.Tuple[queryTools.TreeLike,int,int]]=deque([(node,parentNumber,depth)])
+        while todo:
+            item,parentNumber,depth=todo.popleft()
+            if id(item) in self._numbers:
+                # the same node in two places, or a loop
+                continue
+            number=len(self._nodes)
+            self._nodes.append(item)
+            self._numbers[id(item)]=number
+            self._parents.append(parentNumber)
+            self._names.append(item.name)
+            self._depths.append(depth)
+            self._children.append({})
+            if parentNumber>=0:
+                self._children[parentNumber][number]=None
+            self._addName(number,item.name)
+            count+=1
+            for child in item.children:
+                todo.append((child,number,depth+1))
+        return count
+
+    def remove(self,node:queryTools.TreeLike)->int:
+        """
+        Forget a node that has been removed from the tree,
+        and everything that was under it
+
+        :return: how many nodes were removed
+        """
+        self._checkWritable()
+        number=self._number(node)
+        parentNumber=self._parents[number]
+        if parentNumber<0:
+            raise ValueError('the root cannot be removed from the index')
+        self.generation+=1
+        del self._children[parentNumber][number]
+        count=0
+        todo=[number]
+        while todo:
+            number=todo.pop()
+            todo.extend(self._children[number])
+            item=self._nodes[number]
+            del self._numbers[id(item)]
+            self._removeName(number,self._names[number])
+            self._nodes[number]=None
+            self._children[number]={}
+            count+=1
+        return count
+
+    def rename(self,node:queryTools.TreeLike)->None:
+        """
+        Update the index after a node's name has been changed
+        """
+        self._checkWritable()
+        number=self._number(node)
+        name=node.name
+        if name==self._names[number]:
+            return
+        self.generation+=1
+        self._removeName(number,self._names[number])
+        self._names[number]=name
+        self._addName(number,name)
+
+    def pathSegments(self,node:queryTools.TreeLike)->typing.List[str]:
+        """
+        get the path to a node, as the index knows it
+        """
+        number=self._number(node)
+        ret=[]
+        while number>=0:
+            ret.append(self._names[number])
+            number=self._parents[number]
+        ret.reverse()
+        return ret
+
+    def findWithAutomaton(self,
+        automaton:"queryTools.QueryAutomaton"
+        )->typing.Optional[typing.Iterable[queryTools.TreeLike]]:
+        """
+        Run a compiled query using the index
+
+        :return: the results, or None if it cannot be done this way
+            (the query has .. in it).  Results are breadth-first, though
+            nodes at the same depth may come in the order they were
+            indexed rather than the order they are in the tree.
+        """
+        numbers=self._find(automaton)
+        if numbers is None:
+            return None
+        nodes=self._nodes
+        return [nodes[number] for number in numbers] # type: ignore
+
+    def countWithAutomaton(self,automaton:"queryTools.QueryAutomaton")->typing.Optional[int]:
+        """
+        Count the results of a compiled query using the index
+
+        :return: the count, or None if it cannot be done this way
+        """
+        numbers=self._find(automaton,ordered=False)
+        if numbers is None:
+            return None
+        return len(numbers)
+
+    def _find(self,
+        automaton:"queryTools.QueryAutomaton",
+        ordered:bool=True
+        )->typing.Optional[typing.List[int]]:
+        """
+        get the numbers of all nodes that match a compiled query
+
+        :ordered: sort them breadth-first
+        """
+        if len(automaton.segments)!=1:
+            return None
+        segment=automaton.segments[0]
+        lastStep:typing.Any=None
+        for step in reversed(automaton.steps):
+            if not isinstance(step,int) or step!=queryTools.Query.__SAMEDIR_STEP__:
+                lastStep=step
+                break
+        if lastStep is None or isinstance(lastStep,int):
+            return self._walk(segment)
+        return self._check(segment,self._candidates(lastStep),ordered)
+
+    def _candidates(self,step:typing.Any)->typing.Iterable[int]:
+        """
+        numbers of all nodes that could be where a step leaves off
+        """
+        if isinstance(step,queryTools.LiteralStep):
+            if not step.ignoreCase:
+                return self._byName.get(step.literal,())
+            if self._byFolded is None:
+                self._byFolded={}
+                for name,numbers in self._byName.items():
+                    self._byFolded.setdefault(name.lower(),{}).update(numbers)
+            return self._byFolded.get(step.folded,())
+        names=list(self._byName)
+        filterIndices=getattr(step,'filterIndices',None)
+        if filterIndices is not None:
+            matched=[names[i] for i in filterIndices(names)]
+        else:
+            matcher=getattr(step,'fullmatch',step)
+            matched=[name for name in names if matcher(name)]
+        ret:typing.List[int]=[]
+        for name in matched:
+            ret.extend(self._byName[name])
+        return ret
+
+    def _check(self,
+        segment:"queryTools.QuerySegment",
+        candidates:typing.Iterable[int],
+        ordered:bool=True
+        )->typing.List[int]:
+        """
+        run the query down the path of each candidate
+        """
+        liveMask=segment.liveMask
+        acceptMask=segment.acceptMask
+        advance=segment.advance
+        parents=self._parents
+        names=self._names
+        # node number->states after it
+        masks:typing.Dict[int,int]={-1:0,0:segment.startMask}
+        found=[]
+        for number in candidates:
+            chain=[]
+            current=number
+            mask=masks.get(current)
+            while mask is None:
+                chain.append(current)
+                current=parents[current]
+                mask=masks.get(current)
+            for current in reversed(chain):
+                if mask&liveMask:
+                    mask=advance(mask,names[current])
+                else:
+                    mask=0
+                masks[current]=mask
+            if mask&acceptMask:
+                found.append(number)
+        if ordered:
+            depths=self._depths
+            found.sort(key=lambda number:(depths[number],number))
+        return found
+
+    def _walk(self,segment:"queryTools.QuerySegment")->typing.List[int]:
+        """
+        run the query by walking the index (rather than the tree)
+        """
+        liveMask=segment.liveMask
+        acceptMask=segment.acceptMask
+        advance=segment.advance
+        names=self._names
+        children=self._children
+        found=[]
+        frontier=[(0,segment.startMask)]
+        while frontier:
+            nextFrontier=[]
+            for number,mask in frontier:
+                if mask&acceptMask:
+                    found.append(number)
+                if mask&liveMask:
+                    for child in children[number]:
+                        childMask=advance(mask,names[child])
+                        if childMask:
+                            nextFrontier.append((child,childMask))
+            frontier=nextFrontier
+        return found
+
+    def toColumnar(self)->"queryTools.ColumnarTree":
+        """
+        Copy the index into a ColumnarTree
+        (with the nodes renumbered breadth-first)
+        """
+        def indexChildren(number:int)->typing.Iterable[typing.Tuple[str,int]]:
+            for child in self._children[number]:
+                yield self._names[child],child
+        return queryTools.ColumnarTree._build(self._names[0],0,indexChildren)
+
+    @staticmethod
+    def _byNameArrays(columnar:"queryTools.ColumnarTree")->typing.Tuple[typing.Any,typing.Any]:
+        """
+        get the byName offsets and numbers of a ColumnarTree
+        (see module docstring)
+        """
+        nameIds=columnar.nameIds
+        offsets=array('q',[0])*(len(columnar.names)+1)
+        for nameId in nameIds:
+            offsets[nameId+1]+=1
+        for nameId in range(len(columnar.names)):
+            offsets[nameId+1]+=offsets[nameId]
+        numbers=array('q',[0])*len(nameIds)
+        fill=offsets[:-1]
+        for number,nameId in enumerate(nameIds):
+            numbers[fill[nameId]]=number
+            fill[nameId]+=1
+        return offsets,numbers
+
+    def save(self,filename:str)->None:
+        """
+        Write the index to a file that can be memory mapped with open()
+        """
+        columnar=self.toColumnar()
+        offsets,numbers=self._byNameArrays(columnar)
+        with open(filename,'wb') as f:
+            size=0
+            for data in columnar.serialize():
+                f.write(data)
+                size+=len(data)
+            f.write(b'\0'*(-size%8))
+            f.write(self.__BYNAME_HEADER__.pack(self.__BYNAME_MAGIC__,len(columnar.names)))
+            f.write(offsets.tobytes())
+            f.write(numbers.tobytes())
+
+    @classmethod
+    def open(cls,filename:str)->"PathIndex":
+        """
+        Memory map an index written by save()
+
+        Since the file has only the paths, and none of the original
+        nodes, the results of queries on it are ColumnarNodes, and it
+        cannot be changed.  Call close() when done.
+        (A file written by ColumnarTree.save() can be opened too, but
+        then byName has to be worked out first.)
+        """
+        with open(filename,'rb') as f:
+            mm=mmap.mmap(f.fileno(),0,access=mmap.ACCESS_READ)
+        try:
+            columnar=queryTools.ColumnarTree.fromBuffer(mm,mm)
+        except Exception:
+            mm.close()
+            raise
+        ret=cls.__new__(cls)
+        ret._columnar=columnar
+        ret._views=[]
+        view=memoryview(mm)
+        try:
+            offset=columnar._dataSize(view)
+            offset+=-offset%8
+            header=cls.__BYNAME_HEADER__
+            byName=None
+            if len(view)>=offset+header.size:
+                magic,numNames=header.unpack_from(view,offset)
+                if magic==cls.__BYNAME_MAGIC__ and numNames==len(columnar.names):
+                    offset+=header.size
+                    offsets=view[offset:offset+(numNames+1)*8].cast('q')
+                    offset+=(numNames+1)*8
+                    numbers=view[offset:offset+len(columnar)*8].cast('q')
+                    ret._views=[offsets,numbers]
+                    byName=(offsets,numbers)
+        finally:
+            view.release()
+        if byName is None:
+            byName=cls._byNameArrays(columnar)
+        ret._byName=_MappedByName(columnar.names,*byName) # type: ignore
+        ret._byFolded=None
+        ret.tree=columnar.root
+        ret.generation=0
+        ret._numbers={}
+        size=len(columnar)
+        names=columnar.names
+        nameIds=columnar.nameIds
+        childOffsets=columnar.childOffsets
+        levelOffsets=columnar.levelOffsets
+        ret._parents=columnar.parents
+        ret._nodes=_MappedSequence(size,columnar.node) # type: ignore
+        ret._names=_MappedSequence(size,lambda number:names[nameIds[number]]) # type: ignore
+        ret._depths=_MappedSequence(size, # type: ignore
+            lambda number:bisect.bisect_right(levelOffsets,number)-1)
+        ret._children=_MappedSequence(size, # type: ignore
+            lambda number:range(childOffsets[number],childOffsets[number+1]))
+        return ret
+
+    def close(self)->None:
+        """
+        Let go of the file, if this was made with open()
+
+        (the index cannot be used after this)
+        """
+        if self._columnar is None:
+            return
+        self._byName={}
+        for view in self._views:
+            view.release()
+        self._views=[]
+        self._columnar.close()
+
+    def __repr__(self)->str:
+        return 'PathIndex(%r, %d nodes)'%(self.tree,len(self))
@@ -0,0 +1,236 @@
+"""
+Match a stream of paths (eg, piped from find or git ls-files)
+against queries, without building a tree
+
+Usage:
+    with open('paths.txt','rb') as f:
+        filterPaths([GlobQuery('/**/*.exe')],f,sys.stdout.buffer)
+
+Details:
+    the input is read in big chunks, each split at the last delimiter
+        (newline, or NUL for find -print0), and every path in a chunk
+        is checked with matchesMany(), which shares the work for
+        paths in the same directory
+    paths are bytes, so they are decoded with surrogateescape, and
+        anything that is not utf-8 comes out exactly as it went in
+    a leading ./ (as find prints) is ignored when matching
+    with more than one query, a path is written if it matches any of
+        them, and each query only checks the paths that the ones
+        before it did not match
+    with workers>1, chunks are matched by a pool of processes,
+        and the results are still written in the order they were read
+    matching paths are written a whole chunk at a time
+"""
+import typing
+from collections import deque
+import queryTools
+if typing.TYPE_CHECKING:
+    # only needed when there are workers, which imports it anyway
+    import concurrent.futures
+
+
+# (query class,query string,ignoreCase) - enough to make it again in a worker
+QuerySpec=typing.Tuple[typing.Type["queryTools.Query"],str,bool]
+
+# queries made again, per worker process
+_workerQueries:typing.Dict[typing.Tuple[QuerySpec,...],typing.List["queryTools.Query"]]={}
+
+
+def readChunks(
+    source:typing.BinaryIO,
+    delimiter:bytes=b'\n',
+    chunkSize:int=1<<20
+    )->typing.Generator[bytes,None,None]:
+    """
+    Read a stream in big chunks that each end at a delimiter
+    (except maybe the last one)
+    """
+    remainder=b''
+    while True:
+        data=source.read(chunkSize)
+        if not data:
+            break
+        data=remainder+data
+        end=data.rfind(delimiter)
+        if end<0:
+            # no delimiter yet, so it is all one path
+            remainder=data
+            continue
+        remainder=data[end+1:]
+        yield data[:end+1]
+    if remainder:
+        yield remainder
+
+
+def _splitPaths(data:bytes,delimiter:bytes)->typing.List[str]:
+    """
+    decode and split a chunk into paths
+    """
+    paths=data.decode('utf-8','surrogateescape').split(delimiter.decode('latin-1'))
+    if paths and not paths[-1]:
+        paths.pop()
+    return paths
+
+
+def _matchKeys(paths:typing.List[str])->typing.List[str]:
+    """
+    the paths as they should be matched (without a leading ./,
+    and . on its own is the root)
+    """
+    return [path[2:] if path.startswith('./') else '' if path=='.' else path
+        for path in paths]
+
+
+def matchChunk(
+    queries:typing.Sequence["queryTools.Query"],
+    data:bytes,
+    delimiter:bytes=b'\n',
+    outputDelimiter:typing.Optional[bytes]=None,
+    countOnly:bool=False
+    )->typing.Tuple[bytes,typing.List[int]]:
+    """
+    Match all the paths in a chunk
+
+    :return: (the matching paths, each followed by outputDelimiter,
+        [how many paths each query matched]).  When not countOnly,
+        only the first query that matches a path counts it.
+    """
+    if outputDelimiter is None:
+        outputDelimiter=delimiter
+    paths=_splitPaths(data,delimiter)
+    keys=_matchKeys(paths)
+    counts=[0]*len(queries)
+    if countOnly:
+        for i,query in enumerate(queries):
+            counts[i]=sum(1 for _ in query.matchesMany(keys,onlyMatches=True))
+        return b'',counts
+    # indices of the paths not matched yet
+    remaining:typing.List[int]=list(range(len(paths)))
+    matched:typing.List[int]=[]
+    for i,query in enumerate(queries):
+        if not remaining:
+            break
+        unmatched=[]
+        for idx,isMatch in zip(remaining,query.matchesMany([keys[idx] for idx in remaining])):
+            if isMatch:
+                matched.append(idx)
+            else:
+                unmatched.append(idx)
+        counts[i]=len(remaining)-len(unmatched)
+        remaining=unmatched
+    if not matched:
+        return b'',counts
+    if len(queries)>1:
+        matched.sort()
+    separator=outputDelimiter.decode('latin-1')
+    output=separator.join([paths[idx] for idx in matched])+separator
+    return output.encode('utf-8','surrogateescape'),counts
+
+
+def _matchChunkTask(
+    specs:typing.Tuple[QuerySpec,...],
+    data:bytes,
+    delimiter:bytes,
+    outputDelimiter:typing.Optional[bytes],
+    countOnly:bool
+    )->typing.Tuple[bytes,typing.List[int]]:
+    """
+    match a chunk (run in a worker process)
+    """
+    queries=_workerQueries.get(specs)
+    if queries is None:
+        queries=[queryClass(queryString,ignoreCase) for queryClass,queryString,ignoreCase in specs]
+        _workerQueries[specs]=queries
+    return matchChunk(queries,data,delimiter,outputDelimiter,countOnly)
+
+
+def _chunkResults(
+    queries:typing.Sequence["queryTools.Query"],
+    source:typing.BinaryIO,
+    delimiter:bytes,
+    outputDelimiter:typing.Optional[bytes],
+    countOnly:bool,
+    workers:int,
+    executor:"queryTools.ExecutorLike",
+    chunkSize:int
+    )->typing.Generator[typing.Tuple[bytes,typing.List[int]],None,None]:
+    """
+    match every chunk, in order
+    """
+    chunks=readChunks(source,delimiter,chunkSize)
+    if workers<=1:
+        for data in chunks:
+            yield matchChunk(queries,data,delimiter,outputDelimiter,countOnly)
+        return
+    specs=tuple((query.__class__,query.queryString,query.ignoreCase) for query in queries)
+    pool,ownPool,_=queryTools.parallelFind._makeExecutor(executor,workers)
+    submitted:typing.Deque["concurrent.futures.Future"]=deque()
+    try:
+        for data in chunks:
+            submitted.append(pool.submit(_matchChunkTask,specs,data,delimiter,outputDelimiter,countOnly))
+            # only get so far ahead, and give back results in order
+            while len(submitted)>=workers*4 or (submitted and submitted[0].done()):
+                yield submitted.popleft().result()
+        while submitted:
+            yield submitted.popleft().result()
+    finally:
+        if ownPool:
+            queryTools.parallelFind._shutdown(pool,submitted)
+        else:
+            for future in submitted:
+                future.cancel()
+
+
+def filterPaths(
+    queries:typing.Sequence["queryTools.Query"],
+    source:typing.BinaryIO,
+    output:typing.BinaryIO,
+    delimiter:bytes=b'\n',
+    outputDelimiter:typing.Optional[bytes]=None,
+    workers:int=1,
+    executor:"queryTools.ExecutorLike"='process',
+    chunkSize:int=1<<20
+    )->int:
+    """
+    Write every path that matches any of the queries
+
+    :queries: the queries (paths are relative to their root)
+    :source: where to read paths from (binary)
+    :output: where to write matching paths (binary)
+    :delimiter: what separates the paths (b'\\n' or b'\\0')
+    :outputDelimiter: what to put after each path written (default=delimiter)
+    :workers: how many processes (1 matches in this process)
+    :executor: "process", "thread", or a concurrent.futures.Executor
+    :chunkSize: how much to read at a time
+    :return: how many paths were written
+    """
+    ret=0
+    for data,counts in _chunkResults(queries,source,delimiter,outputDelimiter,
+        False,workers,executor,chunkSize):
+        if data:
+            output.write(data)
+        ret+=sum(counts)
+    return ret
+
+
+def countPaths(
+    queries:typing.Sequence["queryTools.Query"],
+    source:typing.BinaryIO,
+    delimiter:bytes=b'\n',
+    workers:int=1,
+    executor:"queryTools.ExecutorLike"='process',
+    chunkSize:int=1<<20
+    )->typing.List[int]:
+    """
+    Count how many paths match each query
+
+    (see filterPaths() for the parameters)
+
+    :return: [count for each query]
+    """
+    ret=[0]*len(queries)
+    for _,counts in _chunkResults(queries,source,delimiter,None,
+        True,workers,executor,chunkSize):
+        for i,count in enumerate(counts):
+            ret[i]+=count
+    return ret
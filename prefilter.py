@@ -0,0 +1,299 @@
+"""
+Cheap checks that can rule a name out before running a regex on it.
+
+Most regexes have parts that any match must contain word for word,
+for instance ".*calc.*[.]exe" can only match names that contain "calc"
+and end with ".exe".  Those parts are worked out once, when the
+regex is compiled, and then startswith/endswith/in (or bytes.find)
+run first so the regex only runs on names that could possibly match.
+
+Details:
+    prefix - literal text every match starts with (only for fullmatch)
+    suffix - literal text every match ends with (only for fullmatch)
+    contains - other literal text every match contains
+    if the regex ignores case, only ascii text is prefiltered
+        (since the regex engine's idea of case folding is not the same
+        as str.lower() for every character)
+    checking a whole list of names with filterIndices() is much faster
+        than one at a time, since the checks do not need a function call each
+    every PrefilteredStep counts how many names it checked and how
+        many were thrown out without running the regex (see PrefilterStats)
+"""
+import typing
+import re
+try:
+    from re import _parser as _reParser # type: ignore
+    from re import _constants as _reConstants # type: ignore
+except ImportError:
+    import sre_parse as _reParser # type: ignore
+    import sre_constants as _reConstants # type: ignore
+
+
+# marks a place in a sequence that is not a known literal
+_BREAK=None
+
+
+if hasattr(str,'isascii'):
+    _isAscii=str.isascii
+else:
+    def _isAscii(text:str)->bool:
+        """
+        check whether text is all ascii (str.isascii() is python>=3.7)
+        """
+        return all(ord(c)<128 for c in text)
+
+
+def _literalTokens(items:typing.Iterable[typing.Tuple[typing.Any,typing.Any]])->typing.List[typing.Optional[str]]:
+    """
+    flatten a parsed regex into a list of literal characters,
+    with _BREAK wherever the text is not known
+    """
+    ret:typing.List[typing.Optional[str]]=[]
+    for op,av in items:
+        if op==_reConstants.LITERAL:
+            ret.append(chr(av))
+        elif op==_reConstants.SUBPATTERN and not av[1] and not av[2]:
+            # a group that does not change any flags
+            ret.extend(_literalTokens(av[3]))
+        elif op==_reConstants.AT:
+            # anchors do not use up any characters
+            pass
+        elif op in (_reConstants.MAX_REPEAT,_reConstants.MIN_REPEAT):
+            ret.append(_BREAK)
+            if av[0]>=1:
+                # at least the first time round has to be there
+                ret.extend(_literalTokens(av[2]))
+                ret.append(_BREAK)
+        else:
+            ret.append(_BREAK)
+    return ret
+
+
+def patternRequirements(
+    pattern:typing.Pattern
+    )->typing.Optional[typing.Tuple[str,str,typing.Tuple[str,...]]]:
+    """
+    Work out the literal text that anything a regex fullmatches must have
+
+    (for bytes regexes, each character stands for one byte)
+
+    :return: (prefix,suffix,(other text it must contain)),
+        or None if there is nothing useful
+    """
+    if pattern.flags&(re.VERBOSE|getattr(re,'LOCALE',0)):
+        return None
+    try:
+        parsed=_reParser.parse(pattern.pattern,pattern.flags)
+    except Exception:
+        return None
+    tokens=_literalTokens(parsed)
+    runs:typing.List[str]=[]
+    current:typing.List[str]=[]
+    for token in tokens+[_BREAK]:
+        if token is _BREAK:
+            runs.append(''.join(current))
+            current=[]
+        else:
+            current.append(token)
+    prefix=''
+    suffix=''
+    if tokens and tokens[0] is not _BREAK:
+        prefix=runs.pop(0)
+    if tokens and tokens[-1] is not _BREAK and runs:
+        suffix=runs.pop()
+    contains=tuple(sorted({run for run in runs if run},key=len,reverse=True))
+    if not prefix and not suffix and not contains:
+        return None
+    return prefix,suffix,contains
+
+
+class PrefilterStats:
+    """
+    How many names (or chunks of text) were checked,
+    and how many were thrown out without running the regex
+    """
+
+    __slots__=('checked','rejected')
+
+    def __init__(self,checked:int=0,rejected:int=0):
+        self.checked=checked
+        self.rejected=rejected
+
+    @property
+    def rejectionRate(self)->float:
+        """
+        fraction of checks that did not need the regex
+        """
+        if not self.checked:
+            return 0.0
+        return self.rejected/self.checked
+
+    def add(self,other:"PrefilterStats")->None:
+        """
+        add another set of counts to this one
+        """
+        self.checked+=other.checked
+        self.rejected+=other.rejected
+
+    def reset(self)->None:
+        """
+        set the counts back to zero
+        """
+        self.checked=0
+        self.rejected=0
+
+    def __repr__(self)->str:
+        return 'PrefilterStats(checked=%d, rejected=%d, rejectionRate=%.3f)'%(
+            self.checked,self.rejected,self.rejectionRate)
+
+
+class PrefilteredStep:
+    """
+    A regex query step that tries cheap literal checks
+    before running the regex
+
+    Looks enough like a compiled regex to be used in its place.
+    """
+
+    __slots__=('regex','prefix','suffix','contains','ignoreCase','stats')
+
+    def __init__(self,
+        regex:typing.Pattern,
+        prefix:str='',
+        suffix:str='',
+        contains:typing.Iterable[str]=()):
+        """
+        :regex: the regex to run on names that get through
+        :prefix: text every match starts with
+        :suffix: text every match ends with
+        :contains: other text every match contains
+        """
+        self.regex=regex
+        self.ignoreCase=bool(regex.flags&re.IGNORECASE)
+        if self.ignoreCase:
+            prefix=prefix.lower()
+            suffix=suffix.lower()
+            contains=[literal.lower() for literal in contains]
+        self.prefix=prefix
+        self.suffix=suffix
+        self.contains=tuple(contains)
+        self.stats=PrefilterStats()
+
+    def fullmatch(self,name:str)->typing.Optional[typing.Match]:
+        """
+        check to see if a name matches, trying the cheap checks first
+        """
+        stats=self.stats
+        stats.checked+=1
+        text=name
+        if self.ignoreCase:
+            if not _isAscii(name):
+                return self.regex.fullmatch(name)
+            text=name.lower()
+        if len(text)<len(self.prefix)+len(self.suffix) \
+            or not text.startswith(self.prefix) or not text.endswith(self.suffix):
+            stats.rejected+=1
+            return None
+        for literal in self.contains:
+            if literal not in text:
+                stats.rejected+=1
+                return None
+        return self.regex.fullmatch(name)
+
+    def filterIndices(self,names:typing.Sequence[str])->typing.List[int]:
+        """
+        get the indices of all the names that fullmatch
+
+        (much cheaper than calling fullmatch() on each name, since
+        the literal checks run without a function call per name)
+        """
+        fullmatch=self.regex.fullmatch
+        texts=names
+        if self.ignoreCase:
+            if not _isAscii(''.join(names)):
+                return [i for i,name in enumerate(names) if self.fullmatch(name)]
+            texts=[name.lower() for name in names]
+        prefix=self.prefix
+        suffix=self.suffix
+        candidates:typing.Iterable[int]
+        if prefix and suffix:
+            candidates=[i for i,text in enumerate(texts) if text.startswith(prefix) and text.endswith(suffix)]
+        elif prefix:
+            candidates=[i for i,text in enumerate(texts) if text.startswith(prefix)]
+        elif suffix:
+            candidates=[i for i,text in enumerate(texts) if text.endswith(suffix)]
+        else:
+            candidates=range(len(texts))
+        for literal in self.contains:
+            candidates=[i for i in candidates if literal in texts[i]]
+        numCandidates=len(candidates) # type: ignore
+        self.stats.checked+=len(names)
+        self.stats.rejected+=len(names)-numCandidates
+        if numCandidates==len(names):
+            return [i for i,name in enumerate(names) if fullmatch(name)]
+        return [i for i in candidates if fullmatch(names[i])]
+
+    def match(self,name:str)->typing.Optional[typing.Match]:
+        """
+        same as the regex's match() (not prefiltered)
+        """
+        return self.regex.match(name)
+
+    @property
+    def pattern(self)->str:
+        """
+        the regular expression
+        """
+        return self.regex.pattern
+
+    @property
+    def flags(self)->int:
+        """
+        the regular expression flags
+        """
+        return self.regex.flags
+
+    def __eq__(self,other:typing.Any)->bool:
+        return isinstance(other,PrefilteredStep) and other.regex==self.regex
+
+    def __hash__(self)->int:
+        return hash(self.regex)
+
+    def __repr__(self)->str:
+        return 'PrefilteredStep(%r, prefix=%r, suffix=%r, contains=%r)'%(
+            self.regex.pattern,self.prefix,self.suffix,self.contains)
+
+
+def prefilterPattern(
+    pattern:typing.Pattern
+    )->typing.Union[typing.Pattern,PrefilteredStep]:
+    """
+    Wrap a compiled regex in a PrefilteredStep if it has any
+    required literal text, otherwise return it as it is
+    """
+    requirements=patternRequirements(pattern)
+    if requirements is None or not isinstance(pattern.pattern,str):
+        return pattern
+    prefix,suffix,contains=requirements
+    if pattern.flags&re.IGNORECASE and not _isAscii(''.join((prefix,suffix)+contains)):
+        return pattern
+    return PrefilteredStep(pattern,prefix,suffix,contains)
+
+
+def requiredBytes(pattern:typing.Pattern[bytes])->typing.Optional[bytes]:
+    """
+    Get the longest text that any match of a bytes regex
+    must contain (for skipping text that cannot match)
+
+    :return: the bytes, or None if there aren't any (or the regex ignores case)
+    """
+    if pattern.flags&re.IGNORECASE:
+        return None
+    requirements=patternRequirements(pattern)
+    if requirements is None:
+        return None
+    prefix,suffix,contains=requirements
+    longest=max((prefix,suffix)+contains,key=len)
+    if not longest:
+        return None
+    return longest.encode('latin-1')
@@ -0,0 +1,177 @@
+"""
+A lazy TreeLike view of python primatives (eg, from json.load)
+that does not copy anything
+
+Gives the same nodes as primativeAsTree(), but:
+    the original dicts and lists are used as they are
+    a node is only created when it is asked for (and is not kept,
+        so asking again gives a new one)
+    paths are only worked out when asked for
+    queries look up plain names directly in dicts, and only create
+        nodes for the children that can still match (see childSummary())
+    children still come in order, but a query looks at all of a node's
+        branches before any of its leaves, so results can come out in
+        a different order, eg, {'a':None,'b':{'c':None}} gives /b then /a
+
+Since nodes are not kept, two views of the same item are not the same
+object (though they do compare equal), so queries tell them apart
+by __hash__/__eq__ (see visitedMode).
+"""
+import typing
+import queryTools
+
+
+_SCALARS=(str,int,float,bool)
+
+
+class _DictLookup:
+    """
+    Looks enough like a {name:[children]} dict for the query
+    to look up plain names, without listing every child
+    """
+
+    __slots__=('node',)
+
+    def __init__(self,node:"PrimativeView"):
+        self.node=node
+
+    def get(self,name:str,default:typing.Any=None)->typing.Any:
+        value=self.node.value
+        if name not in value:
+            return default
+        child=value[name]
+        return [self.node.__class__(child,name,self.node,child is None)]
+
+
+class PrimativeView:
+    """
+    A lazy TreeLike view of python primatives
+    (see module docstring)
+
+    Usage:
+        root=PrimativeView(json.load(f))
+        for item in GlobQuery('/**/name').find(root):
+            print(item.path)
+    """
+
+    __slots__=('value','name','parent','isLeaf','_summary')
+
+    # these are made from the tree, so they cannot loop
+    isAcyclic:bool=True
+    # but the same node can be two different objects
+    visitedMode:int=queryTools.Tape.__VISITED_HASH__
+
+    def __init__(self,
+        value:typing.Any,
+        name:str='',
+        parent:typing.Optional["PrimativeView"]=None,
+        isLeaf:bool=False):
+        """
+        :value: the dict, list, or value this is a view of
+        :name: name of this item
+        :parent: parent item
+        :isLeaf: this is a name with nothing under it
+        """
+        self.value=value
+        self.name=name
+        self.parent=parent
+        self.isLeaf=isLeaf
+        self._summary:typing.Optional[typing.Tuple[
+            typing.List[str],typing.List[str],typing.List[typing.Any]]]=None
+
+    def _entries(self)->typing.Iterator[typing.Tuple[str,typing.Any,bool]]:
+        """
+        get (name,value,isLeaf) for every child, the same as primativeAsTree()
+        """
+        value=self.value
+        if self.isLeaf or value is None:
+            return
+        if isinstance(value,_SCALARS):
+            # a value becomes the only child
+            yield str(value),None,True
+        elif hasattr(value,'items'):
+            for k,v in value.items():
+                yield k,v,v is None
+        else:
+            for item in value:
+                if isinstance(item,_SCALARS):
+                    yield str(item),None,True
+                else:
+                    yield '',item,False
+
+    @property
+    def children(self)->typing.Iterable["PrimativeView"]:
+        """
+        children of this item (created as they are asked for)
+        """
+        cls=self.__class__
+        for name,value,isLeaf in self._entries():
+            yield cls(value,name,self,isLeaf)
+
+    def childSummary(self)->typing.Tuple[typing.List[str],typing.List[str]]:
+        """
+        get ([branch names],[leaf names]) without creating any children
+        """
+        if self._summary is None:
+            branchNames:typing.List[str]=[]
+            leafNames:typing.List[str]=[]
+            branchValues:typing.List[typing.Any]=[]
+            for name,value,isLeaf in self._entries():
+                if isLeaf:
+                    leafNames.append(name)
+                else:
+                    branchNames.append(name)
+                    branchValues.append(value)
+            self._summary=(branchNames,leafNames,branchValues)
+        return self._summary[0],self._summary[1]
+
+    def childAt(self,isLeaf:bool,index:int)->"PrimativeView":
+        """
+        create a single child
+        """
+        branchNames,leafNames=self.childSummary()
+        if isLeaf:
+            return self.__class__(None,leafNames[index],self,True)
+        return self.__class__(self._summary[2][index],branchNames[index],self) # type: ignore
+
+    def childIndex(self,folded:bool=False)->typing.Optional[_DictLookup]:
+        """
+        look up children by name (only for dicts, and not ignoring case)
+        """
+        if folded or self.isLeaf or not hasattr(self.value,'items'):
+            return None
+        return _DictLookup(self)
+
+    @property
+    def pathSegments(self)->typing.Iterable[str]:
+        """
+        get the path to this item
+        """
+        ret=[]
+        item:typing.Optional[PrimativeView]=self
+        while item is not None:
+            ret.append(item.name)
+            item=item.parent
+        ret.reverse()
+        return ret
+
+    @property
+    def path(self)->str:
+        """
+        get the path to this item
+        """
+        return '/'+('/'.join(self.pathSegments))
+
+    def __eq__(self,other:typing.Any)->bool:
+        if self is other:
+            return True
+        if not isinstance(other,PrimativeView) or self.name!=other.name \
+            or self.value is not other.value or self.isLeaf!=other.isLeaf:
+            return False
+        return self.parent==other.parent
+
+    def __hash__(self)->int:
+        return hash((self.name,id(self.value)))
+
+    def __repr__(self)->str:
+        return 'PrimativeView(%r)'%self.path
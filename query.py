@@ -4,6 +4,8 @@
 This adds support for finding things by query
 """
 import typing
+import os
+import sys
 from abc import abstractmethod
 import queryTools
 
@@ -23,7 +25,10 @@ class Query:
         ignoreCase:bool=False):
         """ """
         self._queryString:str=''
-        self._querySteps:typing.List[typing.Union[typing.Pattern,int]]=[]
+        self._ignoreCase:bool=ignoreCase
+        self._querySteps:typing.Sequence[typing.Union[typing.Pattern,int]]=[]
+        self._plan:typing.Optional[queryTools.QueryPlan]=None
+        self._automaton:typing.Optional[queryTools.QueryAutomaton]=None
         self.assign(queryString,ignoreCase)
 
     @property
@@ -34,7 +39,68 @@ class Query:
         return self._queryString
     @queryString.setter
     def queryString(self,queryString:str):
-        self.assign(queryString)
+        self.assign(queryString,self._ignoreCase)
+
+    @property
+    def ignoreCase(self)->bool:
+        """
+        whether the query ignores case
+        """
+        return self._ignoreCase
+
+    @property
+    def automaton(self)->"queryTools.QueryAutomaton":
+        """
+        the query steps compiled into a state machine
+
+        (compiled the first time it is asked for)
+        """
+        if self._automaton is None:
+            if self._plan is not None:
+                # shared with all other queries using the same plan
+                self._automaton=self._plan.automaton
+            else:
+                self._automaton=queryTools.QueryAutomaton(self._querySteps)
+        return self._automaton
+
+    @property
+    def prefilterStats(self)->"queryTools.PrefilterStats":
+        """
+        how many names were thrown out by literal checks
+        without running a regex, over all steps
+
+        (steps are shared by every query with the same plan,
+        so so are the counts)
+        """
+        ret=queryTools.PrefilterStats()
+        for step in self._querySteps:
+            stats=getattr(step,'stats',None)
+            if isinstance(stats,queryTools.PrefilterStats):
+                ret.add(stats)
+        return ret
+
+    def explain(self,stats:typing.Optional["queryTools.QueryStats"]=None)->str:
+        """
+        Describe how the query will be run, step by step
+
+        :stats: also show the counts from running it (see QueryStats)
+        """
+        lines=['%s(%r%s)'%(self.__class__.__name__,self.queryString,
+            ', ignoreCase=True' if self.ignoreCase else '')]
+        steps=list(self._querySteps)
+        numSegments=1+sum(1 for step in steps if step==self.__PARENTDIR_STEP__)
+        lines.append('  %d steps in %d segment(s)'%(len(steps),numSegments))
+        for i,step in enumerate(steps):
+            kind,details=queryTools.describeStep(step)
+            lines.append('  %3d %-13s %s'%(i,kind,details))
+            if stats is not None and i<len(stats.steps):
+                counts=stats.steps[i]
+                if counts.visited:
+                    lines.append('      %-13s visited=%d evaluations=%d matches=%d pruned=%d seconds=%.6f'%('',
+                        counts.visited,counts.evaluations,counts.matches,counts.pruned,counts.seconds))
+        if stats is not None:
+            lines.append('  expanded=%d results=%d seconds=%.6f'%(stats.expanded,stats.results,stats.seconds))
+        return '\n'.join(lines)
 
     @abstractmethod
     def assign(self,
@@ -53,49 +119,264 @@ class Query:
         Child classes must implement
         """
 
+    def matchesMany(self,
+        paths:typing.Iterable[typing.Union[str,typing.List[str]]],
+        onlyMatches:bool=False
+        )->typing.Generator[typing.Any,None,None]:
+        """
+        check a lot of paths
+
+        Child classes may override this to share work between paths
+
+        :onlyMatches: yield only the paths that match instead of a bool for each
+        """
+        for path in paths:
+            matched=self.matches(path)
+            if not onlyMatches:
+                yield matched
+            elif matched:
+                yield path
+
     @abstractmethod
     def find(self,
-        tree:queryTools.TreeLike,
-        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]=None
-        )->typing.Generator[queryTools.TreeLike,None,None]:
+        tree:"queryTools.TreeLike",
+        _tape:typing.Optional["queryTools.Tape[queryTools.TreeLike]"]=None
+        )->typing.Generator["queryTools.TreeLike",None,None]:
         """
         Finds items in the tree using a breadth-first search
 
         :tree: starting location of the tree.  Usually you'd pass root.
         """
 
+    def first(self,tree:"queryTools.TreeLike")->typing.Optional["queryTools.TreeLike"]:
+        """
+        Get the first item find() would return, searching no further
+
+        Child classes may override this to do it faster
+
+        :return: the item, or None if nothing matches
+        """
+        found=self.find(tree)
+        try:
+            for item in found:
+                return item
+            return None
+        finally:
+            found.close()
+
+    def exists(self,tree:"queryTools.TreeLike")->bool:
+        """
+        Check whether anything matches, searching no further
+        than the first match
+
+        Child classes may override this to do it faster
+        """
+        found=self.find(tree)
+        try:
+            for _ in found:
+                return True
+            return False
+        finally:
+            found.close()
+
+    def count(self,tree:"queryTools.TreeLike")->int:
+        """
+        Count how many items find() would return
+
+        Child classes may override this to do it faster
+        """
+        return sum(1 for _ in self.find(tree))
+
+    def afind(self,
+        tree:typing.Union["queryTools.TreeLike","queryTools.AsyncTreeLike"],
+        concurrency:int=16,
+        maxBuffered:int=64
+        )->typing.AsyncGenerator[typing.Any,None]:
+        """
+        Finds items in a tree whose children have to be awaited
+        (see AsyncTreeLike)
+
+        Usage:
+            async for item in query.afind(root):
+                ...
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        :concurrency: the most nodes to be fetching children at once
+        :maxBuffered: the most results to find ahead of the consumer
+        """
+        return queryTools.afindWithAutomaton(self.automaton,tree,concurrency,maxBuffered)
+
+    def __or__(self,other:typing.Any)->"queryTools.CompositeQuery":
+        """
+        items that match either query (see CompositeQuery)
+        """
+        if not isinstance(other,Query):
+            return NotImplemented
+        return queryTools.CompositeQuery('|',self,other)
+
+    def __and__(self,other:typing.Any)->"queryTools.CompositeQuery":
+        """
+        items that match both queries (see CompositeQuery)
+        """
+        if not isinstance(other,Query):
+            return NotImplemented
+        return queryTools.CompositeQuery('&',self,other)
+
+    def __sub__(self,other:typing.Any)->"queryTools.CompositeQuery":
+        """
+        items that match this query but not the other (see CompositeQuery)
+        """
+        if not isinstance(other,Query):
+            return NotImplemented
+        return queryTools.CompositeQuery('-',self,other)
+
     def __repr__(self)->str:
         return str(self.queryString)
 
 
-def cmdline(args:typing.Iterable[str]):
+_QUERY_TYPES={
+    'glob':lambda:queryTools.GlobQuery,
+    're':lambda:queryTools.ReQuery,
+    'grep':lambda:queryTools.GrepQuery}
+
+
+def _makeQuery(text:str,defaultType:str,ignoreCase:bool)->Query:
+    """
+    make a query from a "type:query" string (the type is optional)
+    """
+    queryType,sep,queryString=text.partition(':')
+    if not sep or queryType not in _QUERY_TYPES:
+        queryType,queryString=defaultType,text
+    return _QUERY_TYPES[queryType]()(queryString,ignoreCase)
+
+
+def _usage()->int:
+    print("""Usage:
+  python -m queryTools [options] [query ...] < paths
+Reads paths (eg, from find or git ls-files) and writes the ones that
+match any of the queries.  A query can start with glob:, re: or grep:
+to say what kind it is (otherwise see --type).  Exits with 1 if nothing
+matched.
+Options:
+  --file=FILE ........ read more queries from a file, one per line
+                       (blank lines and lines starting with # are skipped)
+  --type=TYPE ........ glob (the default), re, or grep
+  -i, --ignore-case .. ignore case
+  -0, --null ......... paths are separated by NUL (eg, find -print0)
+  --print0 ........... separate the paths written with NUL
+  --count ............ write how many paths matched each query instead
+  --workers=N ........ match in N processes (0=one per cpu, default=1)
+  --chunk-size=N ..... read N bytes at a time (default=1048576)
+  --plans=FILE ....... keep compiled queries in a file, so later runs
+                       with the same queries do not compile them again""")
+    return -1
+
+
+# arguments that need an =value
+_VALUE_ARGS=('--file','--type','--workers','--chunk-size','--plans')
+# ...and the ones where it is a number
+_NUMBER_ARGS=('--workers','--chunk-size')
+
+
+def cmdline(args:typing.Iterable[str],
+    stdin:typing.Optional[typing.BinaryIO]=None,
+    stdout:typing.Optional[typing.BinaryIO]=None):
     """
     Run the command line
 
     :param args: command line arguments (WITHOUT the filename)
+    :param stdin: where to read paths from (default=sys.stdin)
+    :param stdout: where to write results (default=sys.stdout)
     """
+    queryTexts:typing.List[str]=[]
+    defaultType='glob'
+    ignoreCase=False
+    delimiter=b'\n'
+    outputDelimiter:typing.Optional[bytes]=None
+    countOnly=False
+    workers=1
+    chunkSize=1<<20
+    plansFile:typing.Optional[str]=None
     printhelp=False
-    if not args:
-        printhelp=True
-    else:
-        for arg in args:
-            if arg.startswith('-'):
-                av=[a.strip() for a in arg.split('=',1)]
-                if av[0] in ['-h','--help']:
+    for arg in args:
+        if arg.startswith('-'):
+            av=[a.strip() for a in arg.split('=',1)]
+            if av[0] in _VALUE_ARGS:
+                if len(av)<2 or not av[1]:
+                    sys.stderr.write('ERR: "'+av[0]+'" needs a value, eg "'+av[0]+'=..."\n')
                     printhelp=True
-                else:
-                    print('ERR: unknown argument "'+av[0]+'"')
+                    continue
+                if av[0] in _NUMBER_ARGS:
+                    try:
+                        int(av[1])
+                    except ValueError:
+                        sys.stderr.write('ERR: "'+av[0]+'" must be a whole number, not "'+av[1]+'"\n')
+                        printhelp=True
+                        continue
+            if av[0] in ['-h','--help']:
+                printhelp=True
+            elif av[0]=='--file':
+                try:
+                    with open(av[1],encoding='utf-8') as f:
+                        for line in f:
+                            line=line.strip()
+                            if line and not line.startswith('#'):
+                                queryTexts.append(line)
+                except OSError as e:
+                    sys.stderr.write('ERR: cannot read "'+av[1]+'" ('+str(e.strerror)+')\n')
+                    return -1
+            elif av[0]=='--type':
+                if av[1] not in _QUERY_TYPES:
+                    sys.stderr.write('ERR: unknown query type "'+av[1]+'"\n')
+                    return -1
+                defaultType=av[1]
+            elif av[0] in ['-i','--ignore-case']:
+                ignoreCase=True
+            elif av[0] in ['-0','--null']:
+                delimiter=b'\0'
+            elif av[0]=='--print0':
+                outputDelimiter=b'\0'
+            elif av[0]=='--count':
+                countOnly=True
+            elif av[0]=='--workers':
+                workers=int(av[1]) or os.cpu_count() or 1
+            elif av[0]=='--chunk-size':
+                chunkSize=int(av[1])
+            elif av[0]=='--plans':
+                plansFile=av[1]
             else:
-                print('ERR: unknown argument "'+arg+'"')
-    if printhelp:
-        print('Usage:')
-        print('  query.py [options]')
-        print('Options:')
-        print('   NONE')
-        return -1
-    return 0
+                sys.stderr.write('ERR: unknown argument "'+av[0]+'"\n')
+                printhelp=True
+        else:
+            queryTexts.append(arg)
+    if printhelp or not queryTexts:
+        return _usage()
+    planCache=queryTools.defaultPlanCache
+    if plansFile is not None and os.path.exists(plansFile):
+        try:
+            planCache.load(plansFile)
+        except ValueError as e:
+            # eg, saved by another version, so it will be saved again
+            sys.stderr.write('WARN: '+str(e)+'\n')
+    built=planCache.misses-planCache.restored
+    queries=[_makeQuery(text,defaultType,ignoreCase) for text in queryTexts]
+    if plansFile is not None and planCache.misses-planCache.restored>built:
+        planCache.save(plansFile)
+    if stdin is None:
+        stdin=sys.stdin.buffer
+    if stdout is None:
+        stdout=sys.stdout.buffer
+    if countOnly:
+        counts=queryTools.countPaths(queries,stdin,delimiter,workers,chunkSize=chunkSize)
+        for count,text in zip(counts,queryTexts):
+            stdout.write(('%d\t%s\n'%(count,text)).encode('utf-8','surrogateescape'))
+        matched=sum(counts)
+    else:
+        matched=queryTools.filterPaths(queries,stdin,stdout,delimiter,outputDelimiter,
+            workers,chunkSize=chunkSize)
+    stdout.flush()
+    return 0 if matched else 1
 
 
 if __name__=='__main__':
-    import sys
     sys.exit(cmdline(sys.argv[1:]))
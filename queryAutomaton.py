@@ -0,0 +1,961 @@
+"""
+Compiles a list of query steps into a state machine (NFA)
+so that a tree can be searched in a single pass.
+
+Details:
+    state k means "step k is the next one to be applied"
+    the final state (len(steps)) is the accepting state
+    active states are carried around as an int bitmask
+    __SAMEDIR_STEP__ is an epsilon move to the next state
+    __CHILDOF_STEP__ moves to the next state on any child
+    __DESCENDENTOF_STEP__ loops on any child, and has an
+        epsilon move to the next state (so it can match zero levels)
+    a regex step moves to the next state on a child whose name matches
+    __PARENTDIR_STEP__ cannot be done walking down the tree, so it
+        splits the query into segments.  Each segment is walked on its own
+        and the parents of its results are where the next segment starts.
+
+Since the walk only goes into a child when it still has
+active states, subtrees that can never match are never listed.
+
+Steps that are only a plain name become LiteralSteps, and if a node
+has a childIndex(folded) method that returns a {name:[children]} dict
+(or None if it does not want to) those steps are looked up rather than
+checked against every child.
+
+A tree that knows it cannot have any loops can say so with an
+isAcyclic attribute, and visited nodes will not be tracked
+(unless the query has a .., since then a node can be reached
+from more than one start).  A node that is reached again with
+states it has not had before is expanded again with only those.
+A tree that creates its nodes again each time they are asked for
+can say how to tell them apart with a visitedMode attribute
+(eg, Tape.__VISITED_HASH__ to use __hash__/__eq__ rather than id()).
+
+A node that knows it has no children can say so with an isLeaf
+attribute, and it will not even be put on the tape unless it matches.
+
+A node can also avoid creating child nodes that are not needed by
+providing childSummary(), returning ([branch names],[leaf names]),
+and childAt(isLeaf,index) to create a single child.  Leaves are then
+only looked at if a step could end on them.
+
+A tree that has a faster way of running a compiled query
+(for instance, ColumnarTree) can provide a
+    findWithAutomaton(automaton)
+method that returns the results, or None to do it the normal way.
+
+Passing workers to find() searches with a pool of threads or
+processes instead (see parallelFind).
+"""
+import typing
+import re
+import time
+import queryTools
+
+
+StepMatcher=typing.Callable[[str],typing.Any]
+QueryStep=typing.Union[typing.Pattern,StepMatcher,int]
+
+_REGEX_SPECIAL=frozenset('.^$*+?{}[]|()')
+
+
+def patternLiteral(pattern:typing.Pattern)->typing.Optional[str]:
+    """
+    If a compiled regex can only ever fullmatch one exact string
+    (ignoring case if it has re.IGNORECASE) get that string.
+
+    :return: the literal string, or None if it is a real regex
+    """
+    if isinstance(pattern,LiteralStep):
+        return pattern.literal
+    source=pattern.pattern
+    if not isinstance(source,str) or pattern.flags&re.VERBOSE:
+        return None
+    ret=[]
+    i=0
+    while i<len(source):
+        c=source[i]
+        if c=='\\':
+            i+=1
+            if i>=len(source):
+                return None
+            c=source[i]
+            if c.isalnum():
+                # \d, \w, \1, etc
+                return None
+        elif c in _REGEX_SPECIAL:
+            return None
+        ret.append(c)
+        i+=1
+    return ''.join(ret)
+
+
+class LiteralStep:
+    """
+    A query step that is only a plain name (no regex or glob characters)
+
+    Looks enough like a compiled regex to be used in its place,
+    but can also be looked up by name instead of being tried
+    against every child.
+    """
+
+    __slots__=('literal','ignoreCase','folded')
+
+    def __init__(self,literal:str,ignoreCase:bool=False):
+        self.literal=literal
+        self.ignoreCase=ignoreCase
+        self.folded=literal.lower() if ignoreCase else literal
+
+    def fullmatch(self,name:str)->typing.Optional[bool]:
+        """
+        check to see if a name is this literal
+
+        (like a regex, returns None when it does not match)
+        """
+        if name==self.literal or (self.ignoreCase and name.lower()==self.folded):
+            return True
+        return None
+    match=fullmatch
+
+    @property
+    def pattern(self)->str:
+        """
+        the equivalent regular expression
+        """
+        return re.escape(self.literal)
+
+    @property
+    def flags(self)->int:
+        """
+        the equivalent regular expression flags
+        """
+        return re.IGNORECASE if self.ignoreCase else 0
+
+    def __eq__(self,other:typing.Any)->bool:
+        return isinstance(other,LiteralStep) \
+            and other.literal==self.literal and other.ignoreCase==self.ignoreCase
+
+    def __hash__(self)->int:
+        return hash((self.literal,self.ignoreCase))
+
+    def __repr__(self)->str:
+        return 'LiteralStep(%r%s)'%(self.literal,', ignoreCase=True' if self.ignoreCase else '')
+
+
+def describeStep(step:QueryStep)->typing.Tuple[str,str]:
+    """
+    Describe a query step for people to read
+
+    :return: (kind,details)
+    """
+    if isinstance(step,int):
+        return {
+            queryTools.Query.__SAMEDIR_STEP__:('samedir','.'),
+            queryTools.Query.__PARENTDIR_STEP__:('parentdir','..'),
+            queryTools.Query.__CHILDOF_STEP__:('childof','*'),
+            queryTools.Query.__DESCENDENTOF_STEP__:('descendentof','**'),
+            }.get(step,('unknown',str(step)))
+    if isinstance(step,LiteralStep):
+        return ('literal','%r%s (looked up by name)'%(
+            step.literal,', ignoreCase' if step.ignoreCase else ''))
+    if isinstance(step,queryTools.GlobStep):
+        return ('glob','%r%s (%s, without a regex)'%(step.glob,
+            ', ignoreCase' if step.ignoreCase else '',step.kind))
+    if isinstance(step,queryTools.PrefilteredStep):
+        checks=[]
+        if step.prefix:
+            checks.append('prefix=%r'%step.prefix)
+        if step.suffix:
+            checks.append('suffix=%r'%step.suffix)
+        if step.contains:
+            checks.append('contains=%r'%(step.contains,))
+        return ('regex','%r%s (prefiltered: %s)'%(step.pattern,
+            ', ignoreCase' if step.ignoreCase else '',', '.join(checks)))
+    pattern=getattr(step,'pattern',None)
+    if pattern is not None:
+        return ('regex','%r%s'%(pattern,', ignoreCase' if getattr(step,'flags',0)&re.IGNORECASE else ''))
+    return ('matcher',repr(step))
+
+
+class _ExpandedStates:
+    """
+    The states each node has been expanded with so far
+
+    A node can be reached more than once with different states
+    (eg, from two starts at different depths after a .., or around
+    a loop), so rather than skipping a node that has been seen before,
+    it is expanded again with only the states that are new.
+    """
+
+    __slots__=('key','_states')
+
+    def __init__(self,key:typing.Callable[[typing.Any],typing.Hashable]=id):
+        """
+        :key: how to tell nodes apart (the nodes are held on to,
+            so an id() cannot be reused while this is around)
+        """
+        self.key=key
+        self._states:typing.Dict[typing.Hashable,typing.Tuple[typing.Any,int]]={}
+
+    def newStates(self,node:typing.Any,mask:int)->int:
+        """
+        get the states a node has not been expanded with yet
+        """
+        seen=self._states.get(self.key(node))
+        if seen is None:
+            return mask
+        return mask&~seen[1]
+
+    def add(self,node:typing.Any,mask:int)->int:
+        """
+        note that a node is being expanded
+
+        :return: the states it has not been expanded with before
+            (only those need expanding, and it has already been
+            yielded if the accepting state is not among them)
+        """
+        key=self.key(node)
+        seen=self._states.get(key)
+        if seen is None:
+            self._states[key]=(node,mask)
+            return mask
+        new=mask&~seen[1]
+        if new:
+            self._states[key]=(node,seen[1]|mask)
+        return new
+
+
+def _visitKeyFor(tree:typing.Any)->typing.Callable[[typing.Any],typing.Hashable]:
+    """
+    get how to tell the nodes of a tree apart (see visitedMode)
+    """
+    if getattr(tree,'visitedMode',None)==queryTools.Tape.__VISITED_HASH__:
+        return queryTools.tape._itself
+    return id
+
+
+def _expandedStatesFor(tree:typing.Any,numStarts:int)->typing.Optional[_ExpandedStates]:
+    """
+    get something to keep track of expanded states in a search
+    that does not use a tape
+
+    :return: None if there is no need (no loops, and only one start)
+    """
+    if numStarts<=1 and getattr(tree,'isAcyclic',False):
+        return None
+    return _ExpandedStates(_visitKeyFor(tree))
+
+
+class QuerySegment:
+    """
+    A run of query steps without any __PARENTDIR_STEP__ in it,
+    compiled into a state machine.
+    """
+
+    __EPSILON__=0
+    __ANY__=1
+    __LOOP__=2
+    __MATCH__=3
+
+    def __init__(self,steps:typing.Iterable[QueryStep]):
+        self._steps:typing.List[QueryStep]=list(steps)
+        self._kinds:typing.List[int]=[]
+        self._matchers:typing.List[typing.Optional[StepMatcher]]=[]
+        for step in self._steps:
+            matcher:typing.Optional[StepMatcher]=None
+            if isinstance(step,int):
+                if step==queryTools.Query.__SAMEDIR_STEP__:
+                    kind=self.__EPSILON__
+                elif step==queryTools.Query.__CHILDOF_STEP__:
+                    kind=self.__ANY__
+                elif step==queryTools.Query.__DESCENDENTOF_STEP__:
+                    kind=self.__LOOP__
+                else:
+                    raise ValueError('Unexpected query step %d'%step)
+            else:
+                kind=self.__MATCH__
+                matcher=getattr(step,'fullmatch',step)
+            self._kinds.append(kind)
+            self._matchers.append(matcher)
+        numStates=len(self._kinds)+1
+        self.acceptMask:int=1<<(numStates-1)
+        # states that can consume a child, eg, anything that is
+        # not the end or an epsilon
+        self.liveMask:int=0
+        for k,kind in enumerate(self._kinds):
+            if kind!=self.__EPSILON__:
+                self.liveMask|=1<<k
+        # epsilon closure of each state
+        self._closures:typing.List[int]=[0]*numStates
+        for k in range(numStates-1,-1,-1):
+            closure=1<<k
+            if k<numStates-1 and self._kinds[k] in (self.__EPSILON__,self.__LOOP__):
+                closure|=self._closures[k+1]
+            self._closures[k]=closure
+        self.startMask:int=self._closures[0]
+        self._transitions:typing.Dict[int,typing.List[typing.Tuple[int,typing.Optional[StepMatcher],int]]]={}
+        self._literals:typing.List[typing.Optional[LiteralStep]]=[
+            step if isinstance(step,LiteralStep) else None for step in self._steps]
+        self._fast:typing.Dict[int,typing.Tuple[
+            int,typing.Dict[str,int],typing.Dict[str,int],
+            typing.List[typing.Tuple[StepMatcher,int]]]]={}
+        self._leafFast:typing.Dict[int,typing.Tuple[
+            int,typing.Dict[str,int],typing.Dict[str,int],
+            typing.List[typing.Tuple[StepMatcher,int]]]]={}
+
+    def _transitionsFor(self,mask:int
+        )->typing.List[typing.Tuple[int,typing.Optional[StepMatcher],int]]:
+        """
+        get the (kind,matcher,resultMask) transitions
+        for all live states in a mask
+        """
+        ret=self._transitions.get(mask)
+        if ret is None:
+            ret=[]
+            for k,kind in enumerate(self._kinds):
+                if not mask&(1<<k) or kind==self.__EPSILON__:
+                    continue
+                if kind==self.__LOOP__:
+                    resultMask=self._closures[k]
+                else:
+                    resultMask=self._closures[k+1]
+                ret.append((kind,self._matchers[k],resultMask))
+            self._transitions[mask]=ret
+        return ret
+
+    def _fastFor(self,mask:int)->typing.Tuple[
+            int,typing.Dict[str,int],typing.Dict[str,int],
+            typing.List[typing.Tuple[StepMatcher,int]]]:
+        """
+        all transitions for a mask merged into
+            (mask for any child,
+            {literal name:mask},
+            {lowercase literal name:mask},
+            [(matcher,mask)])
+        """
+        ret=self._fast.get(mask)
+        if ret is None:
+            anyMask=0
+            exact:typing.Dict[str,int]={}
+            folded:typing.Dict[str,int]={}
+            matchers:typing.List[typing.Tuple[StepMatcher,int]]=[]
+            for k,kind in enumerate(self._kinds):
+                if not mask&(1<<k) or kind==self.__EPSILON__:
+                    continue
+                if kind==self.__LOOP__:
+                    anyMask|=self._closures[k]
+                elif kind==self.__ANY__:
+                    anyMask|=self._closures[k+1]
+                else:
+                    literal=self._literals[k]
+                    if literal is None:
+                        matchers.append((self._matchers[k],self._closures[k+1])) # type: ignore
+                    elif literal.ignoreCase:
+                        folded[literal.folded]=folded.get(literal.folded,0)|self._closures[k+1]
+                    else:
+                        exact[literal.literal]=exact.get(literal.literal,0)|self._closures[k+1]
+            ret=(anyMask,exact,folded,matchers)
+            self._fast[mask]=ret
+        return ret
+
+    def _leafFastFor(self,mask:int)->typing.Tuple[
+            int,typing.Dict[str,int],typing.Dict[str,int],
+            typing.List[typing.Tuple[StepMatcher,int]]]:
+        """
+        same as _fastFor() but only the transitions that can end in
+        the accepting state (since a leaf has nowhere else to go)
+        """
+        ret=self._leafFast.get(mask)
+        if ret is None:
+            anyMask,exact,folded,matchers=self._fastFor(mask)
+            acceptMask=self.acceptMask
+            ret=(anyMask&acceptMask,
+                {k:v for k,v in exact.items() if v&acceptMask},
+                {k:v for k,v in folded.items() if v&acceptMask},
+                [(m,v) for m,v in matchers if v&acceptMask])
+            self._leafFast[mask]=ret
+        return ret
+
+    def advance(self,mask:int,name:str)->int:
+        """
+        Given the active states of a node, get the active states
+        of a child with the given name.
+
+        :return: the new mask, 0 means nothing below could ever match
+        """
+        ret,exact,folded,matchers=self._fastFor(mask)
+        if exact:
+            ret|=exact.get(name,0)
+        if folded:
+            ret|=folded.get(name.lower(),0)
+        for matcher,resultMask in matchers:
+            if matcher(name):
+                ret|=resultMask
+        return ret
+
+    def _lookupChildren(self,
+        node:"queryTools.TreeLike",
+        mask:int
+        )->typing.Optional[typing.Iterable[typing.Tuple["queryTools.TreeLike",int]]]:
+        """
+        If the only way forward from a mask is by plain names, and the node
+        has a child index, get the (child,mask) pairs by looking them up.
+
+        :return: None if the children have to be checked one by one
+        """
+        anyMask,exact,folded,matchers=self._fastFor(mask)
+        if anyMask or matchers:
+            return None
+        childIndex=getattr(node,'childIndex',None)
+        if childIndex is None:
+            return None
+        ret=[]
+        for literals,isFolded in ((exact,False),(folded,True)):
+            if not literals:
+                continue
+            index=childIndex(isFolded)
+            if index is None:
+                return None
+            for literal,resultMask in literals.items():
+                for child in index.get(literal,()):
+                    ret.append((child,resultMask))
+        return ret
+
+    def walk(self,
+        starts:typing.Iterable["queryTools.TreeLike"],
+        _tape:"queryTools.Tape",
+        startMask:typing.Optional[int]=None,
+        countLeaves:typing.Optional[typing.Callable[[int],None]]=None
+        )->typing.Generator["queryTools.TreeLike",None,None]:
+        """
+        Walk the tree breadth-first and yield every node that
+        ends in the accepting state.
+
+        :startMask: the active states at the starting nodes
+            (default=the start of the segment)
+        :countLeaves: see expand()
+        """
+        # the active states of everything waiting on the tape
+        pending:typing.Dict[typing.Hashable,int]={}
+        # key->(node,states it has been expanded with), the same as
+        # _ExpandedStates, but without a call for every node
+        # (None when nothing can be reached twice)
+        expanded:typing.Optional[typing.Dict[typing.Hashable,typing.Tuple[typing.Any,int]]]=None
+        if not isinstance(_tape.visited,queryTools.NullSet):
+            expanded={}
+        visitKey=_tape.visitKey
+        # (it is up to expanded whether a node goes on the tape again)
+        tapePush=_tape.pushAgain
+        def push(node:"queryTools.TreeLike",mask:int)->None:
+            key=visitKey(node)
+            if key in pending:
+                # got here two different ways, so do both
+                pending[key]|=mask
+                return
+            if expanded is not None:
+                seen=expanded.get(key)
+                if seen is not None and not mask&~seen[1]:
+                    return
+            pending[key]=mask
+            tapePush(node)
+        if startMask is None:
+            startMask=self.startMask
+        for start in starts:
+            push(start,startMask)
+        acceptMask=self.acceptMask
+        liveMask=self.liveMask
+        expand=self.expand
+        tapePop=_tape.pop
+        while not _tape.isDone:
+            node=tapePop()
+            key=visitKey(node)
+            mask=pending.pop(key)
+            if expanded is not None:
+                seen=expanded.get(key)
+                if seen is not None:
+                    # only the states that are new
+                    mask&=~seen[1]
+                    expanded[key]=(node,seen[1]|mask)
+                else:
+                    expanded[key]=(node,mask)
+            if mask&acceptMask:
+                yield node
+            if mask&liveMask:
+                expand(node,mask,push,countLeaves)
+            # else nothing else can match below here, so skip the subtree
+
+    def expand(self,
+        node:"queryTools.TreeLike",
+        mask:int,
+        push:typing.Callable[["queryTools.TreeLike",int],None],
+        countLeaves:typing.Optional[typing.Callable[[int],None]]=None
+        )->None:
+        """
+        Work out which children of a node can still match
+
+        :node: the node to expand
+        :mask: the active states of the node
+        :push: called with (child,childMask) for every child that
+            can still match (or is itself a match)
+        :countLeaves: if given, leaves from childSummary() that match
+            are not created, and instead this is called with how many
+            there were (for counting results)
+        """
+        anyMask,exact,folded,matchers=self._fastFor(mask)
+        if not anyMask and not matchers:
+            lookedUp=self._lookupChildren(node,mask)
+            if lookedUp is not None:
+                for child,childMask in lookedUp:
+                    push(child,childMask)
+                return
+        childSummary=getattr(node,'childSummary',None)
+        if childSummary is not None:
+            # only create the children that are going on the tape
+            branchNames,leafNames=childSummary()
+            childAt=node.childAt # type: ignore
+            if not exact and not folded and not matchers:
+                for i in range(len(branchNames)):
+                    push(childAt(False,i),anyMask)
+                branchNames=()
+            for i,name in enumerate(branchNames):
+                childMask=anyMask
+                if exact:
+                    childMask|=exact.get(name,0)
+                if folded:
+                    childMask|=folded.get(name.lower(),0)
+                for matcher,resultMask in matchers:
+                    if matcher(name):
+                        childMask|=resultMask
+                if childMask:
+                    push(childAt(False,i),childMask)
+            leafAny,leafExact,leafFolded,leafMatchers=self._leafFastFor(mask)
+            if leafAny:
+                if countLeaves is not None:
+                    countLeaves(len(leafNames))
+                    return
+                for i in range(len(leafNames)):
+                    push(childAt(True,i),leafAny)
+            elif len(leafMatchers)==1 and not leafExact and not leafFolded:
+                # the most common case, eg **/*.exe
+                matcher,resultMask=leafMatchers[0]
+                filterIndices=getattr(getattr(matcher,'__self__',None),'filterIndices',None)
+                if filterIndices is not None:
+                    # eg, a PrefilteredStep can check them all at once
+                    indices=filterIndices(leafNames)
+                else:
+                    indices=[i for i,name in enumerate(leafNames) if matcher(name)]
+                if countLeaves is not None:
+                    countLeaves(len(indices))
+                    return
+                for i in indices:
+                    push(childAt(True,i),resultMask)
+            elif leafExact or leafFolded or leafMatchers:
+                numLeaves=0
+                for i,name in enumerate(leafNames):
+                    childMask=0
+                    if leafExact:
+                        childMask|=leafExact.get(name,0)
+                    if leafFolded:
+                        childMask|=leafFolded.get(name.lower(),0)
+                    for matcher,resultMask in leafMatchers:
+                        if matcher(name):
+                            childMask|=resultMask
+                    if not childMask:
+                        continue
+                    if countLeaves is not None:
+                        numLeaves+=1
+                    else:
+                        push(childAt(True,i),childMask)
+                if countLeaves is not None:
+                    countLeaves(numLeaves)
+            return
+        acceptMask=self.acceptMask
+        for child in node.children:
+            # same as advance(), but only looking up the transitions once
+            childMask=anyMask
+            if exact or folded or matchers:
+                name=child.name
+                if exact:
+                    childMask|=exact.get(name,0)
+                if folded:
+                    childMask|=folded.get(name.lower(),0)
+                for matcher,resultMask in matchers:
+                    if matcher(name):
+                        childMask|=resultMask
+            if not childMask:
+                continue
+            if not childMask&acceptMask and getattr(child,'isLeaf',False):
+                # it could only match further down, but there is no further down
+                continue
+            push(child,childMask)
+
+    def walkInstrumented(self,
+        starts:typing.Iterable["queryTools.TreeLike"],
+        _tape:"queryTools.Tape",
+        stats:"queryTools.QueryStats",
+        stepOffset:int=0
+        )->typing.Generator["queryTools.TreeLike",None,None]:
+        """
+        Same as walk(), but goes child by child and counts everything
+
+        :stats: where to put the counts
+        :stepOffset: index of this segment's first step in the whole query
+        """
+        perfCounter=time.perf_counter
+        callback=stats.callback
+        stepStats=[stats.step(stepOffset+k) for k in range(len(self._kinds))]
+        pending:typing.Dict[typing.Hashable,int]={}
+        expanded:typing.Optional[_ExpandedStates]=None
+        if not isinstance(_tape.visited,queryTools.NullSet):
+            expanded=_ExpandedStates(_tape.visitKey)
+        visitKey=_tape.visitKey
+        def push(node:"queryTools.TreeLike",mask:int)->None:
+            key=visitKey(node)
+            if key in pending:
+                pending[key]|=mask
+            elif expanded is None or expanded.newStates(node,mask):
+                pending[key]=mask
+                _tape.pushAgain(node)
+        for start in starts:
+            push(start,self.startMask)
+        closures=self._closures
+        while not _tape.isDone:
+            node=_tape.pop()
+            mask=pending.pop(visitKey(node))
+            if expanded is not None:
+                mask=expanded.add(node,mask)
+            if mask&self.acceptMask:
+                yield node
+            if not mask&self.liveMask:
+                continue
+            started=perfCounter()
+            stats.expanded+=1
+            active=[k for k,kind in enumerate(self._kinds)
+                if mask&(1<<k) and kind!=self.__EPSILON__]
+            for child in node.children:
+                name=child.name
+                childMask=0
+                for k in active:
+                    counts=stepStats[k]
+                    counts.visited+=1
+                    kind=self._kinds[k]
+                    if kind==self.__LOOP__:
+                        matched=True
+                        childMask|=closures[k]
+                    elif kind==self.__ANY__:
+                        matched=True
+                        childMask|=closures[k+1]
+                    else:
+                        matchStarted=perfCounter()
+                        matched=bool(self._matchers[k](name)) # type: ignore
+                        counts.seconds+=perfCounter()-matchStarted
+                        counts.evaluations+=1
+                        if matched:
+                            childMask|=closures[k+1]
+                    if matched:
+                        counts.matches+=1
+                    if callback is not None:
+                        callback(stepOffset+k,child,matched)
+                if childMask:
+                    push(child,childMask)
+                else:
+                    # nothing below here is ever looked at
+                    for k in active:
+                        stepStats[k].pruned+=1
+            stats.seconds+=perfCounter()-started
+
+    def matchesPositions(self,
+        names:typing.Sequence[str],
+        starts:typing.Iterable[int]
+        )->typing.Set[int]:
+        """
+        Walk a single path rather than a tree.
+
+        :names: the names along the path
+        :starts: positions along the path to start at
+            (0=before the first name)
+        :return: all positions that end in the accepting state
+        """
+        ret=set()
+        for pos in starts:
+            mask=self.startMask
+            while True:
+                if mask&self.acceptMask:
+                    ret.add(pos)
+                if pos>=len(names) or not mask&self.liveMask:
+                    break
+                mask=self.advance(mask,names[pos])
+                if not mask:
+                    break
+                pos+=1
+        return ret
+
+
+class QueryAutomaton:
+    """
+    A compiled query that can search a tree in a single pass.
+
+    Usually you would get this from query.automaton
+    rather than creating it yourself.
+    """
+
+    def __init__(self,steps:typing.Iterable[QueryStep]):
+        self.steps:typing.Tuple[QueryStep,...]=tuple(steps)
+        self.segments:typing.List[QuerySegment]=[]
+        # index of the first step of each segment
+        self.stepOffsets:typing.List[int]=[0]
+        currentSteps:typing.List[QueryStep]=[]
+        for i,step in enumerate(self.steps):
+            if isinstance(step,int) and step==queryTools.Query.__PARENTDIR_STEP__:
+                self.segments.append(QuerySegment(currentSteps))
+                self.stepOffsets.append(i+1)
+                currentSteps=[]
+            else:
+                currentSteps.append(step)
+        self.segments.append(QuerySegment(currentSteps))
+
+    def find(self,
+        tree:"queryTools.TreeLike",
+        _tape:typing.Optional["queryTools.Tape"]=None,
+        workers:typing.Optional[int]=None,
+        executor:"queryTools.ExecutorLike"='thread',
+        ordered:bool=False,
+        stats:typing.Optional["queryTools.QueryStats"]=None,
+        cache:typing.Optional["queryTools.FindCache"]=None,
+        limit:typing.Optional[int]=None
+        )->typing.Generator["queryTools.TreeLike",None,None]:
+        """
+        Finds items in the tree using a breadth-first search
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        :workers: if more than 1, search with this many threads/processes
+            (see findParallel)
+        :executor: "thread", "process", or a concurrent.futures.Executor
+        :ordered: when using workers, still return results in breadth-first order
+        :stats: count what every step does (see QueryStats).
+            This runs a slower, child by child search, and always
+            runs here rather than with workers.
+        :cache: reuse the results from last time if the tree has not
+            changed (see FindCache).  Not used along with stats.
+        :limit: stop searching after this many results
+        """
+        if limit is not None:
+            if limit<=0:
+                return
+            found=self.find(tree,_tape,workers,executor,ordered,stats,cache)
+            try:
+                for i,node in enumerate(found,1):
+                    yield node
+                    if i>=limit:
+                        break
+            finally:
+                found.close()
+            return
+        if cache is not None and stats is None:
+            yield from cache.find(self,tree,
+                lambda:self.find(tree,_tape,workers,executor,ordered))
+            return
+        if stats is None and workers is not None and workers>1:
+            yield from queryTools.findParallel(self,tree,workers,executor,ordered)
+            return
+        finder=getattr(tree,'findWithAutomaton',None)
+        if finder is not None:
+            if stats is None:
+                # the tree knows a faster way to do it
+                results=finder(self)
+                if results is not None:
+                    yield from results
+                    return
+            tree=getattr(tree,'root',tree)
+        if _tape is None:
+            if getattr(tree,'isAcyclic',False) and len(self.segments)==1:
+                # no loops, and only one place to start, so no
+                # node can be reached twice
+                _tape=queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_NONE__)
+            else:
+                _tape=queryTools.Tape(visitedMode=getattr(tree,'visitedMode',
+                    queryTools.Tape.__VISITED_IDENTITY__))
+        starts:typing.List["queryTools.TreeLike"]=[tree]
+        lastIdx=len(self.segments)-1
+        for i,segment in enumerate(self.segments):
+            if i>0:
+                # __PARENTDIR_STEP__ between segments
+                parents:typing.Dict[typing.Hashable,"queryTools.TreeLike"]={}
+                for start in starts:
+                    parent=start.parent
+                    if parent is not None:
+                        parents.setdefault(_tape.visitKey(parent),parent)
+                starts=list(parents.values())
+            if stats is not None:
+                found=segment.walkInstrumented(starts,_tape if i==lastIdx else _tape.empty(),
+                    stats,self.stepOffsets[i])
+            elif i==lastIdx:
+                found=segment.walk(starts,_tape)
+            else:
+                found=segment.walk(starts,_tape.empty())
+            if i!=lastIdx:
+                starts=list(found)
+            elif stats is not None:
+                for node in found:
+                    stats.results+=1
+                    yield node
+            else:
+                yield from found
+
+    def first(self,tree:"queryTools.TreeLike")->typing.Optional["queryTools.TreeLike"]:
+        """
+        Get the first item find() would return, searching no further
+
+        :return: the item, or None if nothing matches
+        """
+        found=self.find(tree)
+        try:
+            for node in found:
+                return node
+            return None
+        finally:
+            # let go of the tape (and everything visited) right away
+            found.close()
+
+    def exists(self,tree:"queryTools.TreeLike")->bool:
+        """
+        Check whether anything matches, searching no further
+        than the first match
+        """
+        found=self.find(tree)
+        try:
+            for _ in found:
+                return True
+            return False
+        finally:
+            found.close()
+
+    def count(self,tree:"queryTools.TreeLike")->int:
+        """
+        Count how many items find() would return
+
+        The tree can do it faster by providing countWithAutomaton(automaton),
+        returning the count (or None to do it the normal way).  Otherwise,
+        leaves from childSummary() that match are counted without being created.
+        """
+        counter=getattr(tree,'countWithAutomaton',None)
+        if counter is not None:
+            ret=counter(self)
+            if ret is not None:
+                return ret
+        finder=getattr(tree,'findWithAutomaton',None)
+        if finder is not None:
+            results=finder(self)
+            if results is not None:
+                return sum(1 for _ in results)
+            tree=getattr(tree,'root',tree)
+        if len(self.segments)!=1:
+            return sum(1 for _ in self.find(tree))
+        if getattr(tree,'isAcyclic',False):
+            tape=queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_NONE__)
+        else:
+            tape=queryTools.Tape()
+        leaves=[0]
+        def countLeaves(numLeaves:int)->None:
+            leaves[0]+=numLeaves
+        ret=sum(1 for _ in self.segments[0].walk([tree],tape,countLeaves=countLeaves))
+        return ret+leaves[0]
+
+    def matches(self,names:typing.Sequence[str])->bool:
+        """
+        check to see if a path (as a list of names below the root)
+        matches this query
+        """
+        positions={0}
+        for i,segment in enumerate(self.segments):
+            if i>0:
+                positions={pos-1 for pos in positions if pos>0}
+            positions=segment.matchesPositions(names,positions)
+            if not positions:
+                return False
+        return len(names) in positions
+
+    def matchesMany(self,
+        paths:typing.Iterable[typing.Union[str,typing.Sequence[str]]],
+        onlyMatches:bool=False,
+        maxMemo:int=1000000
+        )->typing.Generator[typing.Any,None,None]:
+        """
+        check a lot of paths without creating any tree nodes
+
+        Work is shared between paths:
+            the states after each directory are remembered, so paths
+            in the same directory only split and check their last name
+            the result of each (states,name) pair is remembered, so the
+            same name in the same place is only ever checked once
+
+        :paths: path strings (or lists of names) relative to the root
+            (empty names are skipped, so '/a//b/' and ['a','','b'] are a/b)
+        :onlyMatches: yield only the paths that match instead of a bool for each
+        :maxMemo: forget what has been remembered when it gets this big
+        """
+        if len(self.segments)!=1:
+            # .. steps are position based, so go one at a time
+            for path in paths:
+                if isinstance(path,str):
+                    names=[name for name in path.split('/') if name]
+                else:
+                    names=[name for name in path if name]
+                matched=self.matches(names)
+                if not onlyMatches:
+                    yield matched
+                elif matched:
+                    yield path
+            return
+        segment=self.segments[0]
+        startMask=segment.startMask
+        acceptMask=segment.acceptMask
+        liveMask=segment.liveMask
+        advance=segment.advance
+        # directory->states after it
+        dirMasks:typing.Dict[str,int]={'':startMask}
+        # (states,name)->states
+        transitions:typing.Dict[typing.Tuple[int,str],int]={}
+        def step(mask:int,name:str)->int:
+            if not name or not mask:
+                return mask
+            if not mask&liveMask:
+                return 0
+            key=(mask,name)
+            ret=transitions.get(key)
+            if ret is None:
+                if len(transitions)>maxMemo:
+                    transitions.clear()
+                ret=advance(mask,name)
+                transitions[key]=ret
+            return ret
+        for path in paths:
+            if isinstance(path,str):
+                head,_,leaf=path.rpartition('/')
+                mask=dirMasks.get(head)
+                if mask is None:
+                    # only check the size when it could have grown
+                    if len(dirMasks)>maxMemo:
+                        dirMasks.clear()
+                        dirMasks['']=startMask
+                    # work down from the nearest known directory
+                    prefixes=[]
+                    current=head
+                    while mask is None:
+                        prefixes.append(current)
+                        current=current.rpartition('/')[0]
+                        mask=dirMasks.get(current)
+                    for prefix in reversed(prefixes):
+                        mask=step(mask,prefix.rpartition('/')[2])
+                        dirMasks[prefix]=mask
+                mask=step(mask,leaf)
+            else:
+                mask=startMask
+                for name in path:
+                    mask=step(mask,name)
+            matched=bool(mask&acceptMask)
+            if not onlyMatches:
+                yield matched
+            elif matched:
+                yield path
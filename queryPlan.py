@@ -0,0 +1,329 @@
+"""
+A process-wide cache of compiled queries
+
+Parsing a query string and compiling its regular expressions
+is far more expensive than looking it up, and python's own re cache
+is small, so when the same queries are created over and over
+they share a single compiled plan instead.
+
+Plans can also be saved to a file and loaded by another process
+(eg, each run of a command line tool), which then makes the steps
+straight from what was saved, without parsing the query string again
+or working out prefilters.  Loaded plans are only made into steps the
+first time their query is created, so loading a file of many queries
+costs little more than reading it.
+"""
+import typing
+import os
+import re
+import json
+import threading
+from collections import OrderedDict
+import queryTools
+
+
+# change whenever the steps a query is compiled into change,
+# so that plans saved before are not used
+_PLAN_FORMAT=1
+
+
+class QueryPlan:
+    """
+    The compiled (and immutable) form of a query
+    that can be shared between query objects
+    """
+
+    __slots__=('steps','_automaton')
+
+    def __init__(self,steps:typing.Iterable[typing.Any]):
+        self.steps:typing.Tuple[typing.Any,...]=tuple(steps)
+        self._automaton:typing.Optional[queryTools.QueryAutomaton]=None
+
+    @property
+    def automaton(self)->"queryTools.QueryAutomaton":
+        """
+        the steps compiled into a state machine
+
+        (compiled the first time it is asked for)
+        """
+        if self._automaton is None:
+            self._automaton=queryTools.QueryAutomaton(self.steps)
+        return self._automaton
+
+    def toRecord(self)->typing.Optional[typing.List[typing.Any]]:
+        """
+        the steps as something json can store (see encodeStep)
+
+        :return: the record, or None if any step can not be stored
+        """
+        ret=[]
+        for step in self.steps:
+            record=encodeStep(step)
+            if record is None:
+                return None
+            ret.append(record)
+        return ret
+
+    @classmethod
+    def fromRecord(cls,record:typing.Iterable[typing.Any])->"QueryPlan":
+        """
+        make a plan again from toRecord()
+        """
+        return cls(decodeStep(step) for step in record)
+
+
+def encodeStep(step:typing.Any)->typing.Any:
+    """
+    Turn a compiled query step into something json can store
+
+    Saves what it was compiled into (eg, the literal, the regex source
+    and flags, the prefilter text) so that decodeStep() does not need
+    to work any of it out again.
+
+    :return: the record, or None if the step can not be stored
+    """
+    if isinstance(step,int):
+        return step
+    if isinstance(step,typing.Pattern):
+        if isinstance(step.pattern,bytes):
+            return ['bytes',step.pattern.decode('latin-1'),step.flags]
+        return ['re',step.pattern,step.flags]
+    if isinstance(step,queryTools.LiteralStep):
+        return ['literal',step.literal,step.ignoreCase]
+    if isinstance(step,queryTools.PrefilteredStep):
+        return ['prefiltered',step.pattern,step.flags,step.prefix,step.suffix,list(step.contains)]
+    if isinstance(step,queryTools.GlobStep):
+        return ['glob',step.glob,step.kind,step.prefix,step.suffix,step.ignoreCase]
+    return None
+
+
+def decodeStep(record:typing.Any)->typing.Any:
+    """
+    Make a compiled query step again from encodeStep()
+    """
+    if isinstance(record,int):
+        return record
+    kind=record[0]
+    if kind=='re':
+        return re.compile(record[1],record[2])
+    if kind=='bytes':
+        return re.compile(record[1].encode('latin-1'),record[2])
+    if kind=='literal':
+        return queryTools.LiteralStep(record[1],record[2])
+    if kind=='prefiltered':
+        return queryTools.PrefilteredStep(re.compile(record[1],record[2]),record[3],record[4],record[5])
+    if kind=='glob':
+        return queryTools.GlobStep(record[1],record[2],record[3],record[4],record[5])
+    raise ValueError('Unknown query step kind "%s"'%kind)
+
+
+def _storeKey(key:typing.Hashable)->typing.Optional[str]:
+    """
+    a plan's key as a string that is the same in every process
+
+    :return: the string, or None if the key can not be stored
+    """
+    parts=[]
+    for item in key if isinstance(key,tuple) else (key,):
+        if isinstance(item,type):
+            parts.append('<%s.%s>'%(item.__module__,item.__qualname__))
+        elif item is None or isinstance(item,(str,bytes,int,float)):
+            parts.append(repr(item))
+        else:
+            return None
+    return ','.join(parts)
+
+
+def _encodePlan(plan:typing.Any)->typing.Optional[typing.List[typing.Any]]:
+    """
+    a cached plan as something json can store
+
+    (plans are QueryPlans, or a single regex for queries that only need that)
+    """
+    if isinstance(plan,QueryPlan):
+        steps=plan.toRecord()
+        if steps is None:
+            return None
+        return ['plan',steps]
+    step=encodeStep(plan)
+    if step is None or isinstance(step,int):
+        return None
+    return ['step',step]
+
+
+def _decodePlan(record:typing.List[typing.Any])->typing.Any:
+    """
+    make a cached plan again from _encodePlan()
+    """
+    if record[0]=='plan':
+        return QueryPlan.fromRecord(record[1])
+    if record[0]=='step':
+        return decodeStep(record[1])
+    raise ValueError('Unknown plan kind "%s"'%record[0])
+
+
+class QueryPlanCache:
+    """
+    A bounded, least-recently-used cache of compiled queries
+
+    Keys are usually (query class,query string,ignoreCase)
+    """
+
+    def __init__(self,maxSize:int=1024):
+        """
+        :maxSize: the most plans to keep (0 turns off caching)
+        """
+        self._maxSize=maxSize
+        self._plans:typing.OrderedDict[typing.Hashable,typing.Any]=OrderedDict()
+        # _storeKey()->_encodePlan() for plans loaded from a file
+        self._stored:typing.Dict[str,typing.Any]={}
+        self._lock=threading.Lock()
+        self.hits:int=0
+        self.misses:int=0
+        self.evictions:int=0
+        # misses that were made from a loaded plan instead of built
+        self.restored:int=0
+
+    @property
+    def maxSize(self)->int:
+        """
+        the most plans to keep (0 turns off caching)
+        """
+        return self._maxSize
+    @maxSize.setter
+    def maxSize(self,maxSize:int):
+        with self._lock:
+            self._maxSize=maxSize
+            self._evict()
+
+    def _evict(self)->None:
+        """
+        get rid of least recently used plans until it fits
+
+        (call while locked)
+        """
+        while len(self._plans)>max(self._maxSize,0):
+            self._plans.popitem(last=False)
+            self.evictions+=1
+
+    def get(self,
+        key:typing.Hashable,
+        build:typing.Callable[[],typing.Any]
+        )->typing.Any:
+        """
+        get a cached plan, or build and cache a new one
+
+        (or make it from a loaded one, see load())
+
+        :key: what the plan is for
+        :build: create the plan if it is not already cached
+        """
+        record=None
+        with self._lock:
+            plan=self._plans.get(key)
+            if plan is not None:
+                self._plans.move_to_end(key)
+                self.hits+=1
+                return plan
+            self.misses+=1
+            if self._stored:
+                storeKey=_storeKey(key)
+                if storeKey is not None:
+                    record=self._stored.get(storeKey)
+        if record is not None:
+            try:
+                plan=_decodePlan(record)
+            except (ValueError,TypeError,IndexError,re.error):
+                # a damaged file, so build it the normal way
+                plan=None
+        if plan is not None:
+            with self._lock:
+                self.restored+=1
+        else:
+            plan=build()
+        if self._maxSize>0:
+            with self._lock:
+                self._plans[key]=plan
+                self._plans.move_to_end(key)
+                self._evict()
+        return plan
+
+    def save(self,filename:str)->int:
+        """
+        Save the plans so another process can load() them
+
+        (along with any that were loaded and have not been used yet.
+        Plans with keys or steps that can not be stored are skipped.)
+
+        :return: how many plans were saved
+        """
+        with self._lock:
+            plans=dict(self._stored)
+            cached=list(self._plans.items())
+        for key,plan in cached:
+            storeKey=_storeKey(key)
+            record=_encodePlan(plan) if storeKey is not None else None
+            if record is not None:
+                plans[storeKey]=record
+        # write it all then swap it in, so nothing ever loads half a file
+        tempName='%s.%d.tmp'%(filename,os.getpid())
+        with open(tempName,'w',encoding='utf-8') as f:
+            json.dump({'format':_PLAN_FORMAT,'plans':plans},f,separators=(',',':'))
+        os.replace(tempName,filename)
+        return len(plans)
+
+    def load(self,filename:str)->int:
+        """
+        Load plans saved by save()
+
+        They are only made into steps when a query asks for them.
+
+        :return: how many plans were loaded
+        """
+        with open(filename,'r',encoding='utf-8') as f:
+            saved=json.load(f)
+        if not isinstance(saved,dict) or saved.get('format')!=_PLAN_FORMAT:
+            raise ValueError('"%s" is not a query plan file this version can load'%filename)
+        plans=saved.get('plans',{})
+        with self._lock:
+            self._stored.update(plans)
+        return len(plans)
+
+    def clear(self)->None:
+        """
+        throw away all cached (and loaded) plans
+        """
+        with self._lock:
+            self._plans.clear()
+            self._stored.clear()
+
+    def resetStats(self)->None:
+        """
+        set hits, misses, evictions, and restored back to zero
+        """
+        with self._lock:
+            self.hits=0
+            self.misses=0
+            self.evictions=0
+            self.restored=0
+
+    @property
+    def hitRate(self)->float:
+        """
+        fraction of lookups that were already cached
+        """
+        total=self.hits+self.misses
+        if not total:
+            return 0.0
+        return self.hits/total
+
+    def __len__(self)->int:
+        return len(self._plans)
+
+    def __repr__(self)->str:
+        return 'QueryPlanCache(size=%d/%d, hits=%d, misses=%d, evictions=%d, restored=%d)'%(
+            len(self._plans),self._maxSize,self.hits,self.misses,self.evictions,self.restored)
+
+
+# the cache that all queries share
+defaultPlanCache=QueryPlanCache()
@@ -0,0 +1,418 @@
+"""
+Evaluate a whole set of queries in a single traversal.
+
+Details:
+    all of the queries are merged into one state machine where
+    queries that start with the same steps share the same states
+    (a prefix trie of steps)
+    at each state, plain names are looked up in a dict, and all of
+    the regex steps are first checked with one combined alternation
+    so that a name that matches none of them only costs one regex
+    every result says which queries it matched
+
+    queries that cannot be done walking down the tree
+    (eg, ones with a .. step) are run on their own and merged in
+"""
+import typing
+import re
+import queryTools
+
+
+class _QuerySetState:
+    """
+    A single state in the combined state machine
+    """
+
+    __slots__=('index','loop','anyTargets','literals','foldedLiterals',
+        'regexes','epsilons','accepts','edges')
+
+    def __init__(self,index:int):
+        self.index=index
+        # moves to itself on any child (inside a **)
+        self.loop:bool=False
+        self.anyTargets:typing.List[int]=[]
+        self.literals:typing.Dict[str,typing.List[int]]={}
+        self.foldedLiterals:typing.Dict[str,typing.List[int]]={}
+        self.regexes:typing.List[typing.Tuple[typing.Pattern,int]]=[]
+        self.epsilons:typing.List[int]=[]
+        self.accepts:typing.List[typing.Hashable]=[]
+        # step key -> state, for sharing common prefixes
+        self.edges:typing.Dict[typing.Hashable,int]={}
+
+
+class _QuerySetTransitions:
+    """
+    Everything that can happen from a given set of active states,
+    merged together
+    """
+
+    __slots__=('anyMask','literals','foldedLiterals','regexes','matchers','prefilter')
+
+    def __init__(self):
+        self.anyMask:int=0
+        self.literals:typing.Dict[str,int]={}
+        self.foldedLiterals:typing.Dict[str,int]={}
+        self.regexes:typing.List[typing.Tuple[typing.Pattern,int]]=[]
+        # steps that are cheaper than the combined regex (eg, GlobSteps)
+        self.matchers:typing.List[typing.Tuple[typing.Callable[[str],typing.Any],int]]=[]
+        self.prefilter:typing.Optional[typing.Pattern]=None
+
+
+class QuerySet:
+    """
+    Evaluate a whole set of queries in a single traversal.
+
+    Usage:
+        qs=QuerySet([GlobQuery('/windows/*.exe'),GlobQuery('/**/*.tmp')])
+        for node,queryIds in qs.find(tree):
+            ...
+    Query ids are the position in the list, or the keys if given a dict.
+    """
+
+    def __init__(self,
+        queries:typing.Union[
+            None,
+            typing.Iterable["queryTools.Query"],
+            typing.Dict[typing.Hashable,"queryTools.Query"]
+        ]=None):
+        """ """
+        self._queries:typing.Dict[typing.Hashable,queryTools.Query]={}
+        self._states:typing.List[_QuerySetState]=[]
+        self._closures:typing.List[int]=[]
+        self._transitions:typing.Dict[int,_QuerySetTransitions]={}
+        self._acceptIds:typing.Dict[int,typing.List[typing.Hashable]]={}
+        # per state, the ids of all queries that can still be matched from it
+        self._reach:typing.List[typing.FrozenSet[typing.Hashable]]=[]
+        self._reachIds:typing.Dict[int,typing.FrozenSet[typing.Hashable]]={}
+        self._acceptMask:int=0
+        self._liveMask:int=0
+        self._separate:typing.Dict[typing.Hashable,queryTools.Query]={}
+        self._compiled=False
+        if queries is not None:
+            if hasattr(queries,'items'):
+                for queryId,query in queries.items(): # type: ignore
+                    self.add(query,queryId)
+            else:
+                for query in queries:
+                    self.add(query)
+
+    def add(self,
+        query:"queryTools.Query",
+        queryId:typing.Optional[typing.Hashable]=None
+        )->typing.Hashable:
+        """
+        add a query to the set
+
+        :queryId: what to call it in results (default=next number)
+        :return: the queryId
+        """
+        if queryId is None:
+            queryId=len(self._queries)
+        self._queries[queryId]=query
+        self._compiled=False
+        return queryId
+
+    @property
+    def queries(self)->typing.Dict[typing.Hashable,"queryTools.Query"]:
+        """
+        all queries by id
+        """
+        return self._queries
+
+    def __len__(self)->int:
+        return len(self._queries)
+
+    def _newState(self)->int:
+        state=_QuerySetState(len(self._states))
+        self._states.append(state)
+        return state.index
+
+    def _edge(self,fromIdx:int,key:typing.Hashable)->typing.Tuple[int,bool]:
+        """
+        get (or create) the state at the end of an edge
+
+        :return: (state index,whether it was created)
+        """
+        toIdx=self._states[fromIdx].edges.get(key)
+        if toIdx is not None:
+            return toIdx,False
+        toIdx=self._newState()
+        self._states[fromIdx].edges[key]=toIdx
+        return toIdx,True
+
+    def _compile(self)->None:
+        """
+        Merge all of the queries into one state machine
+        """
+        self._states=[]
+        self._transitions={}
+        self._acceptIds={}
+        self._reachIds={}
+        self._separate={}
+        self._newState()
+        for queryId,query in self._queries.items():
+            steps=getattr(query,'_querySteps',None)
+            # only queries that are really a list of steps can be merged
+            # (eg, GrepQuery has none, and SimpleQuery's are strings)
+            if not steps or not all(
+                isinstance(step,(int,typing.Pattern,queryTools.LiteralStep,
+                    queryTools.PrefilteredStep,queryTools.GlobStep))
+                for step in steps) \
+                or queryTools.Query.__PARENTDIR_STEP__ in steps:
+                self._separate[queryId]=query
+                continue
+            current=0
+            for step in steps:
+                if isinstance(step,int):
+                    if step==queryTools.Query.__SAMEDIR_STEP__:
+                        continue
+                    if step==queryTools.Query.__CHILDOF_STEP__:
+                        nextIdx,created=self._edge(current,('*',))
+                        if created:
+                            self._states[current].anyTargets.append(nextIdx)
+                    else: # __DESCENDENTOF_STEP__
+                        nextIdx,created=self._edge(current,('**',))
+                        if created:
+                            self._states[nextIdx].loop=True
+                            self._states[current].epsilons.append(nextIdx)
+                else:
+                    literal=queryTools.patternLiteral(step)
+                    if literal is not None:
+                        folded=bool(step.flags&re.IGNORECASE)
+                        if folded:
+                            literal=literal.lower()
+                        nextIdx,created=self._edge(current,('lit',literal,folded))
+                        if created:
+                            literals=self._states[current].literals
+                            if folded:
+                                literals=self._states[current].foldedLiterals
+                            literals.setdefault(literal,[]).append(nextIdx)
+                    else:
+                        nextIdx,created=self._edge(current,('re',step.pattern,step.flags))
+                        if created:
+                            self._states[current].regexes.append((step,nextIdx))
+                current=nextIdx
+            self._states[current].accepts.append(queryId)
+        # epsilon closures (edges only ever go to newer states)
+        self._closures=[0]*len(self._states)
+        self._reach=[frozenset()]*len(self._states)
+        self._acceptMask=0
+        self._liveMask=0
+        for state in reversed(self._states):
+            closure=1<<state.index
+            for eps in state.epsilons:
+                closure|=self._closures[eps]
+            self._closures[state.index]=closure
+            reach=set(state.accepts)
+            for target in state.edges.values():
+                reach.update(self._reach[target])
+            self._reach[state.index]=frozenset(reach)
+            if state.accepts:
+                self._acceptMask|=1<<state.index
+            if state.loop or state.anyTargets or state.literals \
+                or state.foldedLiterals or state.regexes:
+                self._liveMask|=1<<state.index
+        self._compiled=True
+
+    def _transitionsFor(self,mask:int)->_QuerySetTransitions:
+        """
+        merge all transitions for a set of active states
+        """
+        ret=self._transitions.get(mask)
+        if ret is not None:
+            return ret
+        ret=_QuerySetTransitions()
+        closures=self._closures
+        for state in self._states:
+            if not mask&(1<<state.index):
+                continue
+            if state.loop:
+                ret.anyMask|=closures[state.index]
+            for target in state.anyTargets:
+                ret.anyMask|=closures[target]
+            for literals,merged in ((state.literals,ret.literals),
+                (state.foldedLiterals,ret.foldedLiterals)):
+                for literal,targets in literals.items():
+                    for target in targets:
+                        merged[literal]=merged.get(literal,0)|closures[target]
+            for pattern,target in state.regexes:
+                if isinstance(pattern,queryTools.GlobStep):
+                    ret.matchers.append((pattern.fullmatch,closures[target]))
+                else:
+                    ret.regexes.append((pattern,closures[target]))
+        ret.prefilter=self._combine([pattern for pattern,_ in ret.regexes])
+        self._transitions[mask]=ret
+        return ret
+
+    @staticmethod
+    def _combine(patterns:typing.List[typing.Pattern])->typing.Optional[typing.Pattern]:
+        """
+        combine a lot of regexes into one alternation that fullmatches
+        if (and only if) any of them would
+
+        :return: the combined regex, or None if it isn't worth it
+            or cannot be done
+        """
+        if len(patterns)<2:
+            return None
+        alternatives=[]
+        for pattern in patterns:
+            source=pattern.pattern
+            if not isinstance(source,str) or re.search(r'\\[0-9]|\(\?P=|\(\?[aiLmsux]+\)',source):
+                # backreferences and global flags cannot be moved into a group
+                return None
+            flags='i' if pattern.flags&re.IGNORECASE else ''
+            if pattern.flags&re.DOTALL:
+                flags+='s'
+            alternatives.append('(?%s:%s)'%(flags,source) if flags else '(?:%s)'%source)
+        try:
+            return re.compile('|'.join(alternatives))
+        except re.error:
+            return None
+
+    def _advance(self,mask:int,name:str)->int:
+        """
+        Given the active states of a node, get the active states
+        of a child with the given name.
+        """
+        transitions=self._transitionsFor(mask)
+        ret=transitions.anyMask
+        if transitions.literals:
+            ret|=transitions.literals.get(name,0)
+        if transitions.foldedLiterals:
+            ret|=transitions.foldedLiterals.get(name.lower(),0)
+        if transitions.regexes:
+            if transitions.prefilter is None or transitions.prefilter.fullmatch(name):
+                for pattern,resultMask in transitions.regexes:
+                    if pattern.fullmatch(name):
+                        ret|=resultMask
+        for matcher,resultMask in transitions.matchers:
+            if matcher(name):
+                ret|=resultMask
+        return ret
+
+    def _idsFor(self,mask:int)->typing.List[typing.Hashable]:
+        """
+        get the ids of all queries accepted by a mask
+        """
+        mask&=self._acceptMask
+        ret=self._acceptIds.get(mask)
+        if ret is None:
+            ret=[]
+            for state in self._states:
+                if mask&(1<<state.index):
+                    ret.extend(state.accepts)
+            self._acceptIds[mask]=ret
+        return ret
+
+    def _reachableIds(self,mask:int)->typing.FrozenSet[typing.Hashable]:
+        """
+        get the ids of all queries that a node with these active states,
+        or anything under it, could still match
+        (not counting the ones that are run on their own)
+        """
+        ret=self._reachIds.get(mask)
+        if ret is None:
+            reach:typing.Set[typing.Hashable]=set()
+            for state in self._states:
+                if mask&(1<<state.index):
+                    reach.update(self._reach[state.index])
+            ret=frozenset(reach)
+            self._reachIds[mask]=ret
+        return ret
+
+    def find(self,
+        tree:queryTools.TreeLike,
+        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]=None
+        )->typing.Generator[typing.Tuple[queryTools.TreeLike,typing.List[typing.Hashable]],None,None]:
+        """
+        Finds items matching any of the queries using a breadth-first search
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        :return: generator of (node,[ids of all queries it matched])
+        """
+        for node,_,ids in self._find(tree,_tape):
+            yield node,ids
+
+    def _find(self,
+        tree:queryTools.TreeLike,
+        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]=None,
+        keep:typing.Optional[typing.Callable[[int],bool]]=None
+        )->typing.Generator[typing.Tuple[queryTools.TreeLike,int,typing.List[typing.Hashable]],None,None]:
+        """
+        Same as find(), but also gives the active states of each result
+        (0 for results only found by queries run on their own)
+
+        :keep: given the active states of a child, whether
+            it (and everything under it) is worth looking at
+        """
+        if not self._compiled:
+            self._compile()
+        if _tape is None:
+            _tape=queryTools.Tape(visitedMode=getattr(tree,'visitedMode',
+                queryTools.Tape.__VISITED_IDENTITY__))
+        visitKey=_tape.visitKey
+        # results of queries that have to be run on their own
+        separate:typing.Dict[typing.Hashable,typing.Tuple[queryTools.TreeLike,typing.List[typing.Hashable]]]={}
+        for queryId,query in self._separate.items():
+            for node in query.find(tree):
+                separate.setdefault(visitKey(node),(node,[]))[1].append(queryId)
+        pending:typing.Dict[typing.Hashable,int]={}
+        def push(node:queryTools.TreeLike,mask:int)->None:
+            key=visitKey(node)
+            if key in pending:
+                pending[key]|=mask
+            elif node not in _tape.visited:
+                pending[key]=mask
+                _tape.push(node)
+        push(tree,self._closures[0])
+        acceptMask=self._acceptMask
+        liveMask=self._liveMask
+        advance=self._advance
+        while not _tape.isDone:
+            node=_tape.pop()
+            mask=pending.pop(visitKey(node))
+            if mask&acceptMask:
+                ids=list(self._idsFor(mask))
+                if separate:
+                    other=separate.pop(visitKey(node),None)
+                    if other is not None:
+                        ids.extend(other[1])
+                yield node,mask,ids
+            if not mask&liveMask:
+                continue
+            for child in node.children:
+                childMask=advance(mask,child.name)
+                if childMask and (keep is None or keep(childMask)):
+                    push(child,childMask)
+        for node,ids in separate.values():
+            yield node,0,ids
+
+    def matches(self,
+        path:typing.Union[str,typing.List[str]]
+        )->typing.List[typing.Hashable]:
+        """
+        check a path against every query
+
+        :path: a path string or list of names (relative to the root)
+        :return: ids of all queries that match
+        """
+        if not self._compiled:
+            self._compile()
+        if isinstance(path,str):
+            names=[name for name in path.split('/') if name]
+        else:
+            names=list(path)
+        mask=self._closures[0]
+        for name in names:
+            if not mask&self._liveMask:
+                mask=0
+                break
+            mask=self._advance(mask,name)
+            if not mask:
+                break
+        ret=list(self._idsFor(mask)) if mask else []
+        for queryId,query in self._separate.items():
+            if query.matches(path):
+                ret.append(queryId)
+        return ret
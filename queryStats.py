@@ -0,0 +1,90 @@
+"""
+Counters for finding out why a query is slow
+
+Usage:
+    stats=QueryStats()
+    results=list(query.find(tree,stats=stats))
+    print(query.explain(stats))
+
+Details:
+    nothing is counted unless find() is given a QueryStats, and a find()
+        without one runs exactly the same code as it would otherwise
+    with one, find() takes a slower path that goes child by child
+        (no name lookups or batch checks) so that every step
+        can be counted and timed
+    per step:
+        visited - children the step was tried on
+        evaluations - times a regex (or other matcher) was run
+        matches - children the step let through
+        pruned - children that no step let through, so their
+            whole subtree was skipped
+        seconds - time spent running the step's matcher
+    a callback can also be given, which is called as
+        callback(stepIndex,child,matched)
+        every time a step is tried on a child
+"""
+import typing
+
+
+class StepStats:
+    """
+    Counters for a single query step
+    """
+
+    __slots__=('visited','evaluations','matches','pruned','seconds')
+
+    def __init__(self):
+        self.visited:int=0
+        self.evaluations:int=0
+        self.matches:int=0
+        self.pruned:int=0
+        self.seconds:float=0.0
+
+    def __repr__(self)->str:
+        return 'StepStats(visited=%d, evaluations=%d, matches=%d, pruned=%d, seconds=%.6f)'%(
+            self.visited,self.evaluations,self.matches,self.pruned,self.seconds)
+
+
+class QueryStats:
+    """
+    Counters for running a query, step by step
+
+    (can be passed to any number of find() calls and will
+    keep adding up until reset())
+    """
+
+    def __init__(self,
+        callback:typing.Optional[typing.Callable[[int,typing.Any,bool],None]]=None):
+        """
+        :callback: called as callback(stepIndex,child,matched) every
+            time a step is tried on a child
+        """
+        self.callback=callback
+        # by index into the query's steps
+        self.steps:typing.List[StepStats]=[]
+        # nodes whose children were looked at
+        self.expanded:int=0
+        self.results:int=0
+        # time spent looking at children (not counting the caller's time between results)
+        self.seconds:float=0.0
+
+    def step(self,index:int)->StepStats:
+        """
+        get the counters for a step (created if need be)
+        """
+        while len(self.steps)<=index:
+            self.steps.append(StepStats())
+        return self.steps[index]
+
+    def reset(self)->None:
+        """
+        set everything back to zero
+        """
+        self.steps=[]
+        self.expanded=0
+        self.results=0
+        self.seconds=0.0
+
+    def __repr__(self)->str:
+        return 'QueryStats(expanded=%d, results=%d, seconds=%.6f, steps=%r)'%(
+            self.expanded,self.results,self.seconds,self.steps)
@@ -58,109 +58,105 @@ class ReQuery(queryTools.Query):
         ignoreCase:bool=False)->None:
         """
         Parse the query string into a searchable expression
+
+        (the parsed result is shared with every other query
+        of the same type with the same settings)
+        """
+        self._plan=queryTools.defaultPlanCache.get(
+            (self.__class__,queryString,ignoreCase),
+            lambda: queryTools.QueryPlan(self._parse(queryString,ignoreCase)))
+        self._querySteps=self._plan.steps
+        self._queryString=queryString
+        self._ignoreCase=ignoreCase
+        self._automaton=None
+
+    def _parse(self,
+        queryString:str,
+        ignoreCase:bool=False
+        )->typing.List[typing.Union[typing.Pattern,int,"queryTools.LiteralStep","queryTools.PrefilteredStep","queryTools.GlobStep"]]:
+        """
+        Parse the query string into a list of steps
         """
         reFlags=0
         if ignoreCase:
             reFlags=re.IGNORECASE
-        self._querySteps=[]
-        currentStep:typing.List[str]=[]
-        for c in queryString:
-            if c=='/':
-                current=''.join(currentStep)
-                if not current or current=='.':
-                    # could just as easily not add it instead
-                    self._querySteps.append(self.__SAMEDIR_STEP__)
-                elif current=='..':
-                    self._querySteps.append(self.__PARENTDIR_STEP__)
-                elif current=='*':
-                    self._querySteps.append(self.__CHILDOF_STEP__)
-                elif current=='**':
-                    self._querySteps.append(self.__DESCENDENTOF_STEP__)
-                else:
-                    self._querySteps.append(re.compile(current,reFlags))
-                currentStep=[]
-            else:
-                currentStep.append(c)
-        if currentStep:
-            current=''.join(currentStep)
+        steps:typing.List[typing.Union[typing.Pattern,int,queryTools.LiteralStep,queryTools.PrefilteredStep,queryTools.GlobStep]]=[]
+        for current in queryString.split('/'):
             if not current or current=='.':
                 # could just as easily not add it instead
-                self._querySteps.append(self.__SAMEDIR_STEP__)
+                steps.append(self.__SAMEDIR_STEP__)
             elif current=='..':
-                self._querySteps.append(self.__PARENTDIR_STEP__)
+                steps.append(self.__PARENTDIR_STEP__)
             elif current=='*':
-                self._querySteps.append(self.__CHILDOF_STEP__)
+                steps.append(self.__CHILDOF_STEP__)
             elif current=='**':
-                self._querySteps.append(self.__DESCENDENTOF_STEP__)
+                steps.append(self.__DESCENDENTOF_STEP__)
             else:
-                self._querySteps.append(re.compile(current,reFlags))
-        self._queryString=queryString
+                step=self._compileStep(current,reFlags)
+                if not isinstance(step,typing.Pattern):
+                    # already something better than a regex (eg, a GlobStep)
+                    steps.append(step)
+                    continue
+                literal=queryTools.patternLiteral(step)
+                if literal is not None:
+                    # a plain name can be looked up rather than matched
+                    steps.append(queryTools.LiteralStep(literal,ignoreCase))
+                else:
+                    # rule out names without the required text before running the regex
+                    steps.append(queryTools.prefilterPattern(step))
+        return steps
 
-    def _iterChildren(self,
-        tree:queryTools.TreeLike,
-        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]
-        )->typing.Generator[queryTools.TreeLike,None,None]:
+    def _compileStep(self,step:str,reFlags:int)->typing.Pattern:
         """
-        Iterates over all children items
+        Compile a single path step into a regular expression
 
-        :tree: starting location of the tree.
+        mostly a separate function to make it easy to override
+        for derived classes
         """
-        for c in tree.children:
-            if c not in _tape.visited:
-                yield c
+        if step.startswith('*'):
+            # leading * is a path operator, not a regex
+            step='.'+step
+        return re.compile(step,reFlags)
 
-    def _iterDescendents(self,
-        tree:queryTools.TreeLike,
-        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]
-        )->typing.Generator[queryTools.TreeLike,None,None]:
+    def matches(self,
+        path:typing.Union[str,typing.List[str],"queryTools.TreeLike"]
+        )->bool:
         """
-        Iterates over items in the tree using a breadth-first search
+        check to see if a path matches this query
 
-        :tree: starting location of the tree.
+        :path: a path string, a list of names, or a tree node
+            (all relative to the root, empty names are skipped,
+            the same as matchesMany())
         """
-        _tape.push(tree)
-        while not _tape.isDone:
-            tree=_tape.pop()
-            if tree not in _tape.visited:
-                yield tree
-                for c in tree.children:
-                    _tape.push(c)
+        if isinstance(path,str):
+            names=[name for name in path.split('/') if name]
+        elif isinstance(path,(list,tuple)):
+            names=[name for name in path if name]
+        else:
+            names=[]
+            item:typing.Optional["queryTools.TreeLike"]=path
+            while item is not None and item.parent is not None:
+                names.append(item.name)
+                item=item.parent
+            names.reverse()
+        return self.automaton.matches(names)
 
-    def matches(self, # pylint: disable=arguments-differ
-        path:typing.Union[str,typing.List[str],queryTools.TreeLike],
-        _startingAt:int=0
-        )->bool:
+    def matchesMany(self,
+        paths:typing.Iterable[typing.Union[str,typing.List[str]]],
+        onlyMatches:bool=False
+        )->typing.Generator[typing.Any,None,None]:
         """
-        check to see if a path matches this query
+        check a lot of paths without creating any tree nodes
+
+        Work is shared between paths in the same directory
+        and names that have already been checked.
+
+        :paths: path strings (or lists of names) relative to the root
+        :onlyMatches: yield only the paths that match instead of a bool for each
         """
-        if isinstance(path,str):
-            path=path.split('/')
-        if isinstance(path,(list,tuple,dict)):
-            path=queryTools.primativeAsTree(path)
-        path=typing.cast(queryTools.TreeLike,path)
-        _tape=queryTools.Tape()
-        pathIdx=0
-        for step in enumerate(self._querySteps):
-            c=path[pathIdx]
-            if isinstance(step,int):
-                if step==self.__SAMEDIR_STEP__:
-                    pathIdx-=1
-                elif step==self.__PARENTDIR_STEP__:
-                    pathIdx-=2
-                elif step==self.__CHILDOF_STEP__:
-                    pass # always true
-                elif step==self.__DESCENDENTOF_STEP__:
-                    for desc in self._iterDescendents(path,_tape):
-                        if self.matches(desc,_startingAt+1):
-                            return True
-                    return False
-            elif not self._matchesStep(c,_startingAt):
-                return False
-            pathIdx+=1
-            _startingAt+=1
-        return True
-
-    def _matchesStep(self,item:queryTools.TreeLike,stepIdx:int)->bool:
+        return self.automaton.matchesMany(paths,onlyMatches)
+
+    def _matchesStep(self,item:"queryTools.TreeLike",stepIdx:int)->bool:
         """
         check to see if the item matches the given step
 
@@ -170,38 +166,54 @@ class ReQuery(queryTools.Query):
         step=self._querySteps[stepIdx]
         if isinstance(step,int):
             raise Exception('Tape has been scrambled')
-        return step.match(item.name) is not None
+        return step.fullmatch(item.name) is not None
 
     def find(self,
-        tree:queryTools.TreeLike,
-        _tape:typing.Optional[queryTools.Tape[queryTools.TreeLike]]=None
-        )->typing.Generator[queryTools.TreeLike,None,None]:
+        tree:"queryTools.TreeLike",
+        _tape:typing.Optional["queryTools.Tape[queryTools.TreeLike]"]=None,
+        workers:typing.Optional[int]=None,
+        executor:"queryTools.ExecutorLike"='thread',
+        ordered:bool=False,
+        stats:typing.Optional["queryTools.QueryStats"]=None,
+        cache:typing.Optional["queryTools.FindCache"]=None,
+        limit:typing.Optional[int]=None
+        )->typing.Generator["queryTools.TreeLike",None,None]:
         """
         Finds items in the tree using a breadth-first search
 
+        Subtrees that can never match are not searched.
+
         :tree: starting location of the tree.  Usually you'd pass root.
+        :workers: if more than 1, search with this many threads/processes
+        :executor: "thread", "process", or a concurrent.futures.Executor
+        :ordered: when using workers, still return results in breadth-first order
+        :stats: count what every step does (slower, see QueryStats)
+        :cache: reuse the results from last time if the tree has not
+            changed (see FindCache)
+        :limit: stop searching after this many results
+        """
+        return self.automaton.find(tree,_tape,workers,executor,ordered,stats,cache,limit)
+
+    def first(self,tree:"queryTools.TreeLike")->typing.Optional["queryTools.TreeLike"]:
+        """
+        Get the first item find() would return, searching no further
+
+        :return: the item, or None if nothing matches
+        """
+        return self.automaton.first(tree)
+
+    def exists(self,tree:"queryTools.TreeLike")->bool:
+        """
+        Check whether anything matches, searching no further
+        than the first match
+        """
+        return self.automaton.exists(tree)
+
+    def count(self,tree:"queryTools.TreeLike")->int:
+        """
+        Count how many items find() would return
+
+        Uses the tree's own way of counting if it has one (eg, ColumnarTree
+        or PathIndex), and does not create matching leaves if it can avoid it.
         """
-        if _tape is None:
-            _tape=typing.cast(queryTools.Tape[queryTools.TreeLike],queryTools.Tape())
-        if self._querySteps:
-            if tree not in _tape.visited:
-                yield tree
-            return
-        _tape.visited.add(tree)
-        while not _tape.isDone:
-            c=_tape.pop()
-            if c in _tape.visited:
-                continue
-            _tape.push(c)
-            for stepIdx,step in enumerate(self._querySteps):
-                if isinstance(step,int):
-                    if step==self.__SAMEDIR_STEP__:
-                        continue
-                    elif step==self.__PARENTDIR_STEP__:
-                        pass
-                    elif step==self.__CHILDOF_STEP__:
-                        pass
-                    elif step==self.__DESCENDENTOF_STEP__:
-                        pass
-                elif self._matchesStep(c,stepIdx):
-                    _tape.push(c)
+        return self.automaton.count(tree)
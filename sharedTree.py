@@ -0,0 +1,364 @@
+"""
+Share a large in-memory tree with a pool of worker processes,
+so that queries on it can use more than one core.
+
+Usage:
+    with SharedTree(root,workers=4) as shared:
+        for item in GlobQuery('/**/*.exe').find(shared):
+            print(item.path)
+
+Details:
+    the tree is copied once into shared memory in the ColumnarTree
+        format (the node arrays and the table of names), and the
+        workers use it straight out of the shared memory, without
+        copying or unpickling anything
+    a query is sent to the workers as its compiled steps, and each
+        worker runs it on some of the top-level subtrees (these are
+        handed out so every worker gets about the same number of nodes)
+    workers only send back node numbers, which are turned back into
+        the original nodes here, so the results are the same objects
+        (in the same breadth-first order) that find() on the tree gives
+    every worker has nodes at every depth, so breadth-first order means
+        waiting for all of them to finish.  With ordered=False the tree is
+        split into smaller pieces, and the results of each piece come
+        back as soon as it is done instead.
+    queries with .. in them can see outside of their subtree, so they
+        are run on the tree the normal way
+    the tree must not change while it is shared.  If it keeps a
+        generation (see FindCache) and that has changed, queries are
+        run on the tree the normal way until export() is called again.
+    other processes can also use the shared memory directly with
+        SharedTree.attach(shared.name)
+"""
+import typing
+import os
+import heapq
+import concurrent.futures
+from array import array
+from multiprocessing import shared_memory
+import queryTools
+try:
+    import numpy
+except ImportError:
+    numpy=None # type: ignore
+
+
+# attached trees and compiled automatons, per worker process
+# (only the last few trees are kept attached, so that a pool that outlives
+# its SharedTrees does not keep all of their memory)
+_MAX_WORKER_TREES=4
+_workerTrees:typing.Dict[str,"queryTools.ColumnarTree"]={}
+_workerAutomatons:typing.Dict[typing.Tuple[typing.Any,...],"queryTools.QueryAutomaton"]={}
+
+
+def _openSharedMemory(name:str)->shared_memory.SharedMemory:
+    """
+    attach to existing shared memory without taking ownership of it
+    """
+    try:
+        # python>=3.13, otherwise the resource tracker counts it as ours
+        return shared_memory.SharedMemory(name=name,track=False) # type: ignore
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+def _partitionTask(
+    name:str,
+    steps:typing.Tuple[typing.Any,...],
+    starts:typing.List[int],
+    masks:typing.List[int],
+    countOnly:bool
+    )->typing.Union[array,int]:
+    """
+    search some top-level subtrees (run in a worker process)
+
+    :starts: the top-level nodes, in order
+    :masks: the active states at each of them
+    :return: the sorted numbers of the matching nodes, or just how many
+    """
+    tree=_workerTrees.get(name)
+    if tree is None:
+        while len(_workerTrees)>=_MAX_WORKER_TREES:
+            _workerTrees.pop(next(iter(_workerTrees))).close()
+        tree=SharedTree.attach(name)
+        _workerTrees[name]=tree
+    automaton=_workerAutomatons.get(steps)
+    if automaton is None:
+        automaton=queryTools.QueryAutomaton(steps)
+        _workerAutomatons[steps]=automaton
+    segment=automaton.segments[0]
+    if tree._canFind(automaton):
+        levels=tree._walkLevels(segment,
+            numpy.array(starts,dtype=numpy.int64),
+            numpy.array(masks,dtype=numpy.int64),{})
+        if countOnly:
+            return sum(len(found) for found in levels)
+        ret=array('q')
+        for found in levels:
+            ret.frombytes(found.astype(numpy.int64).tobytes())
+        return ret
+    found=[]
+    for start,mask in zip(starts,masks):
+        tape=queryTools.Tape(visitedMode=queryTools.Tape.__VISITED_NONE__)
+        for node in segment.walk([tree.node(start)],tape,mask):
+            found.append(node.index) # type: ignore
+    if countOnly:
+        return len(found)
+    found.sort()
+    return array('q',found)
+
+
+class SharedTree:
+    """
+    A tree copied into shared memory and searched by a pool of processes
+
+    (See module docstring for details)
+    """
+
+    def __init__(self,
+        tree:queryTools.TreeLike,
+        workers:typing.Optional[int]=None,
+        executor:typing.Optional[concurrent.futures.Executor]=None,
+        ordered:bool=True):
+        """
+        :tree: the root of the tree to share (it must not have any loops)
+        :workers: how many processes (default=one per core)
+        :executor: an existing pool to use instead
+            (which will not be shut down by close())
+        :ordered: give results in breadth-first order (which means
+            waiting for all of the workers), rather than as they come in
+        """
+        self.tree=tree
+        self.workers=workers or os.cpu_count() or 1
+        self.ordered=ordered
+        self._executor=executor
+        self._ownExecutor=False
+        self._shm:typing.Optional[shared_memory.SharedMemory]=None
+        self._nodes:typing.List[queryTools.TreeLike]=[]
+        # (top-level node number,size of its subtree)
+        self._topLevel:typing.List[typing.Tuple[int,int]]=[]
+        self._generation:typing.Optional[int]=None
+        self.export()
+
+    @property
+    def root(self)->queryTools.TreeLike:
+        """
+        the root of the tree being shared
+        """
+        return self.tree
+
+    @property
+    def name(self)->str:
+        """
+        the name of the shared memory (see attach())
+        """
+        if self._shm is None:
+            raise ValueError('the SharedTree has been closed')
+        return self._shm.name
+
+    def __len__(self)->int:
+        return len(self._nodes)
+
+    def export(self)->None:
+        """
+        Copy the tree into shared memory (again, if it has changed)
+        """
+        self._release()
+        nodes:typing.List[queryTools.TreeLike]=[self.tree]
+        def treeChildren(item:typing.Any)->typing.Iterable[typing.Tuple[str,typing.Any]]:
+            for child in item.children:
+                # children are numbered in the order they are given
+                nodes.append(child)
+                yield child.name,child
+        columnar=queryTools.ColumnarTree._build(self.tree.name,self.tree,treeChildren)
+        pieces=columnar.serialize()
+        size=sum(len(data) for data in pieces)
+        shm=shared_memory.SharedMemory(create=True,size=size)
+        offset=0
+        for data in pieces:
+            shm.buf[offset:offset+len(data)]=data
+            offset+=len(data)
+        # add up the size of each subtree, from the bottom up
+        parents=columnar.parents
+        sizes=[1]*len(parents)
+        for idx in range(len(parents)-1,0,-1):
+            sizes[parents[idx]]+=sizes[idx]
+        self._topLevel=[(idx,sizes[idx])
+            for idx in range(columnar.childOffsets[0],columnar.childOffsets[1])]
+        self._shm=shm
+        self._nodes=nodes
+        self._generation=getattr(self.tree,'generation',None)
+
+    @staticmethod
+    def attach(name:str)->"queryTools.ColumnarTree":
+        """
+        Use a SharedTree from another process, without copying it
+
+        Since only the paths are shared, the results of queries
+        on it are ColumnarNodes.  close() it when done.
+        """
+        shm=_openSharedMemory(name)
+        try:
+            return queryTools.ColumnarTree.fromBuffer(shm.buf,shm)
+        except Exception:
+            shm.close()
+            raise
+
+    def _pool(self)->concurrent.futures.Executor:
+        """
+        get the pool of workers, starting it if need be
+        """
+        if self._executor is None:
+            self._executor=concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+            self._ownExecutor=True
+        return self._executor
+
+    def _isCurrent(self)->bool:
+        """
+        whether the tree is the same as when it was exported
+        """
+        return self._shm is not None and \
+            getattr(self.tree,'generation',None)==self._generation
+
+    def _partitions(self,
+        segment:"queryTools.QuerySegment"
+        )->typing.List[typing.Tuple[typing.List[int],typing.List[int]]]:
+        """
+        split up the top-level subtrees that can still match,
+        so each worker gets about the same number of nodes
+
+        :return: [([node numbers],[masks])] with the numbers in order
+        """
+        mask=segment.startMask
+        if not mask&segment.liveMask:
+            return []
+        live=[]
+        for idx,size in self._topLevel:
+            childMask=segment.advance(mask,self._nodes[idx].name)
+            if childMask:
+                live.append((size,idx,childMask))
+        if not live:
+            return []
+        numPartitions=self.workers
+        if not self.ordered:
+            # smaller pieces, so the first results come back sooner
+            numPartitions*=4
+        numPartitions=min(len(live),numPartitions)
+        # biggest first, each to whichever has the fewest nodes so far
+        bins:typing.List[typing.Tuple[int,int]]=[(0,i) for i in range(numPartitions)]
+        contents:typing.List[typing.List[typing.Tuple[int,int]]]=[[] for _ in range(numPartitions)]
+        live.sort(key=lambda item:-item[0])
+        for size,idx,childMask in live:
+            total,i=heapq.heappop(bins)
+            contents[i].append((idx,childMask))
+            heapq.heappush(bins,(total+size,i))
+        ret=[]
+        for content in contents:
+            content.sort()
+            ret.append(([idx for idx,_ in content],[childMask for _,childMask in content]))
+        return ret
+
+    def _submit(self,
+        automaton:"queryTools.QueryAutomaton",
+        countOnly:bool
+        )->typing.Optional[typing.List[concurrent.futures.Future]]:
+        """
+        hand the query out to the workers
+
+        :return: the futures, or None if it cannot be done this way
+        """
+        if len(automaton.segments)!=1 or not self._isCurrent():
+            return None
+        pool=self._pool()
+        name=self.name
+        return [pool.submit(_partitionTask,name,automaton.steps,starts,masks,countOnly)
+            for starts,masks in self._partitions(automaton.segments[0])]
+
+    def findWithAutomaton(self,
+        automaton:"queryTools.QueryAutomaton"
+        )->typing.Optional[typing.Iterable[queryTools.TreeLike]]:
+        """
+        Run a compiled query on the workers
+
+        :return: the results, or None if it cannot be done this way
+            (the query has .. in it, or the tree has changed)
+        """
+        futures=self._submit(automaton,False)
+        if futures is None:
+            return None
+        return self._results(automaton,futures)
+
+    def _results(self,
+        automaton:"queryTools.QueryAutomaton",
+        futures:typing.List[concurrent.futures.Future]
+        )->typing.Generator[queryTools.TreeLike,None,None]:
+        """
+        put the results from the workers back into breadth-first order
+        (or when not ordered, give them as each worker finishes)
+        """
+        try:
+            segment=automaton.segments[0]
+            if segment.startMask&segment.acceptMask:
+                yield self.tree
+            nodes=self._nodes
+            if not self.ordered:
+                for future in concurrent.futures.as_completed(futures):
+                    for number in future.result():
+                        yield nodes[number]
+                return
+            # nodes are numbered breadth-first, so that is just sorted order
+            # (and every worker has to be done to know what comes first)
+            for number in heapq.merge(*(future.result() for future in futures)):
+                yield nodes[number]
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def countWithAutomaton(self,automaton:"queryTools.QueryAutomaton")->typing.Optional[int]:
+        """
+        Count the results of a compiled query on the workers
+
+        :return: the count, or None if it cannot be done this way
+        """
+        futures=self._submit(automaton,True)
+        if futures is None:
+            return None
+        segment=automaton.segments[0]
+        ret=1 if segment.startMask&segment.acceptMask else 0
+        return ret+sum(future.result() for future in futures)
+
+    def _release(self)->None:
+        """
+        free the shared memory
+        """
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm=None
+        self._nodes=[]
+        self._topLevel=[]
+
+    def close(self)->None:
+        """
+        Stop the workers (if they are ours) and free the shared memory
+        """
+        if self._ownExecutor and self._executor is not None:
+            self._executor.shutdown()
+            self._executor=None
+            self._ownExecutor=False
+        self._release()
+
+    def __enter__(self)->"SharedTree":
+        return self
+
+    def __exit__(self,*args:typing.Any)->None:
+        self.close()
+
+    def __del__(self)->None:
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def __repr__(self)->str:
+        return 'SharedTree(%r, %d nodes)'%(self.tree,len(self))
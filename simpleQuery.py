@@ -1,10 +1,52 @@
 """
 A simple query that uses paths and * character.  That's it.
+
+Since every step is either a whole name or *, a query can be run
+against a backend (eg, a database) that only knows how to list a path
+and check that paths exist (see SimpleQueryBackend), and it is run a
+level at a time:
+    a * step (or any step if ignoring case) lists every path
+        at the current level in one go
+    a plain name step is just added on to each path, without asking
+        the backend, and whatever is left unchecked at the end
+        is checked in one go
+    so a query costs one round-trip per level rather than per path
+    nothing is listed twice in the same query
 """
 import typing
 import queryTools
 
 
+class SimpleQueryBackend(typing.Protocol):
+    """
+    What SimpleQuery.paths() needs from a backend
+
+    Paths are names joined with "/", starting with the root
+    (whose name is ""), for example "/users/bob".
+
+    A backend can also provide
+        dir_many(paths)->[[child paths] for each path]
+        exists_many(paths)->[exists for each path]
+    to do a whole level in a single call.
+    """
+
+    def dir(self,path:str)->typing.Iterable[str]:
+        """
+        get the paths of the children of a path
+        (nothing if it does not exist)
+        """
+        ...
+
+    def exists(self,path:str)->bool:
+        """
+        check whether a path exists
+        """
+        ...
+
+
+Handle=typing.TypeVar('Handle')
+
+
 class SimpleQuery(queryTools.Query):
     """
     A simple query that uses paths and * character.  That's it.
@@ -25,31 +67,99 @@ class SimpleQuery(queryTools.Query):
         """
         Parse the query string into a searchable expression
         """
+        self._queryString=queryString
         self._ignoreCase=ignoreCase
         if ignoreCase:
             queryString=queryString.lower()
         self._querySteps=queryString.split('/')
 
-    def paths(self,db)->typing.List[str]:
+    @property
+    def automaton(self)->"queryTools.QueryAutomaton":
         """
-        get all paths that match this query
+        the steps after the root compiled into a state machine
+        (for afind(), since find() does not need one)
         """
-        ret=[]
-        def _paths(steps:typing.List[str],path:str='')->None:
-            if '*' not in steps:
-                # no wildcards so we could have only the one
-                if db.exists(self._queryString):
-                    ret.append(self._queryString)
-            else:
-                for i,step in enumerate(steps):
-                    if step.find('*')>=0:
-                        for subpath in db.dir(path):
-                            _paths(steps[i:],subpath)
-                        break
+        if self._automaton is None:
+            self._automaton=queryTools.QueryAutomaton([
+                self.__CHILDOF_STEP__ if step=='*' else queryTools.LiteralStep(step,self._ignoreCase)
+                for step in self._querySteps[1:]])
+        return self._automaton
+
+    def _expand(self,
+        starts:typing.List[Handle],
+        listMany:typing.Callable[[typing.List[Handle]],typing.List[typing.Iterable[Handle]]],
+        nameOf:typing.Callable[[Handle],str],
+        join:typing.Optional[typing.Callable[[Handle,str],Handle]]=None,
+        existsMany:typing.Optional[typing.Callable[[typing.List[Handle]],typing.Iterable[bool]]]=None
+        )->typing.List[Handle]:
+        """
+        Run the steps after the first one, a level at a time
+
+        :starts: what matched the first step
+        :listMany: get the children of everything in a level at once
+        :nameOf: get the name of a child
+        :join: make a child from a name without listing (if possible)
+        :existsMany: check that joined children exist (needed with join)
+        """
+        level=starts
+        unchecked=False
+        for step in self._querySteps[1:]:
+            if not level:
+                break
+            if step!='*' and not self._ignoreCase and join is not None:
+                level=[join(item,step) for item in level]
+                unchecked=True
+                continue
+            nextLevel=[]
+            for children in listMany(level):
+                for child in children:
+                    if step=='*':
+                        nextLevel.append(child)
                     else:
-                        path='%s/%s'%(path,step)
-        _paths(self._queryString)
-        return ret
+                        name=nameOf(child)
+                        if self._ignoreCase:
+                            name=name.lower()
+                        if name==step:
+                            nextLevel.append(child)
+            level=nextLevel
+            unchecked=False
+        if unchecked and level and existsMany is not None:
+            level=[item for item,exists in zip(level,existsMany(level)) if exists]
+        return level
+
+    def paths(self,db:SimpleQueryBackend)->typing.List[str]:
+        """
+        get all paths that match this query
+
+        :db: the backend to ask (see SimpleQueryBackend)
+        """
+        first=self._querySteps[0]
+        if first=='*':
+            first=''
+        # listings already done in this query
+        listings:typing.Dict[str,typing.List[str]]={}
+        def listMany(paths:typing.List[str])->typing.List[typing.Iterable[str]]:
+            todo=[path for path in paths if path not in listings]
+            if todo:
+                dirMany=getattr(db,'dir_many',None)
+                if dirMany is not None:
+                    found=dirMany(todo)
+                else:
+                    found=[db.dir(path) for path in todo]
+                for path,children in zip(todo,found):
+                    listings[path]=[child if '/' in child else '%s/%s'%(path,child)
+                        for child in children]
+            return [listings[path] for path in paths]
+        def existsMany(paths:typing.List[str])->typing.Iterable[bool]:
+            existsMany=getattr(db,'exists_many',None)
+            if existsMany is not None:
+                return existsMany(paths)
+            return [db.exists(path) for path in paths]
+        def nameOf(path:str)->str:
+            return path.rpartition('/')[2]
+        def join(path:str,name:str)->str:
+            return '%s/%s'%(path,name)
+        return self._expand([first],listMany,nameOf,join,existsMany)
 
     def matches(self,
         path:typing.Union[str,typing.List[str]]
@@ -78,6 +188,35 @@ class SimpleQuery(queryTools.Query):
         """
         Finds items in the tree using a breadth-first search
 
+        (every step is at a single depth, so this is done a level at a time
+        and there is no need for a tape)
+
+        :tree: starting location of the tree.  Usually you'd pass root.
+        """
+        first=self._querySteps[0]
+        rootName=tree.name.lower() if self._ignoreCase else tree.name
+        if first not in ('*',rootName):
+            return
+        def listMany(nodes:typing.List[queryTools.TreeLike])->typing.List[typing.Iterable[queryTools.TreeLike]]:
+            return [node.children for node in nodes]
+        def nameOf(node:queryTools.TreeLike)->str:
+            return node.name
+        yield from self._expand([tree],listMany,nameOf)
+
+    async def afind(self,
+        tree:typing.Union[queryTools.TreeLike,queryTools.AsyncTreeLike],
+        concurrency:int=16,
+        maxBuffered:int=64
+        )->typing.AsyncGenerator[typing.Any,None]:
+        """
+        Finds items in a tree whose children have to be awaited
+        (see Query.afind)
+
         :tree: starting location of the tree.  Usually you'd pass root.
         """
-        return # TODO: need to implement find
+        first=self._querySteps[0]
+        rootName=tree.name.lower() if self._ignoreCase else tree.name
+        if first not in ('*',rootName):
+            return
+        async for node in queryTools.afindWithAutomaton(self.automaton,tree,concurrency,maxBuffered):
+            yield node
@@ -11,9 +11,124 @@ It has two purposes:
     if item not in tape:
 """
 import typing
+from collections import deque
 
 
 TapeT=typing.TypeVar('TapeT')
+
+
+class IdentitySet(typing.Generic[TapeT]):
+    """
+    A set that goes by id() rather than __hash__/__eq__
+
+    (this is a lot cheaper for things like Tree where the
+    hash has to compute the whole path)
+
+    NOTE: it holds on to the items so that an id() cannot
+    be reused by a new object while it is in the set
+    """
+    def __init__(self,items:typing.Iterable[TapeT]=()):
+        self._items:typing.Dict[int,TapeT]={id(item):item for item in items}
+
+    def __contains__(self,item:typing.Any)->bool:
+        return id(item) in self._items
+
+    def add(self,item:TapeT)->None:
+        """
+        add an item to the set
+        """
+        self._items[id(item)]=item
+
+    def copy(self)->"IdentitySet[TapeT]":
+        """
+        copy the set
+        """
+        ret:IdentitySet[TapeT]=IdentitySet()
+        ret._items=self._items.copy()
+        return ret
+
+    def __iter__(self)->typing.Iterator[TapeT]:
+        return iter(self._items.values())
+
+    def __len__(self)->int:
+        return len(self._items)
+
+
+class BitmapSet(typing.Generic[TapeT]):
+    """
+    A set of items that all have a small, unique, non-negative int id
+    (for instance, the node index of an array-based tree)
+
+    Only one bit is kept per possible id.
+    """
+    def __init__(self,nodeId:typing.Callable[[TapeT],int]):
+        self._nodeId=nodeId
+        self._bits=bytearray()
+        self._count=0
+
+    def __contains__(self,item:typing.Any)->bool:
+        idx=self._nodeId(item)
+        byte=idx>>3
+        return byte<len(self._bits) and (self._bits[byte]>>(idx&7))&1==1
+
+    def add(self,item:TapeT)->None:
+        """
+        add an item to the set
+        """
+        idx=self._nodeId(item)
+        byte=idx>>3
+        if byte>=len(self._bits):
+            self._bits.extend(bytes(max(byte+1,len(self._bits)*2)-len(self._bits)))
+        bit=1<<(idx&7)
+        if not self._bits[byte]&bit:
+            self._bits[byte]|=bit
+            self._count+=1
+
+    def copy(self)->"BitmapSet[TapeT]":
+        """
+        copy the set
+        """
+        ret:BitmapSet[TapeT]=BitmapSet(self._nodeId)
+        ret._bits=bytearray(self._bits)
+        ret._count=self._count
+        return ret
+
+    def __len__(self)->int:
+        return self._count
+
+
+class NullSet(typing.Generic[TapeT]):
+    """
+    A set that never remembers anything
+
+    (for turning off visited tracking when the tree
+    is known not to have any loops)
+    """
+    def __contains__(self,item:typing.Any)->bool:
+        return False
+
+    def add(self,item:TapeT)->None:
+        """
+        does nothing
+        """
+
+    def copy(self)->"NullSet[TapeT]":
+        """
+        copy the set
+        """
+        return self
+
+    def __len__(self)->int:
+        return 0
+
+
+def _itself(item:TapeT)->TapeT:
+    """
+    the item is its own key (for going by __hash__/__eq__)
+    """
+    return item
+
+
 class Tape(typing.Generic[TapeT]):
     """
     A parsing tape used for tree traversal.
@@ -29,14 +144,101 @@ class Tape(typing.Generic[TapeT]):
 
     (NOTE: they work together so
         calling pop() automatically adds to visited
-        you cannot push() something that is already in visited)
+        you cannot push() something that is already in visited,
+        unless it is on purpose with pushAgain())
+
+    Traversal order:
+        __BREADTH_FIRST__ - first in, first out
+        __DEPTH_FIRST__ - last in, first out
+        __ITERATIVE_DEEPENING__ - depth first, but only depthStep
+            levels at a time.  Anything deeper waits until the
+            shallower levels are all done.
+    The depth of an item is worked out by assuming everything
+    pushed after a pop() is a child of the popped item.
+    Anything deeper than maxDepth is never pushed.
+
+    Visited tracking:
+        __VISITED_IDENTITY__ - by id() (the default)
+        __VISITED_HASH__ - by __hash__/__eq__
+        __VISITED_BITMAP__ - one bit per nodeId(item)
+        __VISITED_NONE__ - nothing, only for trees with no loops
     """
-    def __init__(self,initial:typing.Optional["Tape[TapeT]"]=None):
-        self.visited:typing.Set[TapeT]=set()
-        self._list:typing.List[TapeT]=[]
+
+    __BREADTH_FIRST__=0
+    __DEPTH_FIRST__=1
+    __ITERATIVE_DEEPENING__=2
+
+    __VISITED_IDENTITY__=0
+    __VISITED_HASH__=1
+    __VISITED_BITMAP__=2
+    __VISITED_NONE__=3
+
+    def __init__(self,
+        initial:typing.Optional["Tape[TapeT]"]=None,
+        order:int=__BREADTH_FIRST__,
+        visitedMode:int=__VISITED_IDENTITY__,
+        nodeId:typing.Optional[typing.Callable[[TapeT],int]]=None,
+        maxDepth:typing.Optional[int]=None,
+        depthStep:int=1):
+        """
+        :initial: copy settings and visited items from another tape
+        :order: the traversal order
+        :visitedMode: how to keep track of visited items
+        :nodeId: get a small int id for an item (required for __VISITED_BITMAP__)
+        :maxDepth: do not go any deeper than this
+        :depthStep: for __ITERATIVE_DEEPENING__, how many levels at a time
+        """
+        if initial is not None:
+            order=initial.order
+            visitedMode=initial.visitedMode
+            nodeId=initial._nodeId
+            maxDepth=initial.maxDepth
+            depthStep=initial.depthStep
+        self.order=order
+        self.visitedMode=visitedMode
+        self.maxDepth=maxDepth
+        self.depthStep=max(1,depthStep)
+        self._nodeId=nodeId
+        self.visited:typing.Any
         if initial is not None:
             self.visited=initial.visited.copy()
-            self._list=[]
+        elif visitedMode==self.__VISITED_IDENTITY__:
+            self.visited=IdentitySet()
+        elif visitedMode==self.__VISITED_HASH__:
+            self.visited=set()
+        elif visitedMode==self.__VISITED_BITMAP__:
+            if nodeId is None:
+                raise ValueError('__VISITED_BITMAP__ requires a nodeId function')
+            self.visited=BitmapSet(nodeId)
+        elif visitedMode==self.__VISITED_NONE__:
+            self.visited=NullSet()
+        else:
+            raise ValueError('Unknown visited mode %d'%visitedMode)
+        # tells items apart the same way visited does
+        self.visitKey:typing.Callable[[TapeT],typing.Hashable]
+        if visitedMode==self.__VISITED_HASH__:
+            self.visitKey=_itself
+        elif visitedMode==self.__VISITED_BITMAP__:
+            self.visitKey=nodeId # type: ignore
+        else:
+            self.visitKey=id
+        # only keep track of depths when something needs them
+        self._trackDepth=order==self.__ITERATIVE_DEEPENING__ or maxDepth is not None
+        self._list:typing.Deque[typing.Any]=deque()
+        self._deferred:typing.Deque[typing.Any]=deque()
+        self._depthLimit=self.depthStep-1
+        self._pushDepth=0
+        if order==self.__BREADTH_FIRST__:
+            self._popNext=self._list.popleft
+        elif order in (self.__DEPTH_FIRST__,self.__ITERATIVE_DEEPENING__):
+            self._popNext=self._list.pop
+        else:
+            raise ValueError('Unknown traversal order %d'%order)
+        if visitedMode==self.__VISITED_NONE__ and not self._trackDepth:
+            # nothing to keep track of, so go straight to the deque
+            self.push=self._list.append # type: ignore
+            self.pushAgain=self._list.append # type: ignore
+            self.pop=self._popNext # type: ignore
 
     def copy(self)->"Tape":
         """
@@ -44,24 +246,77 @@ class Tape(typing.Generic[TapeT]):
         """
         return Tape(self)
 
+    def empty(self)->"Tape":
+        """
+        create a new, empty tape with the same settings
+        """
+        return Tape(order=self.order,visitedMode=self.visitedMode,
+            nodeId=self._nodeId,maxDepth=self.maxDepth,depthStep=self.depthStep)
+
     def push(self,item:TapeT)->None:
         """
         add a new item to the end of the tape
         """
-        if item not in self.visited:
+        if item in self.visited:
+            return
+        if not self._trackDepth:
+            self._list.append(item)
+            return
+        self._pushDeep(item)
+
+    def pushAgain(self,item:TapeT)->None:
+        """
+        add an item to the end of the tape even if it has been visited
+        (eg, to search under it again for something else)
+        """
+        if not self._trackDepth:
             self._list.append(item)
+            return
+        self._pushDeep(item)
+
+    def _pushDeep(self,item:TapeT)->None:
+        """
+        add an item, keeping track of its depth
+        """
+        depth=self._pushDepth
+        if self.maxDepth is not None and depth>self.maxDepth:
+            return
+        if self.order==self.__ITERATIVE_DEEPENING__ and depth>self._depthLimit:
+            self._deferred.append((depth,item))
+        else:
+            self._list.append((depth,item))
 
     def pop(self)->TapeT:
         """
         pop the next item from the tape
         """
-        ret=self._list.pop(0)
+        if not self._trackDepth:
+            ret=self._popNext()
+        else:
+            if not self._list and self.order==self.__ITERATIVE_DEEPENING__:
+                # go the next band of depths
+                self._list,self._deferred=self._deferred,self._list
+                self._popNext=self._list.pop
+                self._depthLimit+=self.depthStep
+            depth,ret=self._popNext()
+            self._pushDepth=depth+1
         self.visited.add(ret)
         return ret
 
+    @property
+    def depth(self)->int:
+        """
+        depth of the last item that was popped
+        (only kept track of for __ITERATIVE_DEEPENING__ or when there is a maxDepth)
+        """
+        return self._pushDepth-1
+
     @property
     def isDone(self):
         """
         is the tape done?
         """
-        return len(self._list)==0
+        return not self._list and not self._deferred
+
+    def __len__(self)->int:
+        return len(self._list)+len(self._deferred)
@@ -0,0 +1,100 @@
+"""
+tests for finding things in trees whose children have to be awaited
+"""
+import asyncio
+from queryTools import *
+
+myTree=primativeAsTree({
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None,'b.tmp':None}}
+    })
+
+queries=('/windows/*/*.exe','/**/calc.exe','/**','/users/bob/../bob/b.tmp','/nothing/**')
+
+async def _collect(query,tree,**kwargs):
+    return [item.path async for item in query.afind(tree,**kwargs)]
+
+def test_same_as_find():
+    """
+    test that afind() finds the same things as find()
+    """
+    for queryString in queries:
+        query=GlobQuery(queryString)
+        expected=[node.path for node in query.find(myTree)]
+        found=asyncio.run(_collect(query,LatencyTree(myTree,0.001)))
+        assert sorted(found)==sorted(expected),queryString
+        # one at a time is breadth-first
+        found=asyncio.run(_collect(query,LatencyTree(myTree,0.001),concurrency=1))
+        assert found==expected,queryString
+        # plain trees work too
+        found=asyncio.run(_collect(query,myTree))
+        assert sorted(found)==sorted(expected),queryString
+
+def test_backpressure():
+    """
+    test that the search waits for a slow consumer
+    """
+    fetched=[]
+    class CountingTree(LatencyTree):
+        __slots__=()
+        async def children(self):
+            fetched.append(self.path)
+            return await LatencyTree.children(self)
+    async def firstOnly():
+        results=GlobQuery('/**').afind(CountingTree(myTree,0),concurrency=1,maxBuffered=1)
+        first=await results.__anext__()
+        for _ in range(5):
+            await asyncio.sleep(0)
+        await results.aclose()
+        return first
+    assert asyncio.run(firstOnly()).path=='/'
+    assert len(fetched)<5
+
+def test_errors():
+    """
+    test that an error getting children gets to the caller
+    """
+    class BrokenTree(LatencyTree):
+        __slots__=()
+        async def children(self):
+            raise IOError('service unavailable')
+    try:
+        asyncio.run(_collect(GlobQuery('/**'),BrokenTree(myTree,0)))
+    except IOError:
+        pass
+    else:
+        assert False,'expected an IOError'
+
+def test_parent_step_different_depths():
+    """
+    test that .. finds everything when the parents are at different depths
+    """
+    tree=primativeAsTree({'p':{'k':None,'z':{'q':{'k':None,'r':None}}}})
+    for queryString in ('/**/../z','/**/k/../z/q/r','/**/k/../**'):
+        query=GlobQuery(queryString)
+        expected=sorted(node.path for node in query.find(tree))
+        assert expected,queryString
+        found=asyncio.run(_collect(query,LatencyTree(tree,0)))
+        assert sorted(found)==expected,queryString
+        found=asyncio.run(_collect(query,tree,concurrency=1))
+        assert sorted(found)==expected,queryString
+
+def test_every_query_class():
+    """
+    test afind() finds the same things as find() for every kind of query
+    """
+    from queryTools.simpleQuery import SimpleQuery
+    queries=[GlobQuery('/windows/*/calc.exe'),ReQuery('/**/.*[.]tmp'),
+        SimpleQuery('/windows/*/calc.exe'),SimpleQuery('/USERS/*/calc.exe',ignoreCase=True),
+        SimpleQuery('nothing/*'),GrepQuery('calc'),GrepQuery('^users/'),
+        GlobQuery('/**/*.exe')-ReQuery('/windows/temp/.*'),
+        GlobQuery('/users/**/../**')&GlobQuery('/**/*.tmp')|SimpleQuery('/windows/*')]
+    for query in queries:
+        expected=sorted(node.path for node in query.find(myTree))
+        found=asyncio.run(_collect(query,LatencyTree(myTree,0)))
+        assert sorted(found)==expected,query
+        found=asyncio.run(_collect(query,myTree))
+        assert sorted(found)==expected,query
@@ -0,0 +1,29 @@
+"""
+tests for the benchmark suite (run very small, to check the answers)
+"""
+from queryTools.benchmarks import suite
+
+
+def test_all_correct(tmp_path):
+    """
+    test that every benchmark gets the right answer
+    """
+    results=suite.runBenchmarks(suite.allBenchmarks(0.02,str(tmp_path)),repeat=1,measureMemory=False)
+    wrong=[name for name,result in results.items() if not result['ok']]
+    assert not wrong
+
+def test_compare():
+    """
+    test finding regressions against a baseline
+    """
+    baseline={'results':{
+        'a':{'seconds':1.0,'peakBytes':1000000,'ok':True},
+        'b':{'seconds':1.0,'peakBytes':1000000,'ok':True},
+        'c':{'seconds':0.00001,'peakBytes':None,'ok':True}}}
+    current={
+        'a':{'seconds':1.1,'peakBytes':1000000,'ok':True},
+        'b':{'seconds':2.0,'peakBytes':3000000,'ok':False},
+        'c':{'seconds':0.00003,'peakBytes':None,'ok':True}}
+    problems=suite.compareResults(baseline,current,0.25)
+    assert not [problem for problem in problems if problem.startswith('a:') or problem.startswith('c:')]
+    assert len([problem for problem in problems if problem.startswith('b:')])==3
@@ -0,0 +1,103 @@
+"""
+tests for the array-based tree
+"""
+from queryTools import *
+import queryTools.columnarTree
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None},'size':5}
+    }
+queries=['/windows/*/*.exe','/**/calc.exe','/**','/windows/system32/../temp/*','/users/**/5','/nothing/*']
+
+def _compare():
+    """
+    compare the columnar results against a normal tree
+    """
+    tree=primativeAsTree(prim)
+    for columnar in (ColumnarTree.fromPrimative(prim),ColumnarTree.fromTree(tree)):
+        for queryString in queries:
+            q=GlobQuery(queryString)
+            expected=[item.path for item in q.find(tree)]
+            assert [item.path for item in q.find(columnar)]==expected,queryString
+            assert [item.path for item in q.find(columnar.root)]==expected,queryString
+
+def test_layout():
+    """
+    test the arrays are laid out breadth-first with unique names
+    """
+    columnar=ColumnarTree.fromPrimative(prim)
+    assert len(columnar)==14
+    assert columnar.names.count('calc.exe')==1
+    assert list(columnar.levelOffsets)==[0,1,3,7,14]
+    assert [c.name for c in columnar.root.children]==['windows','users']
+
+def test_find():
+    """
+    test queries give the same answer as a normal tree
+    """
+    _compare()
+
+def test_find_without_numpy():
+    """
+    test the node-by-node fallback
+    """
+    numpy=queryTools.columnarTree.numpy
+    queryTools.columnarTree.numpy=None
+    try:
+        _compare()
+    finally:
+        queryTools.columnarTree.numpy=numpy
+
+def test_parent_step_different_depths():
+    """
+    test that .. finds everything once when the parents are at different depths
+    """
+    prim={'p':{'k':None,'z':{'q':{'k':None,'r':None}}}}
+    tree=primativeAsTree(prim)
+    columnar=ColumnarTree.fromPrimative(prim)
+    for queryString in ('/**/k/../**','/**/../z','/**/k/../z/q/r'):
+        q=GlobQuery(queryString)
+        expected=[item.path for item in q.find(tree)]
+        assert sorted(item.path for item in q.find(columnar))==sorted(expected),queryString
+        assert q.count(columnar)==len(expected),queryString
+
+def test_random_queries():
+    """
+    test random queries (with .. all over) give the same answer as a normal tree
+    """
+    import random
+    rand=random.Random(0)
+    def randomTree(depth):
+        if depth>=5 or rand.random()<0.25:
+            return None
+        return {rand.choice('kqz'):randomTree(depth+1) for _ in range(rand.randrange(1,4))}
+    for _ in range(300):
+        prim=randomTree(0) or {'a':None}
+        tree=primativeAsTree(prim)
+        columnar=ColumnarTree.fromPrimative(prim)
+        q=GlobQuery('/**/'+'/'.join(rand.choice(['k','q','z','*','**','..'])
+            for _ in range(rand.randrange(2,6))))
+        expected=sorted(item.path for item in q.find(tree))
+        assert sorted(item.path for item in q.find(columnar))==expected,q.queryString
+
+def test_random_queries_without_numpy():
+    """
+    test the node-by-node fallback finds each node once after ..
+    (nodes are made again each time, so they have to be told apart by value)
+    """
+    numpy=queryTools.columnarTree.numpy
+    queryTools.columnarTree.numpy=None
+    try:
+        prim={'k':{'a':None},'kk':None}
+        columnar=ColumnarTree.fromPrimative(prim)
+        q=GlobQuery('/k*/..')
+        assert [item.path for item in q.find(columnar)]==['/']
+        assert q.count(columnar)==1
+        test_parent_step_different_depths()
+        test_random_queries()
+    finally:
+        queryTools.columnarTree.numpy=numpy
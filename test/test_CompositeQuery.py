@@ -0,0 +1,123 @@
+"""
+tests for combining queries with | & and -
+"""
+from queryTools import *
+
+myTree=primativeAsTree({
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None,'b.tmp':None}}
+    })
+
+exe=GlobQuery('/**/*.exe')
+calc=GlobQuery('/**/calc.exe')
+windows=GlobQuery('/windows/**')
+tmp=ReQuery('/**/.*[.]tmp')
+parent=GlobQuery('/users/bob/../bob/*')
+
+def _expected(expression):
+    """
+    work out the answer with python sets, in breadth-first order
+    """
+    everything=list(GlobQuery('/**').find(myTree))
+    found=expression(lambda q:set(id(node) for node in q.find(myTree)))
+    return [node for node in everything if id(node) in found]
+
+def test_operators():
+    """
+    test each operator gives the same as doing it with sets
+    """
+    cases=[
+        (exe|tmp,lambda f:f(exe)|f(tmp)),
+        (exe&windows,lambda f:f(exe)&f(windows)),
+        (exe-windows,lambda f:f(exe)-f(windows)),
+        ((exe-calc)|(tmp&windows),lambda f:(f(exe)-f(calc))|(f(tmp)&f(windows))),
+        (exe&parent,lambda f:f(exe)&f(parent)),
+        (calc-parent,lambda f:f(calc)-f(parent)),
+        ]
+    for q,expression in cases:
+        assert isinstance(q,CompositeQuery)
+        expected=_expected(expression)
+        found=list(q.find(myTree))
+        assert [node.path for node in found]==[node.path for node in expected],q
+        assert q.count(myTree)==len(expected),q
+        for node in GlobQuery('/**').find(myTree):
+            assert q.matches(node.path[1:])==(node in expected),(q,node.path)
+
+def test_shared_prefix():
+    """
+    test queries with the same start share states
+    """
+    a=GlobQuery('/windows/system32/*.exe')
+    b=GlobQuery('/windows/system32/calc*')
+    q=a&b
+    assert 'sharing 5 states' in q.explain()
+    assert [node.path for node in q.find(myTree)]==['//windows/system32/calc.exe']
+
+class Listed:
+    """
+    a node that remembers when its children are listed
+    """
+    listed=[]
+
+    def __init__(self,name,prim,parent=None):
+        self.name=name
+        self.prim=prim
+        self.parent=parent
+
+    @property
+    def children(self):
+        self.listed.append(self.name)
+        for name,prim in (self.prim or {}).items():
+            yield Listed(name,prim,self)
+
+def test_skips_subtrees():
+    """
+    test & skips subtrees where either side has stopped matching
+    """
+    root=Listed('',{'windows':{'temp':{'a.tmp':None}},'users':{'bob':{'b.tmp':None}}})
+    q=GlobQuery('/users/**/*.tmp')&GlobQuery('/**/bob/*')
+    assert [node.name for node in q.find(root)]==['b.tmp']
+    assert 'windows' not in Listed.listed
+    del Listed.listed[:]
+    q=GlobQuery('/**/*.tmp')-GlobQuery('/users/**')
+    assert [node.name for node in q.find(root)]==['a.tmp']
+    assert 'windows' in Listed.listed
+
+def test_mixed_query_classes():
+    """
+    test combining queries that are not run the same way (eg, grep and simple ones)
+    """
+    import asyncio
+    from queryTools.simpleQuery import SimpleQuery
+    everything=GlobQuery('/**')
+    calcGrep=GrepQuery('calc')
+    system32=SimpleQuery('/windows/system32/*')
+    cases=[
+        (everything-calcGrep,lambda f:f(everything)-f(calcGrep)),
+        (exe&calcGrep,lambda f:f(exe)&f(calcGrep)),
+        (calcGrep|system32,lambda f:f(calcGrep)|f(system32)),
+        ((system32-calcGrep)|(tmp&GrepQuery('users/')),
+            lambda f:(f(system32)-f(calcGrep))|(f(tmp)&f(GrepQuery('users/')))),
+        (parent-calcGrep,lambda f:f(parent)-f(calcGrep)),
+        ]
+    async def collect(q):
+        return [node.path async for node in q.afind(myTree)]
+    for q,expression in cases:
+        expected=_expected(expression)
+        # results of queries run on their own come after the rest
+        assert sorted(node.path for node in q.find(myTree))==sorted(node.path for node in expected),q
+        assert q.count(myTree)==len(expected),q
+        assert sorted(asyncio.run(collect(q)))==sorted(node.path for node in expected),q
+        for node in GlobQuery('/**').find(myTree):
+            assert q.matches(node.path[1:])==(node in expected),(q,node.path)
+        assert 'on its own GrepQuery' in q.explain() or 'on its own SimpleQuery' in q.explain()
+        assert q.prefilterStats.checked>=0
+    try:
+        (everything-calcGrep).automaton
+    except TypeError:
+        pass
+    else:
+        assert False,'a CompositeQuery has no single automaton'
@@ -0,0 +1,73 @@
+"""
+tests for the find() result cache
+"""
+from queryTools import *
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None},
+        'temp':{'a.tmp':None}
+        },
+    'users':{'bob':{'calc.exe':None}}
+    }
+
+def test_generations():
+    """
+    test changes bump the generation of every ancestor, and only them
+    """
+    for treeType in (Tree,CompactTree):
+        tree=primativeAsTree(prim,treeType=treeType)
+        windows,users=tree.children
+        system32=windows.children[0]
+        before=(tree.generation,windows.generation,system32.generation,users.generation)
+        system32.children.append(treeType(name='cmd.exe',parent=system32))
+        after=(tree.generation,windows.generation,system32.generation,users.generation)
+        assert [a>b for a,b in zip(after,before)]==[True,True,True,False],treeType
+        system32.children[0].name='calc2.exe'
+        assert system32.generation>after[2]
+        moved=users.children[0]
+        generation=tree.generation
+        moved.parent=windows
+        windows.children.append(moved)
+        assert tree.generation>generation
+
+def test_cache():
+    """
+    test results are reused until the tree changes
+    """
+    tree=primativeAsTree(prim)
+    cache=FindCache()
+    q=GlobQuery('/**/calc.exe')
+    first=list(q.find(tree,cache=cache))
+    assert len(first)==2
+    assert list(q.find(tree,cache=cache))==first
+    assert cache.hits==1 and cache.misses==1
+    users=tree.children[1]
+    bob=users.children[0]
+    bob.children.append(Tree(name='calc.exe',parent=bob))
+    assert len(list(q.find(tree,cache=cache)))==3
+    assert cache.stale==1
+    # a change elsewhere does not affect a search of windows
+    windows=tree.children[0]
+    assert len(list(q.find(windows,cache=cache)))==1
+    bob.children.pop()
+    assert len(list(q.find(windows,cache=cache)))==1
+    assert cache.hits==2
+    assert len(list(q.find(tree,cache=cache)))==2
+    assert cache.hitRate==2/6
+
+def test_eviction():
+    """
+    test the cache stays within its limits
+    """
+    tree=primativeAsTree(prim)
+    cache=FindCache(maxEntries=2)
+    for queryString in ('/**/calc.exe','/*','/**','/windows/*'):
+        list(GlobQuery(queryString).find(tree,cache=cache))
+    assert len(cache)==2
+    assert cache.evictions==2
+    cache=FindCache(maxResults=5)
+    list(GlobQuery('/**').find(tree,cache=cache))
+    assert len(cache)==0
+    assert [item.path for item in GlobQuery('/*').find(tree,cache=cache)]==['//windows','//users']
+    assert len(cache)==1
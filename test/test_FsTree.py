@@ -0,0 +1,43 @@
+"""
+tests for the filesystem tree
+"""
+import os
+import glob
+from queryTools import *
+
+
+def _makeTree(root):
+    """
+    make a small directory tree
+    """
+    for path in ('windows/system32/calc.exe','windows/system32/notepad.exe',
+        'windows/temp/a.tmp','windows/temp/sub/b.exe','users/bob/calc.exe'):
+        path=os.path.join(str(root),*path.split('/'))
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'w'):
+            pass
+
+def test_same_as_glob(tmp_path):
+    """
+    test that queries find the same things as glob.glob
+    """
+    _makeTree(tmp_path)
+    root=str(tmp_path)
+    for pattern in ('windows/*/*.exe','**/calc.exe','windows/**','users/bob','windows/temp/sub/*'):
+        expected=sorted(glob.glob(os.path.join(root,pattern),recursive=True))
+        found=sorted(item.path for item in GlobQuery('/'+pattern).find(FsTree(root)))
+        if pattern.endswith('**'):
+            # glob.glob includes the directory itself with a trailing separator
+            expected=sorted(path.rstrip(os.sep) for path in expected)
+        assert found==expected,pattern
+
+def test_only_lists_what_it_needs(tmp_path):
+    """
+    test that directories that cannot match are never listed
+    """
+    _makeTree(tmp_path)
+    tree=FsTree(str(tmp_path))
+    results=list(GlobQuery('/windows/*/*.exe').find(tree))
+    assert len(results)==2
+    users=[child for child in tree.children if child.name=='users'][0]
+    assert users._entries is None
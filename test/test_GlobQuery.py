@@ -0,0 +1,65 @@
+"""
+tests for the glob query
+"""
+import re
+import fnmatch
+import pickle
+from queryTools import *
+
+myTree=primativeAsTree({
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None}
+        },
+    'users':{'bob':{'calc.exe':None}}
+    })
+
+def test_star_step():
+    """
+    test that * matches any child and *.exe is a glob
+    """
+    q=GlobQuery('/windows/*/*.exe')
+    results=sorted(item.name for item in q.find(myTree))
+    assert results==['calc.exe','notepad.exe']
+
+def test_glob_is_full_match():
+    """
+    test that glob steps must match the entire name
+    """
+    q=GlobQuery('/**/calc')
+    assert not list(q.find(myTree))
+    q=GlobQuery('/**/calc.ex?')
+    assert len(list(q.find(myTree)))==2
+
+def test_ignore_case():
+    """
+    test case insensitive queries
+    """
+    q=GlobQuery('/WINDOWS/System32/CALC.*',ignoreCase=True)
+    assert [item.name for item in q.find(myTree)]==['calc.exe']
+    assert q.matches('/windows/system32/calc.exe')
+
+def test_glob_steps():
+    """
+    test the string method matchers agree with the regex and fnmatch
+    """
+    names=['calc.exe','CALC.EXE','calc','a.tmp','tmpfile','mytmp.TMP','file1.txt',
+        'file12.txt','File1.TXT','.exe','x','','ſcalc.exe','İtmp','calc.exe.bak']
+    kinds={'calc*':'prefix','*.exe':'suffix','*tmp*':'contains','c*.exe':'prefix+suffix',
+        'file?.txt':'single ?','?':'single ?','c**e':'prefix+suffix'}
+    for glob in list(kinds)+['a*b*c','f?le*','calc.exe']:
+        for ignoreCase in (False,True):
+            step=compileGlobStep(glob,ignoreCase)
+            if glob in kinds:
+                assert isinstance(step,GlobStep) and step.kind==kinds[glob],glob
+                assert pickle.loads(pickle.dumps(step))==step
+            else:
+                assert not isinstance(step,GlobStep),glob
+            regex=re.compile(fnmatch.translate(glob),re.IGNORECASE if ignoreCase else 0)
+            for name in names:
+                expected=regex.match(name) is not None
+                assert (step.fullmatch(name) is not None)==expected,(glob,ignoreCase,name)
+            if isinstance(step,GlobStep):
+                expectedIndices=[i for i,name in enumerate(names) if regex.match(name)]
+                assert step.filterIndices(names)==expectedIndices,glob
+
@@ -0,0 +1,98 @@
+"""
+tests for searching file contents with a grep query
+"""
+import os
+import re
+from queryTools import *
+
+
+def _makeFiles(root):
+    """
+    make some files to search
+    """
+    files={
+        'a.txt':'hello world\nnothing here\nhello again\n',
+        'sub/b.txt':''.join('line %d %s\n'%(i,'hello' if i%7==0 else 'bye') for i in range(200)),
+        'sub/c.dat':'hello\n',
+        'empty.txt':'',
+        }
+    for name,content in files.items():
+        path=os.path.join(str(root),*name.split('/'))
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'w',newline='\n') as f:
+            f.write(content)
+    return files
+
+def _expected(files,regex,suffix=''):
+    """
+    what grep would find, line by line
+    """
+    ret=[]
+    for name,content in files.items():
+        if not name.endswith(suffix):
+            continue
+        offset=0
+        for lineNo,line in enumerate(content.splitlines(True),1):
+            for match in re.finditer(regex,line):
+                ret.append((name,lineNo,(offset+match.start(),offset+match.end())))
+            offset+=len(line)
+    return sorted(ret)
+
+def _found(root,hits):
+    return sorted((os.path.relpath(node.path,str(root)).replace(os.sep,'/'),lineNo,span)
+        for node,lineNo,span in hits)
+
+def test_search(tmp_path):
+    """
+    test finding matches with line numbers and byte offsets
+    """
+    files=_makeFiles(tmp_path)
+    q=GrepQuery('hello')
+    assert _found(tmp_path,q.search(FsTree(str(tmp_path)),workers=1))==_expected(files,'hello')
+    assert _found(tmp_path,q.search(FsTree(str(tmp_path)),'/**/*.txt',workers=1)) \
+        ==_expected(files,'hello','.txt')
+
+def test_line_anchors(tmp_path):
+    """
+    test that ^ and $ match at each line, like grep
+    """
+    files=_makeFiles(tmp_path)
+    q=GrepQuery('^line [0-9]*0 bye$')
+    assert _found(tmp_path,q.search(FsTree(str(tmp_path)),workers=1)) \
+        ==_expected(files,'^line [0-9]*0 bye$')
+
+def test_chunks_and_processes(tmp_path):
+    """
+    test that splitting files into chunks, and spreading them
+    across processes, finds the same things
+    """
+    files=_makeFiles(tmp_path)
+    q=GrepQuery('hello')
+    expected=_expected(files,'hello')
+    for workers in (1,2):
+        found=_found(tmp_path,q.search(FsTree(str(tmp_path)),workers=workers,chunkSize=64,overlap=16))
+        assert found==expected,workers
+
+def test_find():
+    """
+    test finding the items whose path (below the start) has a match
+    """
+    tree=primativeAsTree({'a':{'foo.txt':None,'b':{'c':None}},'x':{'y':None},'foo':None})
+    q=GrepQuery('foo')
+    assert [node.path for node in q.find(tree)]==['//foo','//a/foo.txt']
+    assert q.count(tree)==2
+    assert q.exists(tree)
+    assert q.first(tree).path=='//foo'
+    assert [node.path for node in GrepQuery('^a/b').find(tree)]==['//a/b','//a/b/c']
+    assert [node.path for node in GrepQuery('b$').find(PrimativeView({'a':{'b':None}}))]==['//a/b']
+    assert not GrepQuery('nothing').exists(tree)
+    assert GrepQuery('nothing').count(tree)==0
+    assert 'searches the path of every item' in q.explain()
+    for path in ('a/foo.txt','/a/foo.txt',['a','foo.txt']):
+        assert q.matches(path)
+    try:
+        q.automaton
+    except TypeError:
+        pass
+    else:
+        assert False,'a GrepQuery has no automaton'
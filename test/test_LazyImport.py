@@ -0,0 +1,45 @@
+"""
+tests for only importing modules when they are used
+"""
+import os
+import sys
+import ast
+import subprocess
+import queryTools
+
+def test_names():
+    """
+    test that every module's public names can be got from the package
+    """
+    packageDir=os.path.dirname(queryTools.__file__)
+    for module,names in queryTools._MODULE_NAMES.items():
+        with open(os.path.join(packageDir,module+'.py'),encoding='utf-8') as f:
+            tree=ast.parse(f.read())
+        defined=[]
+        for node in tree.body:
+            if isinstance(node,(ast.FunctionDef,ast.AsyncFunctionDef,ast.ClassDef)):
+                defined.append(node.name)
+            elif isinstance(node,ast.Assign):
+                defined.extend(target.id for target in node.targets if isinstance(target,ast.Name))
+            elif isinstance(node,ast.AnnAssign) and isinstance(node.target,ast.Name):
+                defined.append(node.target.id)
+        assert [name for name in defined if not name.startswith('_')]==list(names),module
+        for name in names:
+            assert getattr(queryTools,name) is getattr(getattr(queryTools,module),name)
+    assert 'GlobQuery' in dir(queryTools)
+
+def test_query_does_not_import_everything():
+    """
+    test that using a query does not import the modules for other things
+    """
+    code='\n'.join([
+        'import sys',
+        'import queryTools',
+        'assert queryTools.GlobQuery("/windows/*.exe").matches("windows/calc.exe")',
+        'print(" ".join(sorted(sys.modules)))'])
+    env=dict(os.environ,PYTHONPATH=os.path.dirname(os.path.dirname(queryTools.__file__)))
+    modules=subprocess.run([sys.executable,'-c',code],env=env,check=True,
+        stdout=subprocess.PIPE).stdout.decode('utf-8').split()
+    for module in ('numpy','asyncio','multiprocessing','concurrent.futures','dataclasses',
+        'queryTools.columnarTree','queryTools.sharedTree','queryTools.treeInterface'):
+        assert module not in modules
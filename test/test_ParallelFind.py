@@ -0,0 +1,123 @@
+"""
+tests for searching with a pool of threads or processes
+"""
+import os
+from queryTools import *
+
+myTree=primativeAsTree({
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'calc.exe':None,'sub':{'b.exe':None}}
+        },
+    'users':{'bob':{'calc.exe':None,'b.tmp':None}}
+    })
+
+queries=('/windows/*/*.exe','/**/calc.exe','/**','/users/bob/../bob/b.tmp','/nothing/**')
+
+def test_threads():
+    """
+    test that threads find the same things as find()
+    """
+    for queryString in queries:
+        query=GlobQuery(queryString)
+        expected=[node.path for node in query.find(myTree)]
+        found=[node.path for node in query.find(myTree,workers=3)]
+        assert sorted(found)==sorted(expected),queryString
+        found=[node.path for node in query.find(myTree,workers=3,ordered=True)]
+        assert found==expected,queryString
+
+def test_processes():
+    """
+    test that processes find the same things as find()
+    """
+    for queryString in queries:
+        query=GlobQuery(queryString)
+        expected=[node.path for node in query.find(myTree)]
+        found=[node.path for node in query.find(myTree,workers=2,executor='process')]
+        assert sorted(found)==sorted(expected),queryString
+        found=[node.path for node in query.find(myTree,workers=2,executor='process',ordered=True)]
+        assert found==expected,queryString
+
+def test_fsTree_processes(tmp_path):
+    """
+    test sending filesystem nodes to other processes
+    """
+    for path in ('a/x.exe','a/b/y.exe','c/z.exe','c/d/e/w.exe'):
+        path=os.path.join(str(tmp_path),*path.split('/'))
+        os.makedirs(os.path.dirname(path),exist_ok=True)
+        with open(path,'w'):
+            pass
+    query=GlobQuery('/**/*.exe')
+    expected=sorted(item.path for item in query.find(FsTree(str(tmp_path))))
+    found=sorted(item.path for item in query.find(FsTree(str(tmp_path)),workers=2,executor='process'))
+    assert found==expected
+    assert len(found)==4
+
+def test_stop_early():
+    """
+    test that stopping early does not wait for everything else
+    """
+    found=GlobQuery('/**').find(myTree,workers=2)
+    assert next(found).path=='/'
+    found.close()
+
+def test_parent_step_different_depths():
+    """
+    test that .. finds everything when the parents it goes back to
+    are at different depths
+    """
+    tree=primativeAsTree({'p':{'k':None,'z':{'q':{'k':None,'r':None}}}})
+    for queryString,expected in (('/**/../z',['//p/z']),('/**/k/../z/q/r',['//p/z/q/r'])):
+        query=GlobQuery(queryString)
+        assert [node.path for node in query.find(tree,workers=2)]==expected
+        assert [node.path for node in query.find(tree,workers=2,ordered=True)]==expected
+        assert [node.path for node in query.find(tree,workers=2,executor='process')]==expected
+
+def test_random_queries():
+    """
+    test random queries (with .. all over) give the same as find()
+    """
+    import random
+    import concurrent.futures
+    rand=random.Random(0)
+    def randomTree(depth):
+        if depth>=5 or rand.random()<0.25:
+            return None
+        return {rand.choice('kqz'):randomTree(depth+1) for _ in range(rand.randrange(1,4))}
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        for _ in range(500):
+            tree=primativeAsTree(randomTree(0) or {'k':None})
+            query=GlobQuery('/**/'+'/'.join(rand.choice(['k','q','z','*','**','..'])
+                for _ in range(rand.randrange(2,6))))
+            expected=sorted(node.path for node in query.find(tree))
+            found=[node.path for node in query.find(tree,workers=2,executor=pool)]
+            assert sorted(found)==expected,query.queryString
+
+def test_processes_bounded():
+    """
+    test that processes are only given so many subtrees at a time
+    """
+    import concurrent.futures
+    class CountingPool(concurrent.futures.ProcessPoolExecutor):
+        """
+        remembers the most tasks it has had at once
+        """
+        def __init__(self,*args,**kwargs):
+            concurrent.futures.ProcessPoolExecutor.__init__(self,*args,**kwargs)
+            self.live=[]
+            self.mostLive=0
+        def submit(self,*args,**kwargs):
+            self.live=[future for future in self.live if not future.done()]
+            future=concurrent.futures.ProcessPoolExecutor.submit(self,*args,**kwargs)
+            self.live.append(future)
+            self.mostLive=max(self.mostLive,len(self.live))
+            return future
+    wide=primativeAsTree({'d%d'%i:{'f%d.exe'%j:None for j in range(3)} for i in range(100)})
+    query=GlobQuery('/*/*.exe')
+    expected=[node.path for node in query.find(wide)]
+    with CountingPool(max_workers=2) as pool:
+        found=[node.path for node in findParallel(query.automaton,wide,2,pool,maxPending=4)]
+        assert sorted(found)==sorted(expected)
+        found=[node.path for node in findParallel(query.automaton,wide,2,pool,ordered=True,maxPending=4)]
+        assert found==expected
+        assert pool.mostLive<=4
@@ -0,0 +1,119 @@
+"""
+tests for the path index
+"""
+import os
+import tempfile
+from queryTools import *
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'Calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None,'temp':{'b.tmp':None}},'size':5}
+    }
+queries=['/windows/*/*.exe','/**/calc.exe','/**','/windows/system32/../temp/*',
+    '/**/temp/*','/users/**/5','/nothing/*','/**/*.tmp','/*']
+
+def _compare(tree,index,ordered=True):
+    """
+    check the index gives the same answers as walking the tree
+    """
+    allQueries=[GlobQuery(queryString) for queryString in queries]
+    allQueries.append(ReQuery('/.*/calc[.]exe',ignoreCase=True))
+    for q in allQueries:
+        expected=[item.path for item in q.find(tree)]
+        found=[item.path for item in q.find(index)]
+        if not ordered:
+            # nodes added later come after others at the same depth
+            expected.sort()
+            found.sort()
+        assert found==expected,q
+
+def test_find():
+    """
+    test queries give the same answer as walking the tree
+    """
+    tree=primativeAsTree(prim)
+    index=PathIndex(tree)
+    assert len(index)==16
+    _compare(tree,index)
+
+def test_updates():
+    """
+    test adding, removing and renaming keeps the index right
+    """
+    tree=primativeAsTree(prim)
+    index=PathIndex(tree)
+    windows=tree.children[0]
+    system32=windows.children[0]
+    newDir=Tree(name='new',parent=windows)
+    newDir.children.append(Tree(name='calc.exe',parent=newDir))
+    windows.children.append(newDir)
+    assert index.add(newDir)==2
+    _compare(tree,index,False)
+    windows.children.remove(system32)
+    assert index.remove(system32)==4
+    assert system32 not in index
+    _compare(tree,index,False)
+    newDir.name='temp'
+    index.rename(newDir)
+    assert index.pathSegments(newDir)==['','windows','temp']
+    _compare(tree,index,False)
+
+def test_saveOpen():
+    """
+    test saving the index and memory mapping it again
+    """
+    tree=primativeAsTree(prim)
+    index=PathIndex(tree)
+    index.remove(tree.children[1])
+    tree.children.pop()
+    filename=os.path.join(tempfile.mkdtemp(),'index.qt')
+    index.save(filename)
+    opened=PathIndex.open(filename)
+    try:
+        assert len(opened)==len(index)
+        for queryString in queries:
+            q=GlobQuery(queryString)
+            expected=[item.path for item in q.find(tree)]
+            assert [item.path for item in q.find(opened)]==expected,queryString
+    finally:
+        opened.close()
+
+
+def test_openedUsesIndex():
+    """
+    test an opened index still looks names up instead of walking,
+    and can open a plain ColumnarTree file too
+    """
+    tree=primativeAsTree(prim)
+    index=PathIndex(tree)
+    directory=tempfile.mkdtemp()
+    filename=os.path.join(directory,'index.qt')
+    index.save(filename)
+    columnarFilename=os.path.join(directory,'columnar.qt')
+    ColumnarTree.fromTree(tree).save(columnarFilename)
+    for name in (filename,columnarFilename):
+        opened=PathIndex.open(name)
+        try:
+            assert isinstance(opened,PathIndex)
+            assert bool(opened._views)==(name==filename)
+            q=GlobQuery('/**/calc.exe')
+            assert opened._find(q.automaton) is not None
+            assert sorted(opened._byName['calc.exe'])==[item.index for item in q.find(opened)]
+            for queryString in queries+['/**/CALC.exe']:
+                q=GlobQuery(queryString,ignoreCase='CALC' in queryString)
+                expected=[item.path for item in q.find(tree)]
+                assert [item.path for item in q.find(opened)]==expected,queryString
+                assert q.count(opened)==len(expected),queryString
+            found=GlobQuery('/users/bob/temp').first(opened)
+            assert found in opened
+            assert opened.pathSegments(found)==['','users','bob','temp']
+            try:
+                opened.remove(found)
+                assert False,'an opened index cannot be changed'
+            except ValueError:
+                pass
+        finally:
+            opened.close()
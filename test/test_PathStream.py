@@ -0,0 +1,85 @@
+"""
+tests for matching streams of paths, and the command line
+"""
+import io
+from queryTools import *
+from queryTools.query import cmdline
+
+paths=['./windows/system32/calc.exe','./windows/system32/notepad.exe',
+    './windows/temp/a.tmp','./users/bob/calc.exe','./users/bob/b.tmp',
+    './users/bob/caf\udce9.exe','./README']
+
+def _input(delimiter=b'\n'):
+    """
+    the paths as bytes, the way find would write them
+    """
+    return delimiter.join(path.encode('utf-8','surrogateescape') for path in paths)+delimiter
+
+def test_filter():
+    """
+    test writing the paths that match, in the order they were read
+    """
+    for chunkSize in (7,1<<20):
+        output=io.BytesIO()
+        count=filterPaths([GlobQuery('/**/*.tmp'),GlobQuery('/windows/**/calc.exe')],
+            io.BytesIO(_input()),output,chunkSize=chunkSize)
+        assert count==3
+        assert output.getvalue()==b'./windows/system32/calc.exe\n./windows/temp/a.tmp\n./users/bob/b.tmp\n'
+
+def test_null_and_bytes():
+    """
+    test NUL separated paths, and that paths that are not utf-8 come out the same
+    """
+    output=io.BytesIO()
+    filterPaths([GlobQuery('/users/bob/*.exe')],io.BytesIO(_input(b'\0')),output,b'\0',b'\n')
+    assert output.getvalue()==b'./users/bob/calc.exe\n./users/bob/caf\xe9.exe\n'
+
+def test_count_and_processes():
+    """
+    test counting per query, with and without worker processes
+    """
+    queries=[GlobQuery('/**/calc.exe'),ReQuery('/users/.*/.*[.]tmp'),GrepQuery('bob/c')]
+    for workers in (1,2):
+        counts=countPaths(queries,io.BytesIO(_input()),workers=workers,chunkSize=32)
+        assert counts==[2,1,2]
+        output=io.BytesIO()
+        filterPaths(queries,io.BytesIO(_input()),output,workers=workers,chunkSize=32)
+        assert output.getvalue().count(b'\n')==4
+
+def test_cmdline(tmp_path):
+    """
+    test the command line
+    """
+    queryFile=tmp_path/'queries.txt'
+    queryFile.write_text('# executables\nglob:/**/calc.exe\n\nre:/.*/.*/[ab][.]tmp\n')
+    output=io.BytesIO()
+    assert cmdline(['--file='+str(queryFile),'--count'],io.BytesIO(_input()),output)==0
+    assert output.getvalue()==b'2\tglob:/**/calc.exe\n2\tre:/.*/.*/[ab][.]tmp\n'
+    output=io.BytesIO()
+    assert cmdline(['-0','--print0','-i','/**/README'],io.BytesIO(_input(b'\0')),output)==0
+    assert output.getvalue()==b'./README\0'
+    assert cmdline(['--type=grep','nothing'],io.BytesIO(_input()),io.BytesIO())==1
+
+def test_cmdline_bad_arguments(tmp_path,capsys):
+    """
+    test bad arguments give an error and a non-zero exit instead of a traceback
+    """
+    for args in (['--file'],['--type','x'],['--workers','x'],['--workers=','x'],
+        ['--workers=two','x'],['--chunk-size=1.5','x'],['--plans','x'],
+        ['--file='+str(tmp_path/'missing.txt')]):
+        assert cmdline(args,io.BytesIO(_input()),io.BytesIO())==-1,args
+        assert 'ERR: ' in capsys.readouterr().err,args
+
+def test_dot():
+    """
+    test ./ is taken off every path that has it, and . on its own is the root
+    """
+    output=io.BytesIO()
+    count=filterPaths([GlobQuery('/windows/*.exe')],
+        io.BytesIO(b'.\n./windows\n./windows/calc.exe\n'),output)
+    assert count==1
+    assert output.getvalue()==b'./windows/calc.exe\n'
+    output=io.BytesIO()
+    assert filterPaths([GlobQuery('/')],io.BytesIO(b'.\n./windows\nusers\n'),output)==1
+    assert output.getvalue()==b'.\n'
+    assert filterPaths([GlobQuery('/*')],io.BytesIO(b'.\n./windows\nusers\n'),io.BytesIO())==2
@@ -0,0 +1,71 @@
+"""
+tests for ruling names out with literal checks before running a regex
+"""
+import re
+from queryTools import *
+
+names=['calc.exe','CALC.EXE','mycalc2.exe','calc.dll','notepad.exe','c.exe',
+    'calculator.exe','xcalcx.exe.bak','ſcalc.exe','']
+
+def test_requirements():
+    """
+    test working out the literal text a regex needs
+    """
+    assert patternRequirements(re.compile(r'.*calc.*\.exe'))==('','.exe',('calc',))
+    assert patternRequirements(re.compile(r'abc[0-9]+def'))==('abc','def',())
+    assert patternRequirements(re.compile(r'(?:ab)+x.*'))==('','',('ab','x'))
+    assert patternRequirements(re.compile(r'a|b'))==None
+    assert patternRequirements(re.compile(r'.*'))==None
+
+def test_same_as_regex():
+    """
+    test that a prefiltered step matches exactly what its regex does
+    """
+    for source in (r'.*calc.*\.exe',r'calc.*',r'.*\.exe',r'c(alc)?\.exe',r'[a-z]*calc[0-9]\.exe'):
+        for flags in (0,re.IGNORECASE):
+            regex=re.compile(source,flags)
+            step=prefilterPattern(regex)
+            assert isinstance(step,PrefilteredStep),source
+            for name in names:
+                assert bool(step.fullmatch(name))==bool(regex.fullmatch(name)),(source,flags,name)
+
+def test_counters():
+    """
+    test counting how many names never needed the regex
+    """
+    q=GlobQuery('/*calc*.exe')
+    step=q._querySteps[1]
+    assert isinstance(step,PrefilteredStep)
+    step.stats.reset()
+    results=sorted(item.name for item in q.find(primativeAsTree(names)))
+    assert results==['calc.exe','calculator.exe','mycalc2.exe','ſcalc.exe']
+    stats=q.prefilterStats
+    assert stats.checked==len(names)
+    assert stats.rejected==len(names)-len(results)
+    assert 0<stats.rejectionRate<1
+
+def test_grep_skips_text(tmp_path):
+    """
+    test that grep skips files without the required text
+    """
+    for i in range(4):
+        (tmp_path/('f%d.txt'%i)).write_text('nothing\n'*10+('error 42\n' if i==2 else ''))
+    q=GrepQuery('error [0-9]*')
+    found=[(node.name,lineNo) for node,lineNo,_ in q.search(FsTree(str(tmp_path)),workers=1)]
+    assert found==[('f2.txt',11)]
+    assert q.searchStats.checked==4
+    assert q.searchStats.rejected==3
+
+def test_filter_indices():
+    """
+    test checking a whole list of names at once
+    """
+    for source in (r'.*calc.*\.exe',r'calc.*',r'.*\.exe',r'[a-z]*calc[0-9]\.exe'):
+        for flags in (0,re.IGNORECASE):
+            regex=re.compile(source,flags)
+            step=prefilterPattern(regex)
+            expected=[i for i,name in enumerate(names) if regex.fullmatch(name)]
+            assert step.filterIndices(names)==expected,(source,flags)
+            asciiNames=[name for name in names if all(ord(c)<128 for c in name)]
+            expected=[i for i,name in enumerate(asciiNames) if regex.fullmatch(name)]
+            assert step.filterIndices(asciiNames)==expected,(source,flags)
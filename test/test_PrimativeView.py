@@ -0,0 +1,117 @@
+"""
+tests for the lazy primative view and streamed JSON
+"""
+import io
+import json
+from queryTools import *
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None},
+        'temp':['a.tmp',{'calc.exe':None},'5']
+        },
+    'users':{'bob':{'calc.exe':None},'size':5,'flag':True},
+    'empty':{}
+    }
+queries=['/windows/*/*.exe','/**/calc.exe','/**','/users/*/*','/windows/temp/*','/users/size/5','/*/*/../*']
+
+def _paths(q,tree):
+    """
+    sorted paths of the results
+    (a view gives branches before leaves, so the order can differ)
+    """
+    return sorted(item.path for item in q.find(tree))
+
+def test_same_as_primativeAsTree():
+    """
+    test the view is the same tree as primativeAsTree() makes
+    """
+    tree=primativeAsTree(prim)
+    view=PrimativeView(prim)
+    for queryString in queries:
+        q=GlobQuery(queryString)
+        assert _paths(q,view)==_paths(q,tree),queryString
+        q=GlobQuery(queryString,ignoreCase=True)
+        assert _paths(q,view)==_paths(q,tree),queryString
+
+def test_lazy():
+    """
+    test nothing is copied and plain names are looked up
+    """
+    view=PrimativeView(prim)
+    found=GlobQuery('/windows/system32').first(view)
+    assert found.value is prim['windows']['system32']
+    assert found==GlobQuery('/windows/system32').first(view)
+    assert found is not GlobQuery('/windows/system32').first(view)
+    # numbers in lists are names too
+    assert [item.path for item in GlobQuery('/*/2').find(PrimativeView([[1,2],'x']))]==['///2']
+
+class CountingReader(io.BytesIO):
+    """
+    counts how much has been read
+    """
+    amount=0
+
+    def read(self,size=-1):
+        data=io.BytesIO.read(self,size)
+        self.amount+=len(data)
+        return data
+
+def test_stream():
+    """
+    test a streamed document gives the same results as loading it
+    """
+    for document in (prim,[prim,'x',{'y':['1','2']},None,{'z':3.5}],{},[]):
+        data=json.dumps(document).encode('utf-8')
+        tree=primativeAsTree(document)
+        for queryString in queries+['/*']:
+            q=GlobQuery(queryString)
+            stream=JsonStream(io.BytesIO(data),chunkSize=7)
+            assert _paths(q,stream.root)==_paths(q,tree),queryString
+            stream=JsonStream(io.BytesIO(data),chunkSize=7)
+            assert sorted(item.path for item in stream.find(q))==_paths(q,tree),queryString
+
+def test_stream_lines():
+    """
+    test JSON lines are read one at a time
+    """
+    records=[{'name':'record%d'%i,'tags':['a','b']} for i in range(1000)]
+    data=''.join(json.dumps(record)+'\n' for record in records).encode('utf-8')
+    reader=CountingReader(data)
+    stream=JsonStream(reader,jsonLines=True,keep=False,chunkSize=100)
+    found=stream.find(GlobQuery('/*/name/record3'))
+    assert next(found).path=='///name/record3'
+    assert reader.amount<len(data)/10
+    assert GlobQuery('/*/name/*').count(JsonStream(io.BytesIO(data),jsonLines=True).root)==1000
+
+def test_stream_numbers():
+    """
+    test numbers cut in two by the end of a chunk are read whole
+    """
+    document={'a':2.5,'b':1e10,'c':[-12,3.25e-3,100],'d':0}
+    data=json.dumps(document).encode('utf-8')
+    for chunkSize in range(1,12):
+        stream=JsonStream(io.BytesIO(data),chunkSize=chunkSize)
+        assert [item.path for item in stream.find(GlobQuery('/*/*'))]== \
+            ['//a/2.5','//b/10000000000.0','//c/-12','//c/0.00325','//c/100','//d/0'],chunkSize
+
+def test_parent_step():
+    """
+    test .. finds each item once, even though views are made again each time
+    """
+    prim={'p':{'k':None,'z':{'q':{'k':None,'r':None}}}}
+    tree=primativeAsTree(prim)
+    for queryString in ('/**/k/../**','/**/../z','/**/k/../z/q/r'):
+        q=GlobQuery(queryString)
+        expected=_paths(q,tree)
+        assert _paths(q,PrimativeView(prim))==expected,queryString
+        assert q.count(PrimativeView(prim))==len(expected),queryString
+        assert sorted(item.path for item in q.find(PrimativeView(prim),workers=2))==expected,queryString
+
+def test_order():
+    """
+    test a node's branches come before its leaves, otherwise children are in order
+    """
+    view=PrimativeView({'a':None,'b':{'c':None},'d':None,'e':{}})
+    assert [item.path for item in view.children]==['//a','//b','//d','//e']
+    assert [item.path for item in GlobQuery('/*').find(view)]==['//b','//e','//a','//d']
@@ -0,0 +1,79 @@
+"""
+tests for the compiled query cache
+"""
+from queryTools import *
+
+def test_plans_are_shared():
+    """
+    test that the same query shares one plan, and different ones do not
+    """
+    a=GlobQuery('/windows/*.exe')
+    b=GlobQuery('/windows/*.exe')
+    assert a._querySteps is b._querySteps
+    assert a.automaton is b.automaton
+    assert ReQuery('/windows/*.exe')._querySteps is not a._querySteps
+    assert GlobQuery('/windows/*.exe',ignoreCase=True)._querySteps is not a._querySteps
+    assert GrepQuery('calc\\.exe').re is GrepQuery('calc\\.exe').re
+
+def test_lru_stats():
+    """
+    test hits, misses, evictions and the size limit
+    """
+    cache=QueryPlanCache(maxSize=2)
+    cache.get('a',lambda:1)
+    cache.get('b',lambda:2)
+    assert cache.get('a',lambda:-1)==1
+    cache.get('c',lambda:3)
+    assert cache.get('b',lambda:-2)==-2
+    assert (cache.hits,cache.misses,cache.evictions)==(1,4,2)
+    cache.maxSize=0
+    assert len(cache)==0
+    assert cache.get('a',lambda:4)==4 and len(cache)==0
+
+def test_save_and_load(tmp_path):
+    """
+    test that saved plans make the same steps in another cache,
+    without building them again
+    """
+    queries=[GlobQuery('/windows/**/calc*.exe'),GlobQuery('/Windows/*.TMP',ignoreCase=True),
+        ReQuery('/users/.*/b[aeiou]b/'),GrepQuery('calc\\.exe')]
+    plansFile=str(tmp_path/'plans.json')
+    cache=QueryPlanCache()
+    for query in queries:
+        # (a GrepQuery's plan is only its regex)
+        plan=query._plan if query._plan is not None else query.re
+        cache.get((query.__class__,query.queryString,query.ignoreCase),lambda:plan)
+    cache.get((GrepQuery,'bytes','calc\\.exe',False),lambda:queries[-1].bytesRe)
+    assert cache.save(plansFile)==5
+    loaded=QueryPlanCache()
+    assert loaded.load(plansFile)==5
+
+    def fail():
+        raise AssertionError('should have been loaded')
+    for query in queries[:-1]:
+        plan=loaded.get((query.__class__,query.queryString,query.ignoreCase),fail)
+        assert plan.steps==tuple(query._querySteps)
+        assert [type(step) for step in plan.steps]==[type(step) for step in query._querySteps]
+    assert loaded.get((GrepQuery,'calc\\.exe',False),fail)==queries[-1].re
+    assert loaded.get((GrepQuery,'bytes','calc\\.exe',False),fail)==queries[-1].bytesRe
+    assert (loaded.misses,loaded.restored)==(5,5)
+    assert loaded.get((GlobQuery,'/other',False),lambda:6)==6
+
+def test_cmdline_plans(tmp_path):
+    """
+    test that the command line saves plans, and uses them the next time
+    """
+    import io
+    from queryTools.query import cmdline
+    plansFile=tmp_path/'plans.json'
+    paths=b'windows/calc.exe\nusers/bob/b.tmp\n'
+    args=['--plans='+str(plansFile),'/windows/*.exe','re:/users/b[aeiou]b/.*']
+    outputs=[]
+    for _ in range(2):
+        defaultPlanCache.clear()
+        defaultPlanCache.resetStats()
+        output=io.BytesIO()
+        assert cmdline(args,io.BytesIO(paths),output)==0
+        outputs.append(output.getvalue())
+    assert outputs[0]==outputs[1]==paths
+    assert plansFile.exists() and defaultPlanCache.restored==2
@@ -0,0 +1,75 @@
+"""
+tests for evaluating many queries at once
+"""
+from queryTools import *
+
+myTree=primativeAsTree({
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None,'b.tmp':None}}
+    })
+
+queries={
+    'exe':GlobQuery('/windows/*/*.exe'),
+    'calc':GlobQuery('/**/calc.exe'),
+    'CALC':GlobQuery('/**/CALC.EXE',ignoreCase=True),
+    'tmp':ReQuery('/**/.*[.]tmp'),
+    'dll':GlobQuery('/windows/system32/*.dll'),
+    'parent':GlobQuery('/users/bob/../bob/b.tmp'),
+    'none':GlobQuery('/nothing/**'),
+    }
+
+def test_same_as_separate_queries():
+    """
+    test that every query finds exactly what it would on its own
+    """
+    qs=QuerySet(queries)
+    found={}
+    for node,ids in qs.find(myTree):
+        for queryId in ids:
+            found.setdefault(queryId,[]).append(node.path)
+    for queryId,query in queries.items():
+        expected=sorted(node.path for node in query.find(myTree))
+        assert sorted(found.get(queryId,[]))==expected,queryId
+
+def test_matches():
+    """
+    test matching a path against all queries
+    """
+    qs=QuerySet(queries)
+    assert sorted(qs.matches('/windows/temp/calc.exe'))==['CALC','calc','exe']
+    assert sorted(qs.matches('/users/bob/b.tmp'))==['parent','tmp']
+    assert qs.matches('/users/bob')==[]
+
+def test_many_queries():
+    """
+    test a lot of queries sharing a common prefix
+    """
+    qs=QuerySet([GlobQuery('/windows/*/file%d.*'%i) for i in range(200)])
+    tree=primativeAsTree({'windows':{'a':['file%d.txt'%i for i in range(300)]}})
+    results={node.name:ids for node,ids in qs.find(tree)}
+    assert len(results)==200
+    assert results['file7.txt']==[7]
+
+def test_mixed_query_classes():
+    """
+    test queries that cannot be merged (eg, grep and simple ones) still give the right ids
+    """
+    from queryTools.simpleQuery import SimpleQuery
+    prim={'a':{'foo.txt':None,'b':{'c':None}},'x':{'y':None}}
+    queries=[GrepQuery('foo'),GlobQuery('/a/*'),SimpleQuery('/x/*'),GrepQuery('^a/b')]
+    for tree in (primativeAsTree(prim),PrimativeView(prim)):
+        qs=QuerySet(queries)
+        found=sorted((node.path,sorted(ids)) for node,ids in qs.find(tree))
+        expected={}
+        for i,query in enumerate(queries):
+            for node in query.find(tree):
+                expected.setdefault(node.path,[]).append(i)
+        assert found==sorted(expected.items())
+        assert ('//a/foo.txt',[0,1]) in found
+        assert '//' not in dict(found)
+    assert qs.matches('/a/foo.txt')==[1,0]
+    assert qs.matches('a/b')==[1,3]
+    assert qs.matches('/x/y')==[2]
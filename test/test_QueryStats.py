@@ -0,0 +1,51 @@
+"""
+tests for explain() and counting what each query step does
+"""
+from queryTools import *
+
+myTree=primativeAsTree({
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None}
+        },
+    'users':{'bob':{'calc.exe':None}}
+    })
+
+def test_explain():
+    """
+    test describing the steps
+    """
+    text=GlobQuery('/windows/**/*.exe').explain()
+    assert 'literal' in text and "'windows'" in text
+    assert 'descendentof' in text
+    assert 'glob' in text and 'suffix' in text
+    text=GlobQuery('/windows/**/c*l*.exe').explain()
+    assert 'regex' in text and "suffix='.exe'" in text
+    assert '2 segment(s)' in GlobQuery('/users/../windows').explain()
+
+def test_counts():
+    """
+    test that the counts add up and the results are the same
+    """
+    q=GlobQuery('/windows/*/*.exe')
+    stats=QueryStats()
+    found=sorted(node.path for node in q.find(myTree,stats=stats))
+    assert found==sorted(node.path for node in q.find(myTree))
+    assert stats.results==len(found)
+    # step 1 ('windows') was tried on both children of the root
+    assert stats.steps[1].visited==2
+    assert stats.steps[1].matches==1
+    assert stats.steps[1].pruned==1
+    # step 3 (*.exe) ran on every file in system32 and temp
+    assert stats.steps[3].evaluations==4
+    assert stats.steps[3].matches==2
+    assert 'visited=' in q.explain(stats)
+
+def test_callback():
+    """
+    test the callback sees every step tried on every child
+    """
+    seen=[]
+    stats=QueryStats(callback=lambda stepIndex,child,matched: seen.append((stepIndex,child.name,matched)))
+    list(GlobQuery('/users/*').find(myTree,stats=stats))
+    assert sorted(seen)==[(1,'users',True),(1,'windows',False),(2,'bob',True)]
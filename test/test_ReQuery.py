@@ -18,7 +18,127 @@ def test_double_star_traversal():
     test that /windows/**/calc.exe gives the coorrect answer
     """
     q=ReQuery('/windows/**/calc.exe')
-    results=[item.path for item in q.find(myTree)]
-    return results
+    results=['/'.join(item.pathSegments) for item in q.find(myTree)]
+    assert results==['/windows/foo/bar/calc.exe']
 
-print(test_double_star_traversal())
\ No newline at end of file
+def test_parent_step():
+    """
+    test that .. goes back up the tree
+    """
+    q=ReQuery('/windows/foo/bar/../../foo')
+    results=[item.name for item in q.find(myTree)]
+    assert results==['foo']
+
+def test_pruning():
+    """
+    test that subtrees that cannot match are never listed
+    """
+    listed=[]
+    class CountingTree(CompactTree):
+        __slots__=()
+        @property
+        def children(self):
+            listed.append(self.name)
+            return self._children
+    tree=primativeAsTree({
+        'windows':{'a':{'foo':{'x.exe':None,'y.txt':None}},'b':{'bar':None}},
+        'users':{'user%d'%i:{'foo':None} for i in range(10)}
+        },treeType=CountingTree)
+    listed.clear()
+    q=ReQuery('/windows/*/foo/*.exe')
+    results=[item.name for item in q.find(tree)]
+    assert results==['x.exe']
+    assert listed==['','windows','a','b','foo']
+
+def test_matches():
+    """
+    test matching paths without a tree
+    """
+    q=ReQuery('/windows/**/calc.exe')
+    assert q.matches('/windows/foo/bar/calc.exe')
+    assert q.matches('/windows/calc.exe')
+    assert not q.matches('/windows/foo/bar/calc.exe/x')
+    assert not q.matches('/users/calc.exe')
+    assert q.matches(['windows','foo','calc.exe'])
+
+def test_matches_many():
+    """
+    test checking a lot of paths at once gives the same answers as one at a time
+    """
+    paths=['/windows/foo/bar/calc.exe','/windows/foo/calc.exe','/windows/calc.exe',
+        'windows/foo/bar/calc.exe','/users/calc.exe','/windows/foo/bar/x',
+        '/windows/foo/bar/calc.exe/x',['windows','calc.exe'],'/windows//calc.exe/']
+    for queryString in ('/windows/**/calc.exe','/windows/*/*','/WINDOWS/**','/windows/foo/../calc.exe'):
+        q=ReQuery(queryString,ignoreCase=True)
+        assert list(q.matchesMany(paths))==[q.matches(path) for path in paths],queryString
+        assert list(q.matchesMany(paths,onlyMatches=True))==[path for path in paths if q.matches(path)]
+
+def test_empty_names():
+    """
+    test empty names in a path are skipped, whether it is a string or a list,
+    and whether it is checked on its own or with matchesMany()
+    """
+    paths=['/windows//calc.exe/',['windows','','calc.exe'],['','windows','calc.exe',''],
+        ['windows','','x','']]
+    expected=[True,True,True,False]
+    for queryString in ('/windows/calc.exe','/**/calc.exe','/windows/*/../calc.exe'):
+        q=ReQuery(queryString)
+        assert [q.matches(path) for path in paths]==expected,queryString
+        assert list(q.matchesMany(paths))==expected,queryString
+
+def test_parent_step_different_depths():
+    """
+    test that .. finds everything when the parents it goes back to
+    are at different depths
+    """
+    tree=primativeAsTree({'p':{'k':None,'z':{'q':{'k':None,'r':None}}}})
+    q=GlobQuery('/**/k/../z/q/r')
+    assert [item.path for item in q.find(tree)]==['//p/z/q/r']
+    assert q.count(tree)==1
+    assert sorted(item.path for item in GlobQuery('/**/k/../**').find(tree))==[
+        '//p','//p/k','//p/z','//p/z/q','//p/z/q/k','//p/z/q/r']
+
+def _bruteForce(query,tree):
+    """
+    apply the query steps one at a time to the whole set of nodes
+    """
+    nodes={id(tree):tree}
+    for step in query._querySteps:
+        found={}
+        for node in nodes.values():
+            if step==0:
+                found[id(node)]=node
+            elif step==1:
+                if node.parent is not None:
+                    found[id(node.parent)]=node.parent
+            elif step==2:
+                found.update((id(child),child) for child in node.children)
+            elif step==3:
+                todo=[node]
+                while todo:
+                    item=todo.pop()
+                    found[id(item)]=item
+                    todo.extend(item.children)
+            else:
+                found.update((id(child),child) for child in node.children if step.fullmatch(child.name))
+        nodes=found
+    return sorted(node.path for node in nodes.values())
+
+def test_random_queries():
+    """
+    test random queries (with .. all over) against applying each step by brute force
+    """
+    import random
+    rand=random.Random(0)
+    def randomTree(depth):
+        if depth>=5 or rand.random()<0.25:
+            return None
+        return {rand.choice('kqz'):randomTree(depth+1) for _ in range(rand.randrange(1,4))}
+    for _ in range(1000):
+        tree=primativeAsTree(randomTree(0) or {'a':None})
+        # .. after /**/ goes back up to parents at all different depths
+        q=GlobQuery('/**/'+'/'.join(rand.choice(['k','q','z','*','**','..'])
+            for _ in range(rand.randrange(2,6))))
+        results=[item.path for item in q.find(tree)]
+        assert sorted(results)==_bruteForce(q,tree),q.queryString
+        assert q.count(tree)==len(results),q.queryString
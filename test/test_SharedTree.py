@@ -0,0 +1,74 @@
+"""
+tests for sharing a tree with worker processes
+"""
+import concurrent.futures
+from queryTools import *
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'Calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None,'temp':{'b.tmp':None}},'size':5},
+    'calc.exe':None
+    }
+queries=['/windows/*/*.exe','/**/calc.exe','/**','/windows/system32/../temp/*',
+    '/**/temp/*','/users/**/5','/nothing/*','/**/*.tmp','/*','/']
+
+def test_find():
+    """
+    test the workers give the same nodes, in the same order, as walking the tree
+    """
+    tree=primativeAsTree(prim)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as pool:
+        with SharedTree(tree,workers=2,executor=pool) as shared:
+            assert len(shared)==17
+            allQueries=[GlobQuery(queryString) for queryString in queries]
+            allQueries.append(ReQuery('/.*/calc[.]exe',ignoreCase=True))
+            for q in allQueries:
+                expected=list(q.find(tree))
+                found=list(q.find(shared))
+                assert len(found)==len(expected),q
+                assert all(a is b for a,b in zip(found,expected)),q
+                assert q.count(shared)==len(expected),q
+            # other processes can use it too
+            attached=SharedTree.attach(shared.name)
+            found=[item.path for item in GlobQuery('/**/*.exe').find(attached)]
+            assert found==[item.path for item in GlobQuery('/**/*.exe').find(tree)]
+            attached.close()
+
+def test_changed():
+    """
+    test a changed tree is searched the normal way until it is exported again
+    """
+    tree=primativeAsTree(prim)
+    with SharedTree(tree,workers=1) as shared:
+        q=GlobQuery('/**/*.tmp')
+        assert len(list(q.find(shared)))==2
+        temp=[item for item in tree.children if item.name=='windows'][0].children[1]
+        temp.children.append(Tree('c.tmp',temp))
+        assert len(list(q.find(shared)))==3
+        shared.export()
+        assert len(list(q.find(shared)))==3
+
+def test_unordered():
+    """
+    test that without ordered, results come back as each worker finishes
+    """
+    tree=primativeAsTree(prim)
+    with concurrent.futures.ProcessPoolExecutor(max_workers=2) as pool:
+        with SharedTree(tree,workers=2,executor=pool,ordered=False) as shared:
+            for queryString in queries:
+                q=GlobQuery(queryString)
+                expected=list(q.find(tree))
+                found=list(q.find(shared))
+                assert sorted(map(id,found))==sorted(map(id,expected)),queryString
+                assert q.count(shared)==len(expected),queryString
+            # one worker done and one still going
+            done=concurrent.futures.Future()
+            done.set_result([1,2])
+            notDone=concurrent.futures.Future()
+            results=shared._results(GlobQuery('/*').automaton,[notDone,done])
+            assert [next(results).name,next(results).name]==[shared._nodes[1].name,shared._nodes[2].name]
+            results.close()
+            assert notDone.cancelled()
@@ -0,0 +1,80 @@
+"""
+tests for the simple query
+"""
+from queryTools import *
+from queryTools.simpleQuery import SimpleQuery
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None},
+        'temp':{'calc.exe':None}
+        },
+    'users':{'bob':{'docs':None},'alice':{'docs':None,'Calc.exe':None}}
+    }
+
+class FakeDb:
+    """
+    a backend with one row per path, that counts round-trips
+    """
+
+    def __init__(self,tree):
+        self.children={}
+        todo=[('',tree)]
+        while todo:
+            path,node=todo.pop()
+            self.children[path]=['%s/%s'%(path,child.name) for child in node.children]
+            todo.extend(('%s/%s'%(path,child.name),child) for child in node.children)
+        self.calls=0
+
+    def dir(self,path):
+        self.calls+=1
+        return self.children.get(path,[])
+
+    def exists(self,path):
+        self.calls+=1
+        return path in self.children
+
+class FakeBulkDb(FakeDb):
+    """
+    the same, but can do a whole level at once
+    """
+
+    def dir_many(self,paths):
+        self.calls+=1
+        return [self.children.get(path,[]) for path in paths]
+
+    def exists_many(self,paths):
+        self.calls+=1
+        return [path in self.children for path in paths]
+
+queries=['/windows/*/calc.exe','/*/*','/users/*/docs','/windows/temp/calc.exe','/nothing/*/x','/*/*/calc.exe']
+
+def test_paths():
+    """
+    test paths() finds the same as find() and batches each level
+    """
+    tree=primativeAsTree(prim)
+    for queryString in queries:
+        q=SimpleQuery(queryString)
+        expected=['/'.join(item.pathSegments) for item in q.find(tree)]
+        assert sorted(q.paths(FakeDb(tree)))==sorted(expected),queryString
+        db=FakeBulkDb(tree)
+        assert q.paths(db)==expected,queryString
+        # one call per * step, plus one to check whatever is left
+        assert db.calls<=queryString.count('*')+1,queryString
+    db=FakeBulkDb(tree)
+    assert SimpleQuery('/users/*/calc.exe',ignoreCase=True).paths(db)==['/users/alice/Calc.exe']
+    assert db.calls==3
+
+def test_find():
+    """
+    test find() gives the same results as an equivalent glob
+    """
+    tree=primativeAsTree(prim)
+    for queryString in queries:
+        expected=[item.path for item in GlobQuery(queryString).find(tree)]
+        assert [item.path for item in SimpleQuery(queryString).find(tree)]==expected,queryString
+    q=SimpleQuery('/USERS/*/calc.exe',ignoreCase=True)
+    assert [item.path for item in q.find(tree)]==['//users/alice/Calc.exe']
+    assert q.count(tree)==1
+    assert SimpleQuery('/windows/*').first(tree).path=='//windows/system32'
@@ -0,0 +1,72 @@
+"""
+tests for the traversal tape
+"""
+from queryTools import *
+
+myTree=primativeAsTree({
+    'a':{'a1':{'a11':None},'a2':None},
+    'b':{'b1':None}
+    })
+
+def _walk(tape):
+    """
+    walk the whole tree with a tape
+    """
+    ret=[]
+    tape.push(myTree)
+    while not tape.isDone:
+        item=tape.pop()
+        ret.append(item.name)
+        for child in item.children:
+            tape.push(child)
+    return ret
+
+def test_breadth_first():
+    """
+    test the default order
+    """
+    assert _walk(Tape())==['','a','b','a1','a2','b1','a11']
+
+def test_depth_first():
+    """
+    test last in, first out
+    """
+    assert _walk(Tape(order=Tape.__DEPTH_FIRST__))==['','b','b1','a','a2','a1','a11']
+
+def test_iterative_deepening():
+    """
+    test that shallow levels are finished before going deeper
+    """
+    tape=Tape(order=Tape.__ITERATIVE_DEEPENING__,depthStep=2)
+    assert _walk(tape)==['','b','a','a2','a1','a11','b1']
+    tape=Tape(order=Tape.__ITERATIVE_DEEPENING__,depthStep=1)
+    assert _walk(tape)==['','b','a','a2','a1','b1','a11']
+
+def test_max_depth():
+    """
+    test that nothing deeper than maxDepth is visited
+    """
+    assert _walk(Tape(maxDepth=1))==['','a','b']
+
+def test_visited_modes():
+    """
+    test that every visited mode stops repeats, except the none mode
+    """
+    item=Tree(name='x')
+    for mode in (Tape.__VISITED_IDENTITY__,Tape.__VISITED_HASH__):
+        tape=Tape(visitedMode=mode)
+        tape.push(item)
+        tape.pop()
+        tape.push(item)
+        assert tape.isDone
+    tape=Tape(visitedMode=Tape.__VISITED_BITMAP__,nodeId=lambda i:i)
+    tape.push(1000)
+    tape.pop()
+    tape.push(1000)
+    tape.push(7)
+    assert len(tape)==1 and 1000 in tape.visited and 7 not in tape.visited
+    tape=Tape(visitedMode=Tape.__VISITED_NONE__)
+    tape.push(item)
+    tape.pop()
+    tape.push(item)
+    assert not tape.isDone
@@ -0,0 +1,61 @@
+"""
+tests for first(), exists(), count() and find(limit=)
+"""
+import os
+from queryTools import *
+
+prim={
+    'windows':{
+        'system32':{'calc.exe':None,'notepad.exe':None,'kernel32.dll':None},
+        'temp':{'a.tmp':None,'calc.exe':None}
+        },
+    'users':{'bob':{'calc.exe':None}}
+    }
+queries=['/**/calc.exe','/windows/*/*.exe','/**','/windows/system32/../temp/*','/nothing/*']
+
+def test_same_as_find():
+    """
+    test the answers are the same as from draining find()
+    """
+    tree=primativeAsTree(prim)
+    for tree in (tree,ColumnarTree.fromTree(tree),PathIndex(tree)):
+        for queryString in queries:
+            q=GlobQuery(queryString)
+            expected=list(q.find(tree))
+            assert q.count(tree)==len(expected),queryString
+            assert q.exists(tree)==bool(expected),queryString
+            first=q.first(tree)
+            if expected:
+                assert first.path==expected[0].path,queryString
+            else:
+                assert first is None
+            assert [item.path for item in q.find(tree,limit=2)]==[item.path for item in expected[:2]]
+            assert list(q.find(tree,limit=0))==[]
+
+def test_stops_early():
+    """
+    test that first() does not look any further than it needs to
+    """
+    listed=[]
+    class CountingTree(CompactTree):
+        @property
+        def children(self):
+            listed.append(self.name)
+            return self._children
+    tree=primativeAsTree(prim,treeType=CountingTree)
+    del listed[:]
+    assert GlobQuery('/*/*').first(tree).path=='//windows/system32'
+    # breadth-first, so all of the first level, but nothing below it
+    assert listed==['','windows','users']
+
+def test_count_leaves(tmp_path):
+    """
+    test counting files without creating them
+    """
+    for i in range(20):
+        with open(os.path.join(str(tmp_path),'file%d.%s'%(i,'exe' if i%2 else 'txt')),'w'):
+            pass
+    tree=FsTree(str(tmp_path))
+    for queryString in ('/*.exe','/*','/file1?.*','/file3.exe'):
+        q=GlobQuery(queryString)
+        assert q.count(tree)==len(list(q.find(tree))),queryString
@@ -0,0 +1,55 @@
+"""
+tests for the tree types
+"""
+from queryTools import *
+
+def test_compact_tree_matches_tree():
+    """
+    test that a CompactTree gives the same answers as a Tree
+    """
+    prim={'windows':{'foo':{'calc.exe':None},'size':5}}
+    tree=primativeAsTree(prim)
+    compact=primativeAsTree(prim,treeType=CompactTree)
+    q=GlobQuery('/windows/**')
+    assert [item.path for item in q.find(tree)]==[item.path for item in q.find(compact)]
+
+def test_compact_tree_invalidation():
+    """
+    test that renaming or moving an ancestor updates cached paths
+    """
+    compact=primativeAsTree({'a':{'b':{'c':None}},'d':None},treeType=CompactTree)
+    a,d=compact.children
+    c=a.children[0].children[0]
+    assert c.path=='//a/b/c' and c.depth==3
+    h=hash(c)
+    a.name='x'
+    assert c.path=='//x/b/c' and hash(c)!=h
+    a.parent=d
+    assert c.path=='//d/x/b/c' and c.depth==4
+
+def test_identity_hash():
+    """
+    test the constant-time identity hash
+    """
+    class IdentityTree(CompactTree):
+        __slots__=()
+        identityHash=True
+    a=IdentityTree('a')
+    b=IdentityTree('a')
+    assert a!=b and len({a,b})==2
+    assert CompactTree('a')==CompactTree('a')
+
+def test_child_index():
+    """
+    test that the child index is used, and kept up to date
+    """
+    compact=primativeAsTree({'dir':['file%d'%i for i in range(100)]},treeType=CompactTree)
+    folder=compact.children[0]
+    q=GlobQuery('/dir/FILE7',ignoreCase=True)
+    assert [item.name for item in q.find(compact)]==['file7']
+    assert folder.childIndex(True) is folder.childIndex(True)
+    folder.children[7].name='renamed'
+    assert not list(q.find(compact))
+    folder.children.append(CompactTree('File7',folder))
+    assert [item.name for item in q.find(compact)]==['File7']
+    assert [item.name for item in GlobQuery('/dir/file7').find(compact)]==[]
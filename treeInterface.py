@@ -7,6 +7,7 @@ for your tree like an xml structure, a EzFs directory,
 a bigBallOfMud, or a general pynode.
 """
 from dataclasses import dataclass, field
+import sys
 import typing
 
 
@@ -24,15 +25,109 @@ class TreeLike(typing.Protocol):
     children:typing.Iterable["TreeLike"]
 
 
+class AsyncTreeLike(typing.Protocol):
+    """
+    The same as TreeLike, except getting the children has to be awaited
+    (eg, they come from a remote service)
+
+    Usage:
+        for child in await node.children():
+            ...
+    """
+    name:str
+    parent:typing.Optional["AsyncTreeLike"]
+
+    async def children(self)->typing.Iterable["AsyncTreeLike"]:
+        """
+        get the children of this item
+        """
+        ...
+
+
+# goes up every time any generation is read
+_readEpoch:int=0
+
+
+def readGeneration(node:typing.Any)->int:
+    """
+    get the generation of a node
+    (for implementing a generation property)
+    """
+    global _readEpoch
+    _readEpoch+=1
+    return node._generation
+
+
+def bumpGeneration(node:typing.Any)->None:
+    """
+    Note that a node, or something under it, has changed
+    by adding one to the generation of the node and all of its ancestors
+
+    Stops at the first one that does not keep a generation, or that
+    has already been bumped since the last time any generation was read.
+    (in that case its ancestors were bumped along with it, so the change
+    will be seen anyway, and building a tree does not keep walking up it)
+    """
+    epoch=_readEpoch
+    while node is not None:
+        generation=getattr(node,'_generation',None)
+        if generation is None or node._bumpEpoch==epoch:
+            break
+        object.__setattr__(node,'_generation',generation+1)
+        object.__setattr__(node,'_bumpEpoch',epoch)
+        node=node.parent
+
+
 @dataclass
 class Tree(TreeLike):
     """
     A simple instaciable tree
+
+    Changing the name, parent, or children bumps the generation
+    of the item and all of its ancestors (see FindCache)
     """
     name:str=''
     parent:typing.Optional[TreeLike]=None
     children:typing.List[TreeLike]=field(default_factory=lambda: [])
 
+    def __init__(self,
+        name:str='',
+        parent:typing.Optional[TreeLike]=None,
+        children:typing.Optional[typing.Iterable[TreeLike]]=None):
+        """
+        (written out rather than generated so that creating
+        an item does not go through __setattr__)
+        """
+        setattr_=object.__setattr__
+        setattr_(self,'name',name)
+        setattr_(self,'parent',parent)
+        setattr_(self,'children',ChildList(self,children or ()))
+        setattr_(self,'_generation',0)
+        setattr_(self,'_bumpEpoch',-1)
+
+    def __setattr__(self,attr:str,value:typing.Any):
+        if attr=='children' and not (isinstance(value,ChildList) and value.owner is self):
+            value=ChildList(self,value)
+        elif attr=='parent':
+            # the new ancestors have not been bumped
+            object.__setattr__(self,'_bumpEpoch',-1)
+        object.__setattr__(self,attr,value)
+        if attr in ('name','parent','children'):
+            bumpGeneration(self)
+
+    def _childrenChanged(self)->None:
+        """
+        called whenever children are added or removed
+        """
+        bumpGeneration(self)
+
+    @property
+    def generation(self)->int:
+        """
+        goes up every time this item or anything under it changes
+        """
+        return readGeneration(self)
+
     @property
     def path(self)->str:
         """
@@ -56,37 +151,279 @@ class Tree(TreeLike):
         return self.path.__hash__()
 
 
+class ChildList(list):
+    """
+    A list of children that tells its owner whenever it changes
+    """
+
+    __slots__=('owner',)
+
+    def __init__(self,owner:typing.Any,children:typing.Iterable[typing.Any]=()):
+        list.__init__(self,children)
+        self.owner=owner
+
+    def _changed(self)->None:
+        # (the owner is not set yet while unpickling)
+        owner=getattr(self,'owner',None)
+        if owner is not None:
+            owner._childrenChanged()
+
+
+def _notifying(name:str)->typing.Callable:
+    method=getattr(list,name)
+    def wrapper(self,*args,**kwargs):
+        ret=method(self,*args,**kwargs)
+        self._changed()
+        return ret
+    wrapper.__name__=name
+    wrapper.__doc__=method.__doc__
+    return wrapper
+for _name in ('append','extend','insert','remove','pop','clear','sort','reverse',
+    '__setitem__','__delitem__','__iadd__','__imul__'):
+    setattr(ChildList,_name,_notifying(_name))
+del _name
+
+
+class CompactTree:
+    """
+    A drop-in replacement for Tree that takes less memory
+    and is cheaper to hash.
+
+    Differences:
+        uses __slots__
+        names are interned
+        path, hash, and depth are cached, and only get thrown away
+            when the name or parent of this or an ancestor changes
+        if identityHash is True (eg, in a derived class) hashing and
+            comparison go by identity and are constant-time
+        wide nodes keep a {name:[children]} lookup (see childIndex())
+            that is thrown away when children are added, removed or renamed
+        same as Tree, changes bump the generation
+    """
+
+    __slots__=('_name','_parent','_children','_childIndexes',
+        '_path','_hash','_depth','_generation','_bumpEpoch','__weakref__')
+
+    identityHash:bool=False
+
+    # nodes with fewer children than this do not bother with a childIndex
+    childIndexThreshold:int=16
+
+    def __init__(self,
+        name:str='',
+        parent:typing.Optional[TreeLike]=None,
+        children:typing.Optional[typing.List[TreeLike]]=None):
+        """ """
+        self._name:str=sys.intern(name)
+        self._parent:typing.Optional[TreeLike]=parent
+        self._children:ChildList=ChildList(self,children or ())
+        self._childIndexes:typing.Optional[typing.List[typing.Optional[typing.Dict[str,typing.List[TreeLike]]]]]=None
+        self._path:typing.Optional[str]=None
+        self._hash:typing.Optional[int]=None
+        self._depth:typing.Optional[int]=None
+        self._generation:int=0
+        self._bumpEpoch:int=-1
+
+    @property
+    def name(self)->str: # type: ignore
+        """
+        name of this item
+        """
+        return self._name
+    @name.setter
+    def name(self,name:str):
+        self._name=sys.intern(name)
+        self._invalidate()
+        if isinstance(self._parent,CompactTree):
+            self._parent._childIndexes=None
+        bumpGeneration(self)
+
+    @property
+    def children(self)->typing.List[TreeLike]: # type: ignore
+        """
+        children of this item
+        """
+        return self._children
+    @children.setter
+    def children(self,children:typing.Iterable[TreeLike]):
+        self._children=ChildList(self,children)
+        self._childrenChanged()
+
+    def _childrenChanged(self)->None:
+        """
+        called whenever children are added, removed, or renamed
+        """
+        self._childIndexes=None
+        bumpGeneration(self)
+
+    @property
+    def generation(self)->int:
+        """
+        goes up every time this item or anything under it changes
+        """
+        return readGeneration(self)
+
+    def childIndex(self,folded:bool=False)->typing.Optional[typing.Dict[str,typing.List[TreeLike]]]:
+        """
+        get a {name:[children]} lookup, built the first time it is asked for
+
+        :folded: the names are all lowercase
+        :return: the index, or None if there are too few children to bother
+        """
+        if len(self._children)<self.childIndexThreshold:
+            return None
+        if self._childIndexes is None:
+            self._childIndexes=[None,None]
+        index=self._childIndexes[folded]
+        if index is None:
+            index={}
+            for child in self._children:
+                name=child.name.lower() if folded else child.name
+                index.setdefault(name,[]).append(child)
+            self._childIndexes[folded]=index
+        return index
+
+    @property
+    def parent(self)->typing.Optional[TreeLike]: # type: ignore
+        """
+        parent of this item
+        """
+        return self._parent
+    @parent.setter
+    def parent(self,parent:typing.Optional[TreeLike]):
+        self._parent=parent
+        self._invalidate()
+        # the new ancestors have not been bumped
+        self._bumpEpoch=-1
+        bumpGeneration(self)
+
+    def _invalidate(self)->None:
+        """
+        throw away cached values for this item and everything below it
+
+        (a child only has a cached path if its parent does,
+        so it can stop at anything that is not cached)
+        """
+        items:typing.List[CompactTree]=[self]
+        while items:
+            item=items.pop()
+            if item._path is None and item._depth is None and item is not self:
+                continue
+            item._path=None
+            item._hash=None
+            item._depth=None
+            for child in item._children:
+                if isinstance(child,CompactTree):
+                    items.append(child)
+
+    def _ancestorsToCompute(self,attr:str)->typing.List["CompactTree"]:
+        """
+        get the chain of items, starting at this one and going up,
+        until one already has attr cached (or is not a CompactTree)
+        """
+        chain:typing.List[CompactTree]=[]
+        item:typing.Any=self
+        while isinstance(item,CompactTree) and getattr(item,attr) is None:
+            chain.append(item)
+            item=item._parent
+        return chain
+
+    @property
+    def path(self)->str:
+        """
+        get the path to this item
+        """
+        if self._path is None:
+            for item in reversed(self._ancestorsToCompute('_path')):
+                parent:typing.Any=item._parent
+                if parent is None:
+                    item._path='/'+item._name
+                else:
+                    item._path=parent.path+'/'+item._name
+        return typing.cast(str,self._path)
+
+    @property
+    def pathSegments(self)->typing.Iterable[str]:
+        """
+        get the path to this item
+        """
+        ret=[]
+        item:typing.Any=self
+        while item is not None:
+            ret.append(item.name)
+            item=item.parent
+        ret.reverse()
+        return ret
+
+    @property
+    def depth(self)->int:
+        """
+        how far down the tree this item is (root=0)
+        """
+        if self._depth is None:
+            for item in reversed(self._ancestorsToCompute('_depth')):
+                parent:typing.Any=item._parent
+                if parent is None:
+                    item._depth=0
+                elif isinstance(parent,CompactTree):
+                    item._depth=parent.depth+1
+                else:
+                    item._depth=len(list(parent.pathSegments))
+        return typing.cast(int,self._depth)
+
+    def __hash__(self)->int:
+        if self.identityHash:
+            return id(self)
+        if self._hash is None:
+            self._hash=hash(self.path)
+        return self._hash
+
+    def __eq__(self,other:typing.Any)->bool:
+        if self is other:
+            return True
+        if self.identityHash or not isinstance(other,CompactTree):
+            return False
+        return self.path==other.path
+
+    def __repr__(self)->str:
+        return '%s(name=%r)'%(self.__class__.__name__,self._name)
+
+
 def primativeAsTree(
     prim:typing.Union[
         typing.Iterable[typing.Union[str,typing.Iterable]], # list-of-lists style tree
         typing.Dict[str,typing.Any]
     ],
-    parent:typing.Optional[TreeLike]=None
+    parent:typing.Optional[TreeLike]=None,
+    treeType:typing.Callable[...,TreeLike]=Tree
     )->TreeLike:
     """
     Turns a python primative type into a tree.
         a) list of strings into a tree of strings/lists
         b) a dict of dicts into a tree
         c) mix of those
+
+    :treeType: the kind of tree node to create (eg, Tree or CompactTree)
     """
-    ret=Tree(parent=parent)
+    ret=treeType(parent=parent)
     if prim is None:
         pass
     elif hasattr(prim,'items'):
         # dict of dicts
         for k,v in prim.items():
             if isinstance(v,(str,int,float,bool)):
-                v=str(v)
+                # a value becomes the only child
+                v=primativeAsTree([str(v)],ret,treeType)
             else:
-                v=primativeAsTree(v,ret)
-                v.name=k
+                v=primativeAsTree(v,ret,treeType)
+            v.name=k
             ret.children.append(v)
     else:
         # list of strings/lists
         for item in prim:
             if isinstance(item,str):
-                t=Tree(name=item)
+                t=treeType(name=item,parent=ret)
             else:
-                t=primativeAsTree(item,ret)
+                t=primativeAsTree(item,ret,treeType)
             ret.children.append(t)
     return ret